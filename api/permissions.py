@@ -133,4 +133,24 @@ class FindingPermission(permissions.BasePermission):
         else:
             return False
         
-        return user_has_global_permission(request.user, required_permission)
\ No newline at end of file
+        return user_has_global_permission(request.user, required_permission)
+
+class ReportPermission(permissions.BasePermission):
+    """报告权限：查看任务需要统计查看权限，提交生成和下载报告需要统计导出权限"""
+    
+    def has_permission(self, request, view):
+        if getattr(settings, 'DISABLE_LOGIN', False):
+            return True
+        
+        if not request.user or not request.user.is_authenticated:
+            return False
+        
+        # 根据请求方法和操作确定所需权限
+        if request.method == 'POST' or getattr(view, 'action', None) == 'download':
+            required_permission = Permissions.STATISTICS_EXPORT
+        elif request.method in permissions.SAFE_METHODS:
+            required_permission = Permissions.STATISTICS_VIEW
+        else:
+            return False
+        
+        return user_has_global_permission(request.user, required_permission)
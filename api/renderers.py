@@ -0,0 +1,18 @@
+import json
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """SSE渲染器 - 让 Accept: text/event-stream 的请求通过内容协商
+
+    正常情况下视图直接返回StreamingHttpResponse，此渲染器只用于渲染错误响应。
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        return f"event: error\ndata: {payload}\n\n".encode(self.charset)
@@ -1,5 +1,7 @@
 from rest_framework import serializers
 from core.models import Department, Project, ScanTask, Finding, FindingNote, StatusHistory
+from statistics.models import ScanSnapshot, ReportJob
+from core.scanners.fake import fake_url_allowed
 
 
 class DepartmentSerializer(serializers.ModelSerializer):
@@ -33,6 +35,11 @@ class ProjectSerializer(serializers.ModelSerializer):
     def get_finding_count(self, obj):
         return obj.finding_set.filter(active=True).count()
     
+    def validate_git_url(self, value):
+        if not fake_url_allowed(value):
+            raise serializers.ValidationError('模拟扫描引擎未启用，不能使用 fake:// 地址')
+        return value
+    
     def get_last_scan(self, obj):
         last_scan = obj.scantask_set.order_by('-created_at').first()
         if last_scan:
@@ -68,6 +75,42 @@ class ScanTaskSerializer(serializers.ModelSerializer):
         return None
 
 
+class ScanSnapshotSerializer(serializers.ModelSerializer):
+    """扫描快照序列化器（不含指纹列表）"""
+    tool_name = serializers.CharField(source='scan_task.tool_name', read_only=True)
+    scan_type = serializers.CharField(source='scan_task.scan_type', read_only=True)
+    completed_at = serializers.DateTimeField(source='scan_task.completed_at', read_only=True)
+    previous_scan_task = serializers.IntegerField(source='previous.scan_task_id', read_only=True, default=None)
+    
+    class Meta:
+        model = ScanSnapshot
+        fields = [
+            'scan_task', 'previous_scan_task', 'tool_name', 'scan_type', 'commit_sha',
+            'total', 'severity_counts', 'cwe_counts', 'added_count', 'removed_count',
+            'completed_at', 'created_at'
+        ]
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """报告生成任务序列化器"""
+    project_name = serializers.CharField(source='project.name', read_only=True, default=None)
+    department_name = serializers.CharField(source='department.name', read_only=True, default=None)
+    download_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ReportJob
+        fields = [
+            'id', 'scope', 'project', 'project_name', 'department', 'department_name',
+            'format', 'status', 'data_version', 'file_size', 'error_message', 'download_url',
+            'created_at', 'started_at', 'completed_at'
+        ]
+    
+    def get_download_url(self, obj):
+        if obj.status == 'completed':
+            return f'/api/v1/reports/{obj.id}/download/'
+        return None
+
+
 class FindingSerializer(serializers.ModelSerializer):
     """漏洞发现序列化器（列表视图）"""
     project_name = serializers.CharField(source='project.name', read_only=True)
@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     DepartmentViewSet, ProjectViewSet, ScanTaskViewSet, 
-    FindingViewSet, GlobalStatisticsViewSet
+    FindingViewSet, GlobalStatisticsViewSet, ReportJobViewSet
 )
 from .documentation_views import api_overview_view, api_docs_view
 from .login_control import login_control_api
@@ -80,6 +80,7 @@ router.register(r'projects', ProjectViewSet)
 router.register(r'scans', ScanTaskViewSet)
 router.register(r'findings', FindingViewSet)
 router.register(r'statistics', GlobalStatisticsViewSet, basename='statistics')
+router.register(r'reports', ReportJobViewSet)
 
 urlpatterns = [
     path('', api_docs_view, name='api-root'),
@@ -3,22 +3,37 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .permissions import SmartIsAuthenticated, DepartmentPermission, ProjectPermission, ScanPermission, FindingPermission
+from rest_framework.renderers import JSONRenderer
+from .renderers import EventStreamRenderer
+from .permissions import (
+    SmartIsAuthenticated, DepartmentPermission, ProjectPermission, ScanPermission, FindingPermission, ReportPermission
+)
 from django_filters.rest_framework import DjangoFilterBackend
 from django.shortcuts import get_object_or_404
-from datetime import datetime
+from django.http import FileResponse, StreamingHttpResponse
+from django.conf import settings
+from django.db.models import Q
 
 from core.models import Project, Finding, ScanTask, Department
+from statistics.models import ScanSnapshot, ReportJob
 from .serializers import (
     ProjectSerializer, FindingSerializer, ScanTaskSerializer, 
-    DepartmentSerializer, FindingDetailSerializer
+    DepartmentSerializer, FindingDetailSerializer, ScanSnapshotSerializer, ReportJobSerializer
 )
 from statistics.services import SecurityStatisticsService, ReportGenerator
+from statistics.trends import TrendEngine
+from statistics.rollups import rollup_service
+from statistics.snapshots import assign_fingerprints, snapshot_service
+from statistics.hotspots import hotspot_service
+from statistics.report_jobs import report_job_service
 from ai_analysis.services import ai_analysis_service
 from translation.services import translation_service
 from parsers.sarif_parser import parse_sarif_file
+from core.scanners.fake import fake_url_allowed
 from django.utils import timezone
-from core.authorization.authorization import filter_queryset_by_permission
+from core.authorization.authorization import (
+    filter_queryset_by_permission, get_accessible_departments, get_accessible_projects
+)
 from core.authorization.roles_permissions import Permissions
 
 logger = logging.getLogger(__name__)
@@ -96,6 +111,50 @@ class ProjectViewSet(viewsets.ModelViewSet):
         serializer = FindingSerializer(findings, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def scan_history(self, request, pk=None):
+        """项目最近的扫描快照（按扫描先后排列）：每次扫描的漏洞数、分布和新增/修复数"""
+        project = self.get_object()
+        try:
+            limit = min(max(1, int(request.query_params.get('limit', 30))), 365)
+        except ValueError:
+            return Response({'error': 'limit 必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        snapshots = list(
+            project.scan_snapshots.select_related('scan_task', 'previous')
+            .defer('fingerprints', 'added', 'removed', 'previous__fingerprints', 'previous__added', 'previous__removed')
+            .order_by('-scan_task_id')[:limit]
+        )
+        snapshots.reverse()
+        return Response(ScanSnapshotSerializer(snapshots, many=True).data)
+    
+    @action(detail=True, methods=['get'])
+    def hotspots(self, request, pk=None):
+        """项目中活跃漏洞最集中的目录（可按层级、上级目录过滤）"""
+        project = self.get_object()
+        try:
+            depth = int(request.query_params['depth']) if request.query_params.get('depth') else None
+            limit = min(max(1, int(request.query_params.get('limit', 10))), 200)
+        except ValueError:
+            return Response({'error': 'depth、limit 必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+        order = request.query_params.get('order', 'severity')
+        if order not in ('severity', 'total'):
+            return Response({'error': f'不支持的排序方式: {order}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        hotspots = hotspot_service.top(project, depth, limit, request.query_params.get('under', ''), order)
+        return Response([
+            {
+                'path': hotspot.path,
+                'depth': hotspot.depth,
+                'total': hotspot.total,
+                '高危': hotspot.high_count,
+                '中危': hotspot.medium_count,
+                '低危': hotspot.low_count,
+                'file_count': hotspot.file_count,
+            }
+            for hotspot in hotspots
+        ])
+    
     @action(detail=True, methods=['get'])
     def report(self, request, pk=None):
         """生成项目报告"""
@@ -110,38 +169,32 @@ class ProjectViewSet(viewsets.ModelViewSet):
         git_url = request.data.get('git_url') or project.git_url
         branch = request.data.get('branch') or project.git_branch or 'main'
         language = request.data.get('language')  # 用户指定的语言
+        full_scan = str(request.data.get('full_scan', '')).lower() in ('1', 'true')  # 强制全量扫描
         
         if not git_url:
             return Response(
                 {'error': '请提供Git仓库地址'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if not fake_url_allowed(git_url):
+            return Response(
+                {'error': '模拟扫描引擎未启用，不能使用 fake:// 地址'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         try:
-            from core.scanner import AutoScanner
             from core.scan_queue import scan_queue
             
-            # 创建扫描任务
-            scan_task = ScanTask.objects.create(
-                project=project,
-                tool_name='auto',
-                scan_type='full',
-                status='pending'
+            # 加入扫描队列，项目已有排队或运行中的扫描时合并请求
+            scan_task, created = scan_queue.enqueue_project_scan(
+                project, git_url, branch, language, full_scan, reason='manual'
             )
             
-            # 创建扫描函数（不再创建新任务）
-            def scan_func():
-                scanner = AutoScanner(project)
-                # 直接调用扫描逻辑，传入已存在的scan_task和语言参数
-                return scanner.execute_scan(git_url, branch, scan_task, language)
-            
-            # 添加到队列
-            scan_queue.add_task(scan_task.id, scan_func)
-            
             return Response({
                 'success': True,
                 'scan_task_id': scan_task.id,
-                'message': '扫描任务已加入队列',
+                'coalesced': not created,
+                'message': '扫描任务已加入队列' if created else '项目已有排队或运行中的扫描，已合并到该任务',
                 'queue_status': scan_queue.get_queue_status()
             })
             
@@ -161,18 +214,33 @@ class ProjectViewSet(viewsets.ModelViewSet):
             return Response({'error': '项目未配置Git地址'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            from core.scanner import AutoScanner
-            scanner = AutoScanner(project)
-            has_updates = scanner.check_git_updates(project.git_url, project.git_branch)
+            # 只用 git ls-remote 读取远程分支头，与最近一次扫描的提交比较
+            from core.change_detector import change_detector
+            result = change_detector.check_project(project)
+            if result['status'] == 'error':
+                return Response({'error': result['error']}, status=status.HTTP_502_BAD_GATEWAY)
             
             return Response({
-                'has_updates': has_updates,
+                'has_updates': result['status'] == 'changed',
                 'git_url': project.git_url,
-                'branch': project.git_branch
+                'branch': result['branch'],
+                'remote_head': result['remote_head'],
+                'last_scanned': result['last_scanned'],
             })
             
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['post'])
+    def detect_changes(self, request):
+        """立即检查所有启用自动扫描的项目，为远程分支有变化的项目加入扫描"""
+        from core.change_detector import change_detector
+        results = change_detector.check_all()
+        return Response({
+            'checked': len(results),
+            'changed': sum(1 for r in results if r['status'] == 'changed'),
+            'results': results,
+        })
 
 
 class ScanTaskViewSet(viewsets.ModelViewSet):
@@ -186,14 +254,38 @@ class ScanTaskViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_at', 'completed_at']
     ordering = ['-created_at']
     
+    def perform_destroy(self, instance):
+        """删除扫描任务（级联删除其漏洞），重算漏洞所在的汇总分区"""
+        partitions = rollup_service.partitions(Finding.objects.filter(scan_task=instance))
+        instance.delete()
+        rollup_service.refresh(partitions)
+    
     @action(detail=True, methods=['get'])
     def logs(self, request, pk=None):
         """获取扫描日志"""
         scan_task = self.get_object()
         
-        # 支持实时查询
+        # 按字节偏移量增量读取，不再读取整个日志
+        offset = request.query_params.get('offset')
+        if offset is not None:
+            from core.scan_log import read_scan_log_from
+            try:
+                offset = max(0, int(offset))
+            except ValueError:
+                return Response({'error': 'offset 必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+            new_logs, next_offset = read_scan_log_from(scan_task, offset)
+            return Response({
+                'logs': new_logs,
+                'offset': next_offset,
+                'status': scan_task.status,
+                'error_message': scan_task.error_message,
+                'is_running': scan_task.status in ('running', 'scanned')
+            })
+        
+        # 支持实时查询（按行号，兼容旧客户端）
+        from core.scan_log import read_scan_log_lines
         last_line = int(request.query_params.get('last_line', 0))
-        logs = scan_task.scan_log.split('\n') if scan_task.scan_log else []
+        logs = read_scan_log_lines(scan_task)
         
         if last_line < len(logs):
             new_logs = logs[last_line:]
@@ -205,7 +297,54 @@ class ScanTaskViewSet(viewsets.ModelViewSet):
             'total_lines': len(logs),
             'status': scan_task.status,
             'error_message': scan_task.error_message,
-            'is_running': scan_task.status == 'running'
+            'is_running': scan_task.status in ('running', 'scanned')
+        })
+    
+    @action(detail=True, methods=['get'], renderer_classes=[EventStreamRenderer, JSONRenderer])
+    def log_stream(self, request, pk=None):
+        """推送扫描日志和状态变化（SSE），从offset或Last-Event-ID指定的字节偏移量续传"""
+        scan_task = self.get_object()
+        from core.scan_log import scan_log_event_stream
+        
+        offset = request.META.get('HTTP_LAST_EVENT_ID') or request.query_params.get('offset', 0)
+        try:
+            offset = max(0, int(offset))
+        except (TypeError, ValueError):
+            offset = 0
+        
+        response = StreamingHttpResponse(
+            scan_log_event_stream(scan_task, offset),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    @action(detail=True, methods=['get'])
+    def delta(self, request, pk=None):
+        """相对同项目上一次扫描新增、修复（消失）的漏洞"""
+        scan_task = self.get_object()
+        snapshot = ScanSnapshot.objects.filter(scan_task=scan_task).select_related('previous').first()
+        if not snapshot:
+            return Response({'error': '扫描任务没有快照'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            limit = min(max(1, int(request.query_params.get('limit', 100))), 1000)
+        except ValueError:
+            return Response({'error': 'limit 必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        added = Finding.objects.filter(
+            scan_task=scan_task, fingerprint__in=snapshot.added[:limit]
+        ).select_related('project__department')
+        removed = Finding.objects.none()
+        if snapshot.previous:
+            removed = Finding.objects.filter(
+                scan_task_id=snapshot.previous.scan_task_id, fingerprint__in=snapshot.removed[:limit]
+            ).select_related('project__department')
+        
+        return Response({
+            'snapshot': ScanSnapshotSerializer(snapshot).data,
+            'added': FindingSerializer(added, many=True).data,
+            'removed': FindingSerializer(removed, many=True).data,
         })
     
     @action(detail=True, methods=['post'])
@@ -226,11 +365,14 @@ class ScanTaskViewSet(viewsets.ModelViewSet):
             
             from core.models import Finding
             findings = parse_sarif_file(scan_task.report_file, scan_task.project, scan_task)
+            assign_fingerprints(findings)
             Finding.objects.bulk_create(findings)
+            rollup_service.refresh({(finding.project_id, finding.date) for finding in findings})
             
             scan_task.status = 'completed'
             scan_task.total_findings = len(findings)
             scan_task.save()
+            snapshot_service.safe_record(scan_task)
             
             return Response({
                 'message': f'手动解析完成，共{len(findings)}个漏洞',
@@ -248,68 +390,42 @@ class ScanTaskViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def kill_task(self, request, pk=None):
-        """终止扫描任务"""
+        """终止扫描任务 - 只终止该任务自己的进程组，不影响其他项目的扫描"""
         scan_task = self.get_object()
         
-        if scan_task.status != 'running':
+        if scan_task.status not in ('pending', 'running'):
             return Response(
-                {'error': '只能终止运行中的任务'}, 
+                {'error': '只能终止排队中或运行中的任务'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         try:
             import subprocess
             import os
-            
-            project_id = scan_task.project.id
             from django.conf import settings
-            project_path = os.path.join(settings.AUTO_SCAN_CONFIG['PROJECT_DIR'], scan_task.project.department.name, scan_task.project.name)
-            
-            # 1. 杀死所有包含项目路径的进程
-            subprocess.run(f"pkill -9 -f '{project_path}' 2>/dev/null || true", shell=True)
-            
-            # 2. 杀死所有包含项目 ID 的进程
-            subprocess.run(f"pkill -9 -f 'scan_{project_id}' 2>/dev/null || true", shell=True)
-            
-            # 3. 杀死所有扫描工具进程
-            subprocess.run("pkill -9 -f 'codeql.*database.*create' 2>/dev/null || true", shell=True)
-            subprocess.run("pkill -9 -f 'codeql.*analyze' 2>/dev/null || true", shell=True)
-            subprocess.run("pkill -9 -f 'semgrep.*--sarif' 2>/dev/null || true", shell=True)
+            from core.process_control import process_tracker, CANCELLED_MESSAGE
+            from core.scan_log import append_scan_log
             
-            # 4. 杀死在项目目录下的npm/node进程
-            subprocess.run(f"lsof +D '{project_path}' 2>/dev/null | awk 'NR>1 {{print $2}}' | xargs -r kill -9 2>/dev/null || true", shell=True)
+            # 1. 标记取消并终止该任务的进程组（先SIGTERM，宽限期后SIGKILL）
+            pgids = process_tracker.cancel(scan_task)
             
-            # 5. 杀死包含项目名的npm进程
-            subprocess.run(f"pkill -9 -f 'npm.*{scan_task.project.name}' 2>/dev/null || true", shell=True)
-            
-            # 6. 全面清理临时文件和目录
-            work_dir = settings.AUTO_SCAN_CONFIG['WORK_DIR']
-            temp_dirs = [
-                f"{work_dir}/scan_{project_id}",
-                f"{work_dir}/codeql-db-*",
-                f"{settings.BASE_DIR}/logs/scan_{project_id}*"
-            ]
-            
-            for temp_dir in temp_dirs:
-                subprocess.run(f"rm -rf {temp_dir} 2>/dev/null || true", shell=True)
-            
-            # 7. 清理可能的锁文件
-            subprocess.run(f"rm -f {project_path}/.git/index.lock 2>/dev/null || true", shell=True)
-            subprocess.run(f"rm -f {project_path}/package-lock.json.* 2>/dev/null || true", shell=True)
+            # 2. 清理该任务的临时目录和可能残留的锁文件
+            project_path = os.path.join(settings.AUTO_SCAN_CONFIG['PROJECT_DIR'], scan_task.project.department.name, scan_task.project.name)
+            work_dir = os.path.join(settings.AUTO_SCAN_CONFIG['WORK_DIR'], f'scan_{scan_task.project.id}')
+            subprocess.run(f"rm -rf '{work_dir}' 2>/dev/null || true", shell=True)
+            subprocess.run(f"rm -f '{project_path}/.git/index.lock' 2>/dev/null || true", shell=True)
             
-            # 8. 更新任务状态
-            scan_task.status = 'failed'
-            scan_task.error_message = '用户手动终止任务'
-            scan_task.save()
+            # 3. 更新任务状态（只更新状态字段，不覆盖扫描线程同时写入的日志、进程组和扫描配置）
+            ScanTask.objects.filter(pk=scan_task.pk, status__in=('pending', 'running')).update(
+                status='failed', error_message=CANCELLED_MESSAGE, completed_at=timezone.now()
+            )
             
-            # 9. 记录终止日志
-            if scan_task.scan_log:
-                scan_task.scan_log += f"\n{datetime.now().strftime('%H:%M:%S')} [KILL] 任务已被终止，所有相关进程已清理"
-            else:
-                scan_task.scan_log = f"{datetime.now().strftime('%H:%M:%S')} [KILL] 任务已被终止"
-            scan_task.save()
+            # 4. 记录终止日志
+            scan_task.refresh_from_db(fields=['scan_log'])
+            append_scan_log(scan_task, f"[KILL] 任务已被终止，已终止进程组: {pgids or '无'}")
+            scan_task.save(update_fields=['scan_log'])
             
-            return Response({'message': '任务已终止'})
+            return Response({'message': '任务已终止', 'process_groups': pgids})
             
         except Exception as e:
             return Response(
@@ -341,7 +457,9 @@ class ScanTaskViewSet(viewsets.ModelViewSet):
             )
             
             # 批量创建漏洞记录
+            assign_fingerprints(findings)
             Finding.objects.bulk_create(findings)
+            rollup_service.refresh({(finding.project_id, finding.date) for finding in findings})
             
             # 更新统计信息 - 三级分级
             scan_task.total_findings = len(findings)
@@ -352,6 +470,7 @@ class ScanTaskViewSet(viewsets.ModelViewSet):
             scan_task.info_count = 0  # 不再使用
             scan_task.status = 'completed'
             scan_task.save()
+            snapshot_service.safe_record(scan_task)
             
             return Response({
                 'message': f'成功解析 {len(findings)} 个漏洞',
@@ -394,6 +513,9 @@ class FindingViewSet(viewsets.ModelViewSet):
             return FindingDetailSerializer
         return FindingSerializer
     
+    def perform_destroy(self, instance):
+        rollup_service.delete(Finding.objects.filter(pk=instance.pk))
+    
     @action(detail=True, methods=['post'])
     def ai_analyze(self, request, pk=None):
         """AI分析单个漏洞"""
@@ -435,10 +557,11 @@ class FindingViewSet(viewsets.ModelViewSet):
             
             # 更新所有漏洞的AI分析结果
             if 'analysis' in result and result['analysis'].get('success'):
-                for finding in findings:
-                    finding.ai_analysis = result['analysis']
-                    finding.ai_cached = result['cached']
-                    finding.save()
+                with rollup_service.batch():
+                    for finding in findings:
+                        finding.ai_analysis = result['analysis']
+                        finding.ai_cached = result['cached']
+                        finding.save()
             
             return Response(result)
             
@@ -533,15 +656,68 @@ class FindingViewSet(viewsets.ModelViewSet):
         """获取漏洞统计信息"""
         queryset = self.filter_queryset(self.get_queryset())
         
-        stats = {
-            'severity_stats': SecurityStatisticsService.get_severity_statistics(queryset),
-            'status_stats': SecurityStatisticsService.get_status_statistics(queryset),
-            'sla_stats': SecurityStatisticsService.get_sla_statistics(queryset)
-        }
+        stats = SecurityStatisticsService.get_finding_statistics(queryset)
         
         return Response(stats)
 
 
+class ReportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """报告生成任务视图集 - 提交PDF/XLSX/CSV报告生成、查询状态、下载"""
+    queryset = ReportJob.objects.select_related('project', 'department').order_by('-created_at')
+    serializer_class = ReportJobSerializer
+    permission_classes = [ReportPermission]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['scope', 'project', 'department', 'status']
+    
+    def get_queryset(self):
+        """只返回用户有统计查看权限、且可访问其项目或部门的报告任务"""
+        queryset = super().get_queryset()
+        if getattr(settings, 'DISABLE_LOGIN', False):
+            return queryset
+        
+        user = self.request.user
+        return filter_queryset_by_permission(user, queryset, Permissions.STATISTICS_VIEW).filter(
+            Q(project__isnull=True) | Q(project__in=get_accessible_projects(user)),
+            Q(department__isnull=True) | Q(department__in=get_accessible_departments(user))
+        )
+    
+    def create(self, request):
+        """提交报告生成：数据没有变化时返回已生成或正在生成的任务"""
+        scope = request.data.get('scope', 'project')
+        fmt = request.data.get('format', 'pdf')
+        project = department = None
+        if scope == 'project':
+            project = get_object_or_404(get_accessible_projects(request.user), pk=request.data.get('project'))
+        elif scope == 'department':
+            department = get_object_or_404(get_accessible_departments(request.user), pk=request.data.get('department'))
+        elif scope != 'global':
+            return Response({'error': f'不支持的报告范围: {scope}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # 禁用登录时是匿名用户，不记录提交人
+        user = request.user if request.user.is_authenticated else None
+        try:
+            job, reused = report_job_service.request(scope, fmt, project, department, user)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(
+            {**ReportJobSerializer(job).data, 'cached': reused},
+            status=status.HTTP_200_OK if reused else status.HTTP_202_ACCEPTED
+        )
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """下载已生成的报告文件"""
+        job = self.get_object()
+        if job.status != 'completed':
+            return Response({'error': f'报告尚未生成完成（{job.get_status_display()}）'}, status=status.HTTP_409_CONFLICT)
+        if not job.artifact_exists:
+            return Response({'error': '报告文件已被清理，请重新生成'}, status=status.HTTP_410_GONE)
+        
+        name = job.project.name if job.project else job.department.name if job.department else 'global'
+        filename = f"{name}_{timezone.localtime(job.completed_at):%Y%m%d}.{job.format}"
+        return FileResponse(open(job.artifact_path, 'rb'), as_attachment=True, filename=filename)
+
+
 class GlobalStatisticsViewSet(viewsets.ViewSet):
     """全局统计视图集"""
     permission_classes = [SmartIsAuthenticated]
@@ -571,11 +747,83 @@ class GlobalStatisticsViewSet(viewsets.ViewSet):
         projects = SecurityStatisticsService.get_top_vulnerable_projects(limit)
         return Response(projects)
     
+    @action(detail=False, methods=['get'])
+    def trends(self, request):
+        """获取新增、修复、活跃漏洞趋势（按日/周/月）"""
+        bucket = request.query_params.get('bucket', 'day')
+        try:
+            days = int(request.query_params.get('days', 30))
+            project_id = int(request.query_params['project']) if request.query_params.get('project') else None
+        except ValueError:
+            return Response({'error': 'days、project 必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+        # 限制时间范围，避免按日生成超长序列
+        days = min(max(days, 1), 730)
+        findings = Finding.objects.all()
+        if request.query_params.get('department'):
+            findings = findings.filter(project__department__name=request.query_params['department'])
+        if project_id is not None:
+            findings = findings.filter(project_id=project_id)
+        
+        try:
+            series = TrendEngine(findings).series(bucket=bucket, days=days)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'bucket': bucket, 'days': days, 'series': series})
+    
+    @action(detail=False, methods=['get'])
+    def aging(self, request):
+        """获取修复时效统计：MTTR、漏洞年龄中位数和年龄分布（按部门/项目/严重程度/CWE分组）"""
+        group_by = request.query_params.get('group_by', 'department')
+        try:
+            days = int(request.query_params.get('days', 90))
+            project_id = int(request.query_params['project']) if request.query_params.get('project') else None
+        except ValueError:
+            return Response({'error': 'days、project 必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            stats = SecurityStatisticsService.get_aging_statistics(
+                group_by, days, request.query_params.get('department'), project_id
+            )
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(stats)
+    
+    @action(detail=False, methods=['get'])
+    def scan_timing(self, request):
+        """获取扫描各阶段耗时分位数（按项目或引擎分组）"""
+        group_by = request.query_params.get('group_by', 'engine')
+        try:
+            days = int(request.query_params.get('days', 30))
+            project_id = int(request.query_params['project']) if request.query_params.get('project') else None
+        except ValueError:
+            return Response({'error': 'days、project 必须是整数'}, status=status.HTTP_400_BAD_REQUEST)
+        days = min(max(days, 1), 730)
+        
+        try:
+            stats = SecurityStatisticsService.get_scan_stage_statistics(group_by, days, project_id)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(stats)
+    
     @action(detail=False, methods=['get'])
     def queue_status(self, request):
         """获取扫描队列状态"""
         from core.scan_queue import scan_queue
         return Response(scan_queue.get_queue_status())
+    
+    @action(detail=False, methods=['get'])
+    def workspace(self, request):
+        """获取工作空间磁盘占用（?refresh=1 重新统计）"""
+        from core.workspace import workspace_manager
+        refresh = request.query_params.get('refresh') in ('1', 'true')
+        return Response(workspace_manager.get_usage(refresh=refresh))
+    
+    @action(detail=False, methods=['post'])
+    def workspace_cleanup(self, request):
+        """立即检查工作空间配额，在后台淘汰超出配额的条目"""
+        from core.workspace import workspace_manager
+        workspace_manager.request_check()
+        return Response({'message': '已开始工作空间清理'}, status=status.HTTP_202_ACCEPTED)
 
 
 
@@ -4,6 +4,7 @@ from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.db.models import Q
 from .models import Department, Project, ScanTask, Finding, FindingNote, StatusHistory
+from statistics.rollups import rollup_service
 import subprocess
 import logging
 import os
@@ -77,7 +78,7 @@ class DepartmentAdmin(admin.ModelAdmin):
             finding_count = Finding.objects.filter(project__department=obj).count()
             task_count = ScanTask.objects.filter(project__department=obj).count()
             
-            Finding.objects.filter(project__department=obj).delete()
+            rollup_service.delete(Finding.objects.filter(project__department=obj))
             ScanTask.objects.filter(project__department=obj).delete()
             projects.delete()
             
@@ -179,7 +180,7 @@ class ProjectAdmin(admin.ModelAdmin):
             
             # 2. 删除所有相关的漏洞记录
             finding_count = Finding.objects.filter(project=obj).count()
-            Finding.objects.filter(project=obj).delete()
+            rollup_service.delete(Finding.objects.filter(project=obj))
             
             # 3. 删除所有相关的扫描任务
             task_count = ScanTask.objects.filter(project=obj).count()
@@ -234,6 +235,17 @@ class ScanTaskAdmin(admin.ModelAdmin):
     def render_change_form(self, request, context, *args, **kwargs):
         context['back_script'] = mark_safe('<script>document.addEventListener("DOMContentLoaded", function() { const h1 = document.querySelector("h1"); if (h1) { const btn = document.createElement("button"); btn.innerHTML = "← 返回"; btn.style.cssText = "margin-left: 15px; padding: 6px 12px; background: #6c757d; color: white; border: none; border-radius: 4px; font-size: 13px; cursor: pointer;"; btn.onclick = function() { history.back(); }; h1.appendChild(btn); } });</script>')
         return super().render_change_form(request, context, *args, **kwargs)
+    
+    def delete_model(self, request, obj):
+        """删除扫描任务（级联删除其漏洞），重算漏洞所在的汇总分区"""
+        partitions = rollup_service.partitions(Finding.objects.filter(scan_task=obj))
+        super().delete_model(request, obj)
+        rollup_service.refresh(partitions)
+    
+    def delete_queryset(self, request, queryset):
+        partitions = rollup_service.partitions(Finding.objects.filter(scan_task__in=queryset))
+        super().delete_queryset(request, queryset)
+        rollup_service.refresh(partitions)
 
 
 @admin.register(Finding)
@@ -320,24 +332,38 @@ class FindingAdmin(admin.ModelAdmin):
     ai_quality_badge.short_description = 'AI质量'
     ai_quality_badge.admin_order_field = 'ai_quality_rating'
     
+    def delete_model(self, request, obj):
+        rollup_service.delete(Finding.objects.filter(pk=obj.pk))
+    
+    def delete_queryset(self, request, queryset):
+        rollup_service.delete(queryset)
+    
     def mark_as_verified(self, request, queryset):
+        partitions = rollup_service.partitions(queryset)
         updated = queryset.update(verified=True, active=False)
+        rollup_service.refresh(partitions)
         self.message_user(request, f'已将 {updated} 个漏洞标记为已验证')
     mark_as_verified.short_description = '标记为已验证'
     
     def mark_as_false_positive(self, request, queryset):
+        partitions = rollup_service.partitions(queryset)
         updated = queryset.update(false_p=True, active=False)
+        rollup_service.refresh(partitions)
         self.message_user(request, f'已将 {updated} 个漏洞标记为误报')
     mark_as_false_positive.short_description = '标记为误报'
     
     def mark_as_mitigated(self, request, queryset):
         from django.utils import timezone
+        partitions = rollup_service.partitions(queryset)
         updated = queryset.update(is_mitigated=True, mitigated=timezone.now(), active=False)
+        rollup_service.refresh(partitions)
         self.message_user(request, f'已将 {updated} 个漏洞标记为已修复')
     mark_as_mitigated.short_description = '标记为已修复'
     
     def reactivate_findings(self, request, queryset):
+        partitions = rollup_service.partitions(queryset)
         updated = queryset.update(active=True, verified=False, false_p=False, is_mitigated=False, risk_accepted=False, duplicate=False, out_of_scope=False, under_review=False)
+        rollup_service.refresh(partitions)
         self.message_user(request, f'已重新激活 {updated} 个漏洞')
     reactivate_findings.short_description = '重新激活'
     
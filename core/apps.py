@@ -10,4 +10,16 @@ class CoreConfig(AppConfig):
         # 暴力禁用admin登录
         from .disable_login_patch import disable_admin_login
         disable_admin_login()
+        
+        # 只在提供服务的进程中启动远程变更检测（runserver自动重载时为子进程）
+        import os
+        import sys
+        if 'runserver' in sys.argv and (os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv):
+            from .change_detector import change_detector
+            change_detector.start()
+            
+            # 重新提交重启前已扫描完成、还没有入库的任务（在后台线程中查询数据库）
+            import threading
+            from .ingestion import ingestion_queue
+            threading.Thread(target=ingestion_queue.recover, daemon=True).start()
     verbose_name = '核心模块'
@@ -0,0 +1,131 @@
+import os
+import time
+import logging
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteChangeDetector:
+    """远程仓库变更检测 - 定期检查所有启用自动扫描的项目，分支头有变化时加入扫描队列
+
+    使用 git ls-remote 只读取远程分支头，不下载任何对象；所有项目并发检查，
+    并发数由 CHANGE_DETECT_WORKERS 限制。远程分支头与项目最近一次扫描的提交
+    不同时才加入扫描，已有排队或运行中扫描的项目由扫描队列合并请求。
+    """
+
+    def __init__(self):
+        self.thread = None
+        self.lock = threading.Lock()
+
+    @property
+    def config(self):
+        return settings.AUTO_SCAN_CONFIG
+
+    def get_remote_head(self, git_url, branch):
+        """获取远程分支头的提交，分支不存在时返回None"""
+        env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+        result = subprocess.run(
+            ['git', 'ls-remote', '--heads', git_url, f'refs/heads/{branch}'],
+            capture_output=True, text=True, env=env, timeout=self.config['CHANGE_DETECT_TIMEOUT']
+        )
+        if result.returncode != 0:
+            raise Exception(result.stderr.strip() or f"git ls-remote 退出码 {result.returncode}")
+        for line in result.stdout.splitlines():
+            sha, _, ref = line.partition('\t')
+            if ref == f'refs/heads/{branch}':
+                return sha
+        return None
+
+    def get_last_scanned_commit(self, project):
+        """项目最近一次扫描的提交（失败的扫描也计入，避免同一提交反复失败重扫）"""
+        from .models import ScanTask
+        return ScanTask.objects.filter(project=project).exclude(commit_sha='') \
+            .order_by('-created_at').values_list('commit_sha', flat=True).first()
+
+    def check_project(self, project):
+        """检查单个项目，返回检查结果"""
+        branch = project.git_branch or 'main'
+        result = {'project_id': project.id, 'project': str(project), 'branch': branch}
+        try:
+            remote_head = self.get_remote_head(project.git_url, branch)
+        except Exception as e:
+            result.update({'status': 'error', 'error': str(e)})
+            return result
+
+        last_commit = self.get_last_scanned_commit(project)
+        result.update({'remote_head': remote_head, 'last_scanned': last_commit})
+        if remote_head is None:
+            result['status'] = 'branch_missing'
+        elif remote_head == last_commit:
+            result['status'] = 'unchanged'
+        else:
+            result['status'] = 'changed'
+        return result
+
+    def check_all(self):
+        """并发检查所有启用自动扫描的项目，为有变化的项目加入扫描"""
+        from .models import Project
+        from .scan_queue import scan_queue
+
+        projects = list(
+            Project.objects.filter(auto_scan_enabled=True, is_active=True)
+            .exclude(git_url='').select_related('department')
+        )
+        if not projects:
+            return []
+
+        def _check(project):
+            try:
+                return self.check_project(project)
+            finally:
+                connection.close()
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.config['CHANGE_DETECT_WORKERS']) as executor:
+            results = list(executor.map(_check, projects))
+
+        projects_by_id = {project.id: project for project in projects}
+        for result in results:
+            if result['status'] != 'changed':
+                continue
+            scan_task, created = scan_queue.enqueue_project_scan(
+                projects_by_id[result['project_id']], reason='remote_change'
+            )
+            result['scan_task_id'] = scan_task.id
+            result['coalesced'] = not created
+
+        changed = sum(1 for r in results if r['status'] == 'changed')
+        errors = sum(1 for r in results if r['status'] == 'error')
+        logger.info(f"远程变更检测完成: {len(results)} 个项目, {changed} 个有变化, {errors} 个失败, "
+                    f"耗时 {time.monotonic() - start:.1f}s")
+        return results
+
+    def start(self):
+        """启动后台检测线程（CHANGE_DETECT_INTERVAL为0时不启动）"""
+        if not self.config['CHANGE_DETECT_INTERVAL']:
+            return
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        logger.info("远程变更检测线程已启动")
+
+    def _run(self):
+        while True:
+            time.sleep(self.config['CHANGE_DETECT_INTERVAL'])
+            try:
+                self.check_all()
+            except Exception as e:
+                logger.error(f"远程变更检测失败: {e}")
+            finally:
+                connection.close()
+
+
+# 全局变更检测器
+change_detector = RemoteChangeDetector()
@@ -191,6 +191,7 @@ CHOICES = {
     'STATUS_CHOICES': [
         ('pending', '待处理'),
         ('running', '运行中'),
+        ('scanned', '已扫描，入库中'),
         ('completed', '已完成'),
         ('failed', '失败'),
         ('cancelled', '已取消'),
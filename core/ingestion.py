@@ -0,0 +1,123 @@
+import logging
+import threading
+from queue import Queue
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionQueue:
+    """入库队列 - 扫描器执行完成后，解析报告、翻译、读取源码、blame和写库在独立的线程池执行
+
+    扫描工作线程把报告交给入库队列后立即开始下一个扫描。入库完成前，同一项目的下一次扫描
+    不会开始（扫描队列跳过该项目），避免git pull改变入库正在读取的源码。
+    """
+
+    def __init__(self):
+        self.queue = Queue()
+        self.lock = threading.Lock()
+        self.workers = []
+        # 排队中和入库中的任务: 扫描任务ID -> 项目ID
+        self.pending = {}
+        self.running = set()
+
+    @property
+    def config(self):
+        return settings.AUTO_SCAN_CONFIG
+
+    def submit(self, scan_task, ingest_func):
+        """提交入库任务"""
+        with self.lock:
+            self.pending[scan_task.id] = scan_task.project_id
+        self.queue.put((scan_task.id, ingest_func))
+        logger.info(f"扫描任务 {scan_task.id} 已加入入库队列，当前队列长度: {self.queue.qsize()}")
+        self.start()
+
+    def recover(self):
+        """重新提交服务重启前已扫描完成、还没有入库的任务，返回重新提交的任务数
+
+        入库数据由 scan_config['ingest'] 恢复；没有保存入库数据或基线任务已删除的任务标记为失败。
+        只在提供服务的进程启动时执行一次（其他进程执行会与服务进程重复入库）。
+        """
+        from .models import ScanTask
+        from .scanner import AutoScanner
+
+        count = 0
+        try:
+            for scan_task in ScanTask.objects.filter(status='scanned').select_related(
+                'project__department'
+            ).order_by('scanned_at'):
+                with self.lock:
+                    if scan_task.id in self.pending:
+                        continue
+                try:
+                    scanner, source_path, reports = AutoScanner.restore_ingest(scan_task)
+                except Exception as e:
+                    logger.warning(f"扫描任务 {scan_task.id} 无法恢复入库: {e}")
+                    ScanTask.objects.filter(pk=scan_task.id, status='scanned').update(
+                        status='failed', error_message=f"入库失败: 服务重启后无法恢复入库（{e}）",
+                        completed_at=timezone.now()
+                    )
+                    continue
+                self.submit(scan_task, lambda scan_task=scan_task, scanner=scanner, source_path=source_path,
+                            reports=reports: scanner.ingest(scan_task, source_path, reports))
+                count += 1
+            if count:
+                logger.info(f"已重新提交 {count} 个服务重启前未入库的扫描任务")
+        except Exception as e:
+            logger.error(f"恢复未入库的扫描任务失败: {e}")
+        finally:
+            connection.close()
+        return count
+
+    def busy_projects(self):
+        """有任务排队入库或正在入库的项目"""
+        with self.lock:
+            return set(self.pending.values())
+
+    def start(self):
+        """启动入库线程"""
+        with self.lock:
+            self.workers = [worker for worker in self.workers if worker.is_alive()]
+            for _ in range(max(1, self.config['INGESTION_WORKERS']) - len(self.workers)):
+                worker = threading.Thread(target=self._worker, daemon=True)
+                worker.start()
+                self.workers.append(worker)
+
+    def _worker(self):
+        from .models import ScanTask
+        from .scan_queue import scan_queue
+
+        while True:
+            scan_task_id, ingest_func = self.queue.get()
+            with self.lock:
+                self.running.add(scan_task_id)
+            try:
+                ingest_func()
+            except Exception as e:
+                logger.error(f"扫描任务 {scan_task_id} 入库失败: {e}")
+                ScanTask.objects.filter(pk=scan_task_id, status='scanned').update(
+                    status='failed', error_message=f"入库失败: {e}", completed_at=timezone.now()
+                )
+            finally:
+                with self.lock:
+                    self.pending.pop(scan_task_id, None)
+                    self.running.discard(scan_task_id)
+                connection.close()
+                # 等待该项目入库的扫描可以开始了
+                scan_queue.wake()
+
+    def get_status(self):
+        """入库队列状态"""
+        with self.lock:
+            return {
+                'workers': sum(1 for worker in self.workers if worker.is_alive()),
+                'queue_size': len(self.pending) - len(self.running),
+                'ingesting': sorted(self.running),
+            }
+
+
+# 全局入库队列实例
+ingestion_queue = IngestionQueue()
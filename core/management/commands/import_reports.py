@@ -5,6 +5,8 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 from core.models import Project, ScanTask, Finding
 from parsers.sarif_parser import EnhancedSARIFParser
+from statistics.rollups import rollup_service
+from statistics.snapshots import assign_fingerprints, snapshot_service
 
 class Command(BaseCommand):
     help = '扫描并导入SARIF报告文件'
@@ -180,7 +182,7 @@ class Command(BaseCommand):
 
             if self.force and existing_findings > 0:
                 if not self.dry_run:
-                    Finding.objects.filter(scan_task=scan_task).delete()
+                    rollup_service.delete(Finding.objects.filter(scan_task=scan_task))
                 self.stdout.write(f'  ↻ 强制重新导入，删除已有 {existing_findings} 个漏洞')
 
             # 解析SARIF文件
@@ -189,16 +191,19 @@ class Command(BaseCommand):
                 
                 # 批量保存Finding对象到数据库
                 saved_findings = []
-                for finding in findings:
-                    try:
-                        finding.save()
-                        saved_findings.append(finding)
-                    except Exception as e:
-                        self.stdout.write(f'    ⚠ 保存漏洞失败: {str(e)}')
+                assign_fingerprints(findings)
+                with rollup_service.batch():
+                    for finding in findings:
+                        try:
+                            finding.save()
+                            saved_findings.append(finding)
+                        except Exception as e:
+                            self.stdout.write(f'    ⚠ 保存漏洞失败: {str(e)}')
                 
                 # 更新扫描任务状态
                 scan_task.status = 'completed'
                 scan_task.save()
+                snapshot_service.safe_record(scan_task)
                 
                 stats['findings_imported'] += len(saved_findings)
                 self.stdout.write(f'  ✓ 导入 {len(saved_findings)} 个漏洞')
@@ -0,0 +1,75 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.scanners.rule_cache import rule_cache, RuleCacheError
+
+
+class Command(BaseCommand):
+    help = '刷新扫描规则本地缓存（Semgrep规则包、CodeQL查询编译缓存）'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--semgrep-only',
+            action='store_true',
+            help='只刷新Semgrep规则包',
+        )
+        parser.add_argument(
+            '--codeql-only',
+            action='store_true',
+            help='只预编译CodeQL查询',
+        )
+        parser.add_argument(
+            '--clear-codeql',
+            action='store_true',
+            help='预编译前清空CodeQL编译缓存（CodeQL版本或规则升级后使用）',
+        )
+        parser.add_argument(
+            '--status',
+            action='store_true',
+            help='查看缓存状态',
+        )
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self.show_status()
+            return
+
+        errors = []
+        if not options['codeql_only']:
+            for pack in settings.AUTO_SCAN_CONFIG['SEMGREP_RULE_PACKS'].values():
+                try:
+                    version, updated = rule_cache.refresh_semgrep_pack(pack)
+                    if updated:
+                        self.stdout.write(self.style.SUCCESS(f'✓ Semgrep规则包 {pack} 已更新到版本 {version}'))
+                    else:
+                        self.stdout.write(f'Semgrep规则包 {pack} 无变化，当前版本 {version}')
+                except Exception as e:
+                    errors.append(f'Semgrep规则包 {pack}: {e}')
+                    self.stdout.write(self.style.ERROR(f'✗ 下载Semgrep规则包 {pack} 失败: {e}'))
+
+        if not options['semgrep_only']:
+            clear = options['clear_codeql']
+            for language in rule_cache.CODEQL_SUITES:
+                if not os.path.exists(rule_cache.get_codeql_suite(language)):
+                    self.stdout.write(f'跳过{language}：查询套件不存在')
+                    continue
+                try:
+                    rule_cache.warm_codeql_cache(language, clear=clear)
+                    clear = False
+                    self.stdout.write(self.style.SUCCESS(f'✓ CodeQL {language} 查询已预编译'))
+                except RuleCacheError as e:
+                    errors.append(str(e))
+                    self.stdout.write(self.style.ERROR(f'✗ {e}'))
+
+        if errors:
+            raise CommandError(f'{len(errors)} 项刷新失败')
+
+    def show_status(self):
+        status = rule_cache.status()
+        self.stdout.write('=== Semgrep规则包 ===')
+        if not status['semgrep']:
+            self.stdout.write('未缓存任何规则包')
+        for pack, info in status['semgrep'].items():
+            self.stdout.write(f"{pack}: 当前版本 {info['current']}，规则数 {info['rules']}，保留 {info['versions']} 个版本")
+        self.stdout.write('=== CodeQL编译缓存 ===')
+        self.stdout.write(f"{status['codeql_cache_dir']}: {status['codeql_cache_bytes'] / 1024 / 1024:.1f} MB")
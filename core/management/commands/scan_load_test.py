@@ -0,0 +1,155 @@
+import os
+import math
+import time
+import shutil
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum, Count
+from core.models import Department, Project, ScanTask, ScanStageTiming
+from core.scan_queue import scan_queue
+from core.scan_log import get_scan_log_path
+
+
+def percentile(values, percent):
+    """百分位数（最近秩）"""
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(0, math.ceil(percent / 100 * len(values)) - 1)
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = '使用模拟扫描引擎压测扫描队列、日志和入库（不需要CodeQL/Maven/Semgrep）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scans', type=int, default=100, help='提交的扫描数')
+        parser.add_argument('--projects', type=int, help='压测项目数（默认与扫描数相同；少于扫描数时同一项目的请求会被合并）')
+        parser.add_argument('--department', type=str, default='loadtest', help='压测项目所属部门')
+        parser.add_argument('--delay', type=float, default=5, help='每次模拟扫描的耗时（秒）')
+        parser.add_argument('--log-lines', type=int, default=1000, help='每次扫描输出的日志行数')
+        parser.add_argument('--findings', type=int, default=100, help='每次扫描生成的SARIF结果数')
+        parser.add_argument('--files', type=int, default=20, help='模拟仓库的源文件数')
+        parser.add_argument('--fail-rate', type=float, default=0, help='模拟扫描失败的概率')
+        parser.add_argument('--interval', type=float, default=0, help='提交扫描的间隔（秒），0表示一次全部提交')
+        parser.add_argument('--timeout', type=int, default=3600, help='等待全部完成的最长时间（秒）')
+        parser.add_argument('--cleanup', action='store_true', help='完成后删除压测项目、扫描记录和工作空间目录')
+
+    def handle(self, *args, **options):
+        if not settings.AUTO_SCAN_CONFIG['FAKE_ENGINES_ENABLED']:
+            raise CommandError('模拟扫描引擎未启用，请设置环境变量 SCAN_FAKE_ENGINES_ENABLED=True 后再压测')
+        scans = options['scans']
+        project_count = options['projects'] or scans
+        query = urlencode({
+            'delay': options['delay'],
+            'log_lines': options['log_lines'],
+            'findings': options['findings'],
+            'files': options['files'],
+            'fail_rate': options['fail_rate'],
+        })
+
+        department, _ = Department.objects.get_or_create(name=options['department'])
+        projects = []
+        for i in range(project_count):
+            name = f'loadtest-{i:04d}'
+            project, _ = Project.objects.update_or_create(
+                name=name, department=department,
+                defaults={
+                    'git_url': f'fake://{name}?{query}',
+                    'git_branch': 'main',
+                    'code_owner': 'loadtest',
+                    'auto_scan_enabled': False,
+                },
+            )
+            projects.append(project)
+
+        self.stdout.write(f'提交 {scans} 个模拟扫描到 {project_count} 个项目'
+                          f'（每次 {options["delay"]}s, {options["log_lines"]} 行日志, {options["findings"]} 个结果）')
+        start = time.monotonic()
+        task_ids, coalesced = set(), 0
+        for i in range(scans):
+            scan_task, created = scan_queue.enqueue_project_scan(projects[i % project_count], reason='load_test')
+            task_ids.add(scan_task.id)
+            coalesced += 0 if created else 1
+            if options['interval']:
+                time.sleep(options['interval'])
+        submit_time = time.monotonic() - start
+
+        # 等待全部扫描完成入库
+        deadline = time.monotonic() + options['timeout']
+        while True:
+            counts = dict(ScanTask.objects.filter(pk__in=task_ids).values_list('status').annotate(n=Count('id')))
+            done = counts.get('completed', 0) + counts.get('failed', 0)
+            self.stdout.write(
+                f'\r[{time.monotonic() - start:7.1f}s] 排队 {counts.get("pending", 0)}  扫描中 {counts.get("running", 0)}  '
+                f'入库中 {counts.get("scanned", 0)}  完成 {counts.get("completed", 0)}  失败 {counts.get("failed", 0)}',
+                ending=''
+            )
+            self.stdout.flush()
+            if done >= len(task_ids):
+                break
+            if time.monotonic() > deadline:
+                self.stdout.write(self.style.WARNING('\n等待超时，按已完成的任务统计'))
+                break
+            time.sleep(1)
+        wall_time = time.monotonic() - start
+        self.stdout.write('')
+
+        self.report(task_ids, submit_time, wall_time, coalesced)
+
+        if options['cleanup']:
+            self.cleanup(department, projects)
+
+    def report(self, task_ids, submit_time, wall_time, coalesced):
+        tasks = list(ScanTask.objects.filter(pk__in=task_ids))
+        completed = [task for task in tasks if task.status == 'completed']
+        failed = [task for task in tasks if task.status == 'failed']
+
+        def seconds(start, end):
+            return [(getattr(t, end) - getattr(t, start)).total_seconds()
+                    for t in tasks if getattr(t, start) and getattr(t, end)]
+
+        def line(label, values):
+            if not values:
+                return f'{label}: -'
+            return (f'{label}: 平均 {sum(values) / len(values):.2f}s  p50 {percentile(values, 50):.2f}s  '
+                    f'p95 {percentile(values, 95):.2f}s  最大 {max(values):.2f}s')
+
+        log_bytes = sum(
+            os.path.getsize(get_scan_log_path(task.id))
+            for task in tasks if os.path.exists(get_scan_log_path(task.id))
+        )
+        findings = sum(task.total_findings for task in completed)
+
+        self.stdout.write(self.style.SUCCESS('=== 压测结果 ==='))
+        self.stdout.write(f'扫描任务: {len(tasks)}（合并请求 {coalesced}），完成 {len(completed)}，失败 {len(failed)}')
+        self.stdout.write(f'总耗时: {wall_time:.1f}s（提交 {submit_time:.1f}s），'
+                          f'吞吐量 {len(completed) / wall_time * 60:.1f} 次扫描/分钟')
+        self.stdout.write(line('排队等待', seconds('created_at', 'started_at')))
+        self.stdout.write(line('扫描槽占用', seconds('started_at', 'scanned_at')))
+        self.stdout.write(line('入库延迟', seconds('scanned_at', 'ingested_at')))
+        self.stdout.write(line('端到端', seconds('created_at', 'completed_at')))
+        self.stdout.write(f'入库漏洞: {findings}，日志: {log_bytes / 1024 / 1024:.1f} MB')
+
+        self.stdout.write('各阶段累计耗时:')
+        stages = ScanStageTiming.objects.filter(scan_task_id__in=task_ids).values('stage').annotate(
+            total=Sum('duration'), calls=Sum('calls')
+        ).order_by('-total')
+        for stage in stages:
+            self.stdout.write(f"  {stage['stage']}: {stage['total']:.1f}s / {stage['calls']} 次")
+
+    def cleanup(self, department, projects):
+        config = settings.AUTO_SCAN_CONFIG
+        for task_id in ScanTask.objects.filter(project__in=projects).values_list('pk', flat=True):
+            if os.path.exists(get_scan_log_path(task_id)):
+                os.remove(get_scan_log_path(task_id))
+        for project in projects:
+            for root in (config['PROJECT_DIR'], config['OUTPUT_DIR']):
+                shutil.rmtree(os.path.join(root, department.name, project.name), ignore_errors=True)
+        Project.objects.filter(pk__in=[project.pk for project in projects]).delete()
+        if not Project.objects.filter(department=department).exists():
+            department.delete()
+            for root in (config['PROJECT_DIR'], config['OUTPUT_DIR']):
+                shutil.rmtree(os.path.join(root, department.name), ignore_errors=True)
+        self.stdout.write(f'已删除 {len(projects)} 个压测项目')
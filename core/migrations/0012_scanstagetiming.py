@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_add_ai_quality_rating'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanStageTiming',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=50, verbose_name='阶段')),
+                ('engine', models.CharField(blank=True, max_length=50, verbose_name='扫描引擎')),
+                ('started_at', models.DateTimeField(verbose_name='开始时间')),
+                ('duration', models.FloatField(verbose_name='耗时(秒)')),
+                ('peak_rss_kb', models.BigIntegerField(blank=True, null=True, verbose_name='峰值内存(KB)')),
+                ('calls', models.IntegerField(default=1, verbose_name='执行次数')),
+                ('success', models.BooleanField(default=True, verbose_name='是否成功')),
+                ('scan_task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stage_timings', to='core.scantask', verbose_name='扫描任务')),
+            ],
+            options={
+                'verbose_name': '扫描阶段耗时',
+                'verbose_name_plural': '扫描阶段耗时',
+                'ordering': ['started_at'],
+                'indexes': [models.Index(fields=['stage', 'engine'], name='core_scanst_stage_321b0f_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_scanstagetiming'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scantask',
+            name='cancel_requested',
+            field=models.BooleanField(default=False, verbose_name='已请求取消'),
+        ),
+        migrations.AddField(
+            model_name='scantask',
+            name='process_groups',
+            field=models.JSONField(blank=True, default=list, verbose_name='进程组'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_scantask_process_control'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scantask',
+            name='commit_sha',
+            field=models.CharField(blank=True, max_length=64, verbose_name='提交版本'),
+        ),
+    ]
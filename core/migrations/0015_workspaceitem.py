@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_scantask_commit_sha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkspaceItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(choices=[('projects', '项目源码'), ('scan_temp', '扫描临时文件'), ('cache', '构建缓存'), ('reports', '扫描报告')], max_length=20, verbose_name='类别')),
+                ('path', models.CharField(max_length=1000, unique=True, verbose_name='路径')),
+                ('size_bytes', models.BigIntegerField(default=0, verbose_name='占用空间(字节)')),
+                ('last_used_at', models.DateTimeField(verbose_name='最近使用时间')),
+                ('measured_at', models.DateTimeField(blank=True, null=True, verbose_name='统计时间')),
+            ],
+            options={
+                'verbose_name': '工作空间条目',
+                'verbose_name_plural': '工作空间条目',
+                'ordering': ['last_used_at'],
+                'indexes': [models.Index(fields=['category', 'last_used_at'], name='core_worksp_categor_884a4f_idx')],
+            },
+        ),
+    ]
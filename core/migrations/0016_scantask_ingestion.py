@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 04:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_workspaceitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scantask',
+            name='ingested_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='入库完成时间'),
+        ),
+        migrations.AddField(
+            model_name='scantask',
+            name='scanned_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='扫描完成时间'),
+        ),
+        migrations.AlterField(
+            model_name='scantask',
+            name='status',
+            field=models.CharField(choices=[('pending', '待处理'), ('running', '运行中'), ('scanned', '已扫描，入库中'), ('completed', '已完成'), ('failed', '失败')], default='pending', max_length=20, verbose_name='状态'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_scantask_ingestion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='finding',
+            name='fingerprint',
+            field=models.CharField(blank=True, db_index=True, max_length=40, verbose_name='指纹'),
+        ),
+    ]
@@ -34,6 +34,17 @@ class SeverityManager:
         "低危": "#28a745"   # 绿色
     }
     
+    # SLA修复期限（天），从发现日期起算
+    SLA_DAYS = {
+        "高危": 7,
+        "中危": 30,
+        "低危": 90
+    }
+    DEFAULT_SLA_DAYS = 90
+    
+    # 剩余天数不超过该值视为即将到期
+    SLA_DUE_SOON_DAYS = 7
+    
     @classmethod
     def cvss_to_severity(cls, cvss_score: float) -> str:
         """CVSS分数转严重程度 - 三级分级"""
@@ -62,10 +73,23 @@ class SeverityManager:
         """获取数值严重程度"""
         return cls.NUMERICAL_SEVERITY.get(severity, "S1")  # 默认低危
     
+    @classmethod
+    def get_severity_from_numerical(cls, numerical_severity: str, default: str = "低危") -> str:
+        """数值严重程度转严重程度"""
+        for severity, numerical in cls.NUMERICAL_SEVERITY.items():
+            if numerical == numerical_severity:
+                return severity
+        return default
+    
     @classmethod
     def get_severity_color(cls, severity: str) -> str:
         """获取严重程度颜色"""
         return cls.SEVERITY_COLORS.get(severity, "#6c757d")
+    
+    @classmethod
+    def get_sla_days(cls, severity: str) -> int:
+        """获取SLA修复期限（天）"""
+        return cls.SLA_DAYS.get(severity, cls.DEFAULT_SLA_DAYS)
 
 
 class Department(models.Model):
@@ -233,6 +257,7 @@ class ScanTask(models.Model):
     STATUS_CHOICES = [
         ('pending', '待处理'),
         ('running', '运行中'),
+        ('scanned', '已扫描，入库中'),
         ('completed', '已完成'),
         ('failed', '失败'),
     ]
@@ -259,6 +284,9 @@ class ScanTask(models.Model):
     
     # 时间信息
     started_at = models.DateTimeField(null=True, blank=True, verbose_name="开始时间")
+    # 扫描器执行完成（扫描槽释放）和结果入库完成的时间
+    scanned_at = models.DateTimeField(null=True, blank=True, verbose_name="扫描完成时间")
+    ingested_at = models.DateTimeField(null=True, blank=True, verbose_name="入库完成时间")
     completed_at = models.DateTimeField(null=True, blank=True, verbose_name="完成时间")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -269,6 +297,13 @@ class ScanTask(models.Model):
     # 扫描日志
     scan_log = models.TextField(blank=True, verbose_name="扫描日志")
     
+    # 扫描的代码版本，增量扫描以上一次扫描的提交为基线
+    commit_sha = models.CharField(max_length=64, blank=True, verbose_name="提交版本")
+    
+    # 进程控制 - 扫描子进程的进程组ID，用于精确取消
+    process_groups = models.JSONField(default=list, blank=True, verbose_name="进程组")
+    cancel_requested = models.BooleanField(default=False, verbose_name="已请求取消")
+    
     class Meta:
         verbose_name = "扫描任务"
         verbose_name_plural = "扫描任务"
@@ -285,6 +320,59 @@ class ScanTask(models.Model):
         return None
 
 
+class ScanStageTiming(models.Model):
+    """扫描阶段耗时 - 每个扫描任务的各阶段（克隆、编译、建库、分析、解析、入库等）耗时"""
+    
+    scan_task = models.ForeignKey(ScanTask, on_delete=models.CASCADE, related_name='stage_timings', verbose_name="扫描任务")
+    stage = models.CharField(max_length=50, verbose_name="阶段")
+    engine = models.CharField(max_length=50, blank=True, verbose_name="扫描引擎")
+    
+    started_at = models.DateTimeField(verbose_name="开始时间")
+    duration = models.FloatField(verbose_name="耗时(秒)")
+    peak_rss_kb = models.BigIntegerField(null=True, blank=True, verbose_name="峰值内存(KB)")
+    calls = models.IntegerField(default=1, verbose_name="执行次数")
+    success = models.BooleanField(default=True, verbose_name="是否成功")
+    
+    class Meta:
+        verbose_name = "扫描阶段耗时"
+        verbose_name_plural = "扫描阶段耗时"
+        ordering = ['started_at']
+        indexes = [
+            models.Index(fields=['stage', 'engine']),
+        ]
+    
+    def __str__(self):
+        return f"{self.scan_task_id} - {self.stage} - {self.duration:.1f}s"
+
+
+class WorkspaceItem(models.Model):
+    """工作空间条目 - 项目源码、扫描临时目录、构建缓存、扫描报告的磁盘占用和最近使用时间"""
+    
+    CATEGORY_CHOICES = [
+        ('projects', '项目源码'),
+        ('scan_temp', '扫描临时文件'),
+        ('cache', '构建缓存'),
+        ('reports', '扫描报告'),
+    ]
+    
+    category = models.CharField(max_length=20, choices=CATEGORY_CHOICES, verbose_name="类别")
+    path = models.CharField(max_length=1000, unique=True, verbose_name="路径")
+    size_bytes = models.BigIntegerField(default=0, verbose_name="占用空间(字节)")
+    last_used_at = models.DateTimeField(verbose_name="最近使用时间")
+    measured_at = models.DateTimeField(null=True, blank=True, verbose_name="统计时间")
+    
+    class Meta:
+        verbose_name = "工作空间条目"
+        verbose_name_plural = "工作空间条目"
+        ordering = ['last_used_at']
+        indexes = [
+            models.Index(fields=['category', 'last_used_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.category} - {self.path}"
+
+
 class Finding(models.Model):
     """漏洞发现模型 - 借鉴DefectDojo的完整设计"""
     
@@ -407,6 +495,7 @@ class Finding(models.Model):
     # 工具相关 - 保持可选
     vuln_id_from_tool = models.CharField(max_length=200, blank=True, verbose_name="工具漏洞ID")
     unique_id_from_tool = models.CharField(max_length=200, blank=True, verbose_name="工具唯一ID")
+    fingerprint = models.CharField(max_length=40, blank=True, db_index=True, verbose_name="指纹")
     
     # 关联 - 允许为空以便灵活保存
     project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True, verbose_name="项目")
@@ -441,15 +530,7 @@ class Finding(models.Model):
     
     def get_sla_days_remaining(self):
         """获取SLA剩余天数 - 借鉴DefectDojo"""
-        sla_days = {
-            "Critical": 7,
-            "High": 30,
-            "Medium": 90,
-            "Low": 180,
-            "Info": 365
-        }
-        
-        target_days = sla_days.get(self.severity, 90)
+        target_days = SeverityManager.get_sla_days(self.severity)
         days_since_found = (timezone.now().date() - self.date).days
         return max(0, target_days - days_since_found)
     
@@ -0,0 +1,189 @@
+import os
+import signal
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# 被取消的扫描任务的错误信息
+CANCELLED_MESSAGE = '用户手动终止任务'
+
+
+class ScanCancelled(Exception):
+    """扫描任务已被取消"""
+    pass
+
+
+def _group_alive(pgid):
+    try:
+        os.killpg(pgid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _reap(pid):
+    """回收已退出的进程组首进程，返回是否不再需要回收
+
+    run_command 用 wait4 等待子进程，绕过了 Popen 的记录；取消时不等待子进程退出，
+    由这里回收，否则会留下僵尸进程。不是本进程的子进程（取消请求来自其他进程）时忽略。
+    """
+    try:
+        return os.waitpid(pid, os.WNOHANG)[0] != 0
+    except ChildProcessError:
+        return True
+
+
+def terminate_process_groups(pgids, grace_period=None):
+    """终止进程组：先发送SIGTERM，宽限期后仍存活的进程组发送SIGKILL
+
+    SIGTERM同步发送，SIGKILL和回收子进程在后台线程中执行，调用方无需等待宽限期。
+    """
+    if grace_period is None:
+        grace_period = settings.AUTO_SCAN_CONFIG['CANCEL_GRACE_PERIOD']
+
+    pgids = [pgid for pgid in set(pgids) if pgid and pgid > 1]
+    for pgid in pgids:
+        try:
+            os.killpg(pgid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+        except Exception as e:
+            logger.warning(f"向进程组 {pgid} 发送SIGTERM失败: {e}")
+
+    def _escalate():
+        deadline = time.time() + grace_period
+        remaining = list(pgids)
+        while remaining and time.time() < deadline:
+            time.sleep(0.5)
+            # 首进程退出后是僵尸进程，进程组仍然存在，先回收再判断
+            remaining = [pgid for pgid in remaining if not _reap(pgid) or _group_alive(pgid)]
+        for pgid in remaining:
+            try:
+                os.killpg(pgid, signal.SIGKILL)
+                logger.info(f"进程组 {pgid} 未在宽限期内退出，已强制终止")
+            except ProcessLookupError:
+                pass
+            except Exception as e:
+                logger.warning(f"向进程组 {pgid} 发送SIGKILL失败: {e}")
+        deadline = time.time() + 5
+        while remaining and time.time() < deadline:
+            remaining = [pgid for pgid in remaining if not _reap(pgid)]
+            time.sleep(0.1)
+
+    if pgids:
+        threading.Thread(target=_escalate, daemon=True).start()
+
+
+class ScanProcessTracker:
+    """扫描子进程跟踪器
+
+    扫描工作线程通过 task() 绑定当前扫描任务，run_command 启动的每个命令都运行在
+    独立的进程组中并登记到该任务下。进程组ID同时写入 ScanTask.process_groups，
+    因此处理取消请求的进程（可能不是执行扫描的进程）也能精确终止这些进程组。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.groups = {}  # scan_task_id -> set(pgid)
+        self.cancelled = set()
+        self.local = threading.local()
+
+    @contextmanager
+    def task(self, scan_task_id):
+        """在当前线程绑定扫描任务"""
+        previous = getattr(self.local, 'scan_task_id', None)
+        self.local.scan_task_id = scan_task_id
+        try:
+            yield
+        finally:
+            self.local.scan_task_id = previous
+            if previous is None:
+                with self.lock:
+                    self.cancelled.discard(scan_task_id)
+
+    @contextmanager
+    def attach(self, scan_task_id):
+        """在辅助线程（如并行执行的扫描引擎）绑定扫描任务，退出时不清除取消标记"""
+        previous = getattr(self.local, 'scan_task_id', None)
+        self.local.scan_task_id = scan_task_id
+        try:
+            yield
+        finally:
+            self.local.scan_task_id = previous
+
+    def current_task(self):
+        return getattr(self.local, 'scan_task_id', None)
+
+    def register(self, pgid):
+        """登记当前任务的进程组"""
+        scan_task_id = self.current_task()
+        if scan_task_id is None:
+            return
+        with self.lock:
+            self.groups.setdefault(scan_task_id, set()).add(pgid)
+            pgids = sorted(self.groups[scan_task_id])
+        self._persist(scan_task_id, pgids)
+
+    def unregister(self, pgid):
+        """进程组结束后注销"""
+        scan_task_id = self.current_task()
+        if scan_task_id is None:
+            return
+        with self.lock:
+            pgids = self.groups.get(scan_task_id, set())
+            pgids.discard(pgid)
+            if not pgids:
+                self.groups.pop(scan_task_id, None)
+            pgids = sorted(pgids)
+        self._persist(scan_task_id, pgids)
+
+    def _persist(self, scan_task_id, pgids):
+        from .models import ScanTask
+        try:
+            ScanTask.objects.filter(pk=scan_task_id).update(process_groups=pgids)
+        except Exception as e:
+            logger.warning(f"记录扫描任务 {scan_task_id} 进程组失败: {e}")
+
+    def is_cancelled(self, scan_task_id=None):
+        scan_task_id = scan_task_id or self.current_task()
+        return scan_task_id is not None and scan_task_id in self.cancelled
+
+    def check_cancelled(self):
+        """当前任务已取消时抛出ScanCancelled（用于阶段之间的检查）"""
+        scan_task_id = self.current_task()
+        if scan_task_id is None:
+            return
+        if self.is_cancelled(scan_task_id):
+            raise ScanCancelled(f"扫描任务 {scan_task_id} 已被取消")
+        from .models import ScanTask
+        if ScanTask.objects.filter(pk=scan_task_id, cancel_requested=True).exists():
+            with self.lock:
+                self.cancelled.add(scan_task_id)
+            raise ScanCancelled(f"扫描任务 {scan_task_id} 已被取消")
+
+    def cancel(self, scan_task):
+        """取消扫描任务：标记取消并终止该任务的全部进程组"""
+        from .models import ScanTask
+        with self.lock:
+            self.cancelled.add(scan_task.id)
+            pgids = set(self.groups.get(scan_task.id, set()))
+        ScanTask.objects.filter(pk=scan_task.id).update(cancel_requested=True)
+        scan_task.cancel_requested = True
+
+        # 合并其他进程登记的进程组
+        stored = ScanTask.objects.filter(pk=scan_task.id).values_list('process_groups', flat=True).first()
+        pgids.update(stored or [])
+
+        terminate_process_groups(pgids)
+        return sorted(pgids)
+
+
+# 全局进程跟踪器
+process_tracker = ScanProcessTracker()
@@ -0,0 +1,135 @@
+import os
+import logging
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+logger = logging.getLogger(__name__)
+
+
+def median(values):
+    """中位数（项目的statistics应用与标准库同名，这里不使用statistics.median）"""
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+class ScanCostEstimator:
+    """扫描耗时预测 - 根据历史扫描估算项目一次扫描需要的秒数
+
+    依次使用：
+    - stages:  按项目最近几次扫描的阶段耗时（ScanStageTiming）预测：按最近一次扫描的
+               (阶段, 扫描引擎) 取各自的中位数，通用阶段相加，各引擎的阶段耗时按并行度合并
+    - history: 项目最近几次完成的扫描耗时的中位数，用于没有阶段耗时记录的扫描
+    - size:    仓库大小 × 同语言项目的每MB扫描耗时（中位数），用于没有扫描历史的项目
+    - default: 配置的默认耗时
+    """
+
+    # 参与计算的最近扫描数
+    PROJECT_HISTORY = 5
+    GLOBAL_HISTORY = 200
+
+    @property
+    def config(self):
+        return settings.AUTO_SCAN_CONFIG
+
+    def _completed_scans(self):
+        """已完成的扫描，elapsed 为占用扫描槽的时间（不含入库）"""
+        from .models import ScanTask
+        return ScanTask.objects.filter(
+            status='completed', started_at__isnull=False, completed_at__isnull=False
+        ).annotate(elapsed=Coalesce('scanned_at', 'completed_at') - F('started_at'))
+
+    def get_repo_size_mb(self, project):
+        """项目仓库大小（MB），取工作空间统计或最近一次扫描记录的大小"""
+        from .models import WorkspaceItem, ScanTask
+        path = os.path.abspath(os.path.join(self.config['PROJECT_DIR'], project.department.name, project.name))
+        size = WorkspaceItem.objects.filter(path=path).values_list('size_bytes', flat=True).first()
+        if size:
+            return size / 1024 / 1024
+        for scan_config in ScanTask.objects.filter(project=project).order_by('-created_at') \
+                .values_list('scan_config', flat=True)[:self.PROJECT_HISTORY]:
+            if (scan_config or {}).get('repo_size_mb'):
+                return scan_config['repo_size_mb']
+        return None
+
+    def get_languages(self, project):
+        """项目最近一次扫描的语言"""
+        from .models import ScanTask
+        for scan_config in ScanTask.objects.filter(project=project).order_by('-created_at') \
+                .values_list('scan_config', flat=True)[:self.PROJECT_HISTORY]:
+            if (scan_config or {}).get('languages'):
+                return sorted(scan_config['languages'])
+        return None
+
+    def predict_from_stages(self, scan_ids):
+        """按阶段耗时预测（scan_ids 为最近的扫描，从新到旧），没有阶段耗时记录时返回None"""
+        from .models import ScanStageTiming
+        # 只计入占用扫描槽的阶段（扫描器执行完成之前开始的阶段），不含入库
+        timings = ScanStageTiming.objects.filter(scan_task_id__in=scan_ids).annotate(
+            slot_end=Coalesce('scan_task__scanned_at', 'scan_task__completed_at')
+        ).filter(started_at__lt=F('slot_end')).values_list('scan_task_id', 'stage', 'engine', 'duration')
+
+        by_scan = {}
+        for scan_id, stage, engine, duration in timings:
+            stages = by_scan.setdefault(scan_id, {})
+            stages[(stage, engine)] = stages.get((stage, engine), 0) + duration
+        latest = next((by_scan[scan_id] for scan_id in scan_ids if scan_id in by_scan), None)
+        if not latest:
+            return None
+
+        # 最近一次扫描的各阶段（项目的语言、分片变化后旧引擎的阶段不再计入），取历史中位数
+        general, engines = 0.0, {}
+        for key in latest:
+            duration = median([stages[key] for stages in by_scan.values() if key in stages])
+            stage, engine = key
+            if engine:
+                engines[engine] = engines.get(engine, 0.0) + duration
+            else:
+                general += duration
+        if engines:
+            # 多个引擎并行执行：耗时不少于最慢的引擎，也不少于总耗时平分到并行数
+            sharded = any('@' in engine for engine in engines)
+            limit = self.config['SHARD_PARALLELISM'] if sharded else self.config['MAX_PARALLEL_ENGINES']
+            parallel = max(1, min(len(engines), limit))
+            general += max(max(engines.values()), sum(engines.values()) / parallel)
+        return general
+
+    def predict(self, project):
+        """预测项目扫描耗时，返回 {'seconds': 秒数, 'basis': 依据}"""
+        recent = list(
+            self._completed_scans().filter(project=project)
+            .order_by('-completed_at').values_list('id', 'elapsed')[:self.PROJECT_HISTORY]
+        )
+        seconds = self.predict_from_stages([scan_id for scan_id, _ in recent]) if recent else None
+        if seconds:
+            return {'seconds': seconds, 'basis': 'stages'}
+
+        durations = [elapsed.total_seconds() for _, elapsed in recent if elapsed is not None]
+        if durations:
+            return {'seconds': median(durations), 'basis': 'history'}
+
+        size_mb = self.get_repo_size_mb(project)
+        if size_mb:
+            languages = self.get_languages(project)
+            rates, same_language = [], []
+            for elapsed, scan_config in self._completed_scans().order_by('-completed_at') \
+                    .values_list('elapsed', 'scan_config')[:self.GLOBAL_HISTORY]:
+                scan_config = scan_config or {}
+                if elapsed is None or not scan_config.get('repo_size_mb'):
+                    continue
+                rate = elapsed.total_seconds() / scan_config['repo_size_mb']
+                rates.append(rate)
+                if languages and sorted(scan_config.get('languages') or []) == languages:
+                    same_language.append(rate)
+            rates = same_language or rates
+            if rates:
+                return {'seconds': median(rates) * size_mb, 'basis': 'size'}
+
+        return {'seconds': float(self.config['SCHEDULER_DEFAULT_COST']), 'basis': 'default'}
+
+
+# 全局耗时预测实例
+scan_cost_estimator = ScanCostEstimator()
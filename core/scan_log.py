@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from datetime import datetime
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+def get_scan_log_path(scan_task_id):
+    """获取扫描任务的日志文件路径"""
+    return os.path.join(settings.AUTO_SCAN_CONFIG['LOG_DIR'], f'scan_task_{scan_task_id}.log')
+
+
+def format_log_line(message):
+    """给日志消息加上时间前缀"""
+    return f"{datetime.now().strftime('%H:%M:%S')} {message}"
+
+
+class ScanLogSink:
+    """扫描日志输出 - 追加写入任务日志文件，按时间/行数批量刷新
+
+    完整日志只追加写入日志文件；ScanTask.scan_log 仅保存最近的若干行，
+    随批量刷新一起更新，避免每行输出都重写整段日志。
+    """
+
+    def __init__(self, scan_task):
+        self.scan_task = scan_task
+        config = settings.AUTO_SCAN_CONFIG
+        self.flush_interval = config['LOG_FLUSH_INTERVAL']
+        self.flush_lines = config['LOG_FLUSH_LINES']
+        self.tail = deque(maxlen=config['LOG_TAIL_LINES'])
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.last_flush = time.time()
+        self.closed = False
+
+        self.path = get_scan_log_path(scan_task.id)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+        # 输出静默期间（如长时间的analyze）由后台线程按时刷新
+        self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flusher.start()
+
+    def __call__(self, message):
+        self.write(message)
+
+    def write(self, message):
+        """写入一行日志"""
+        line = format_log_line(message)
+        with self.lock:
+            if self.closed:
+                return
+            self.buffer.append(line)
+            self.tail.append(line)
+            due = (len(self.buffer) >= self.flush_lines or
+                   time.time() - self.last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        """将缓冲区写入日志文件，并更新任务的日志尾部"""
+        with self.lock:
+            self.last_flush = time.time()
+            if not self.buffer or self.file.closed:
+                return
+            lines, self.buffer = self.buffer, []
+            tail = '\n'.join(self.tail)
+            self.file.write('\n'.join(lines) + '\n')
+            self.file.flush()
+
+        try:
+            from .models import ScanTask
+            self.scan_task.scan_log = tail
+            ScanTask.objects.filter(pk=self.scan_task.pk).update(scan_log=tail)
+        except Exception as e:
+            logger.warning(f"更新扫描任务 {self.scan_task.pk} 日志尾部失败: {e}")
+
+    def close(self):
+        """刷新剩余日志并关闭文件"""
+        self.flush()
+        with self.lock:
+            self.closed = True
+            self.file.close()
+
+    def _flush_loop(self):
+        try:
+            while not self.closed:
+                time.sleep(self.flush_interval)
+                if self.buffer:
+                    self.flush()
+        finally:
+            connection.close()
+
+
+def append_scan_log(scan_task, message):
+    """向扫描任务追加单行日志（用于扫描流程之外的事件，如手动终止）"""
+    line = format_log_line(message)
+    path = get_scan_log_path(scan_task.id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(line + '\n')
+
+    tail_lines = settings.AUTO_SCAN_CONFIG['LOG_TAIL_LINES']
+    lines = scan_task.scan_log.split('\n') if scan_task.scan_log else []
+    lines.append(line)
+    scan_task.scan_log = '\n'.join(lines[-tail_lines:])
+
+
+def read_scan_log_lines(scan_task):
+    """读取扫描任务的完整日志行，日志文件不存在时退回到任务中保存的日志"""
+    path = get_scan_log_path(scan_task.id)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            return f.read().splitlines()
+    return scan_task.scan_log.split('\n') if scan_task.scan_log else []
+
+
+def _utf8_prefix_length(data):
+    """不在多字节字符中间截断的最大前缀长度"""
+    for i in range(1, min(4, len(data)) + 1):
+        lead = data[-i]
+        if lead & 0xC0 != 0x80:
+            size = 1 if lead < 0x80 else 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4
+            return len(data) - i if size > i else len(data)
+    return len(data)
+
+
+def read_scan_log_from(scan_task, offset=0, max_bytes=None):
+    """从字节偏移量读取新增的完整日志行，返回 (行列表, 下一次读取的偏移量)
+
+    只读取偏移量之后的内容，不会重新读取整个日志。超过 max_bytes 的长行分段返回。
+    """
+    max_bytes = max_bytes or settings.AUTO_SCAN_CONFIG['LOG_STREAM_CHUNK_BYTES']
+    path = get_scan_log_path(scan_task.id)
+
+    if not os.path.exists(path):
+        # 旧任务没有日志文件，只能一次性返回保存的日志
+        if offset == 0 and scan_task.scan_log:
+            data = scan_task.scan_log.encode('utf-8')
+            return scan_task.scan_log.split('\n'), len(data)
+        return [], offset
+
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(max_bytes)
+
+    # 只返回完整的行，未写完的行留到下次读取
+    end = data.rfind(b'\n')
+    if end >= 0:
+        chunk = data[:end + 1]
+    elif len(data) == max_bytes:
+        # 一行超过 max_bytes 时先返回读到的部分，否则偏移量停在这一行，之后的日志都读不到
+        chunk = data[:_utf8_prefix_length(data)]
+    else:
+        return [], offset
+    return chunk.decode('utf-8', errors='replace').splitlines(), offset + len(chunk)
+
+
+TERMINAL_STATUSES = ('completed', 'failed')
+
+
+def _sse_event(event, data, event_id=None):
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {payload}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def scan_log_event_stream(scan_task, offset=0):
+    """扫描日志与状态的SSE事件流
+
+    从给定字节偏移量开始推送新增日志行（log事件，id为新的偏移量，断线重连时
+    浏览器会通过Last-Event-ID带回），状态变化时推送status事件，任务结束后推送
+    end事件。单个连接最长保持LOG_STREAM_MAX_DURATION秒，之后由客户端重连续传。
+    """
+    from .models import ScanTask
+
+    config = settings.AUTO_SCAN_CONFIG
+    poll_interval = config['LOG_STREAM_POLL_INTERVAL']
+    deadline = time.time() + config['LOG_STREAM_MAX_DURATION']
+    last_status = None
+    last_event = time.time()
+
+    yield 'retry: 2000\n\n'
+    while True:
+        row = ScanTask.objects.filter(pk=scan_task.pk).values('status', 'error_message').first()
+        if row is None:
+            yield _sse_event('end', {'status': 'deleted'})
+            return
+
+        # 先推送日志，保证结束事件之前客户端已拿到全部日志
+        while True:
+            lines, new_offset = read_scan_log_from(scan_task, offset)
+            if not lines:
+                break
+            offset = new_offset
+            last_event = time.time()
+            yield _sse_event('log', {'lines': lines, 'offset': offset}, event_id=offset)
+
+        if row['status'] != last_status:
+            last_status = row['status']
+            last_event = time.time()
+            yield _sse_event('status', {
+                'status': row['status'],
+                'error_message': row['error_message'],
+                'offset': offset,
+            })
+
+        if row['status'] in TERMINAL_STATUSES:
+            yield _sse_event('end', {'status': row['status'], 'offset': offset})
+            return
+
+        if time.time() >= deadline:
+            return
+
+        # 保持连接，防止代理因空闲断开
+        if time.time() - last_event >= 15:
+            last_event = time.time()
+            yield ': keepalive\n\n'
+
+        time.sleep(poll_interval)
@@ -1,14 +1,26 @@
 import threading
 import time
 import logging
-from queue import Queue
+from datetime import datetime, timedelta
 from django.conf import settings
+from django.utils import timezone
 from .models import ScanTask
+from .scan_cost import scan_cost_estimator
+from .ingestion import ingestion_queue
+from .process_control import process_tracker
+from .workspace import workspace_manager
 
 logger = logging.getLogger(__name__)
 
 class ScanQueue:
-    """扫描队列管理器 - 单例模式"""
+    """扫描队列管理器 - 单例模式
+    
+    单个工作线程按调度策略选择下一个任务：
+    - sjf:  预测耗时短的任务优先，等待时间越长优先级越高（老化，避免大任务饿死），
+            最近占用扫描时间多的部门降低优先级（部门公平）
+    - fifo: 先进先出
+    每个任务的预测耗时来自 scan_cost_estimator，队列状态中给出预计开始和完成时间。
+    """
     _instance = None
     _lock = threading.Lock()
     
@@ -24,12 +36,20 @@ class ScanQueue:
         if self._initialized:
             return
             
-        self.queue = Queue()
+        # 等待执行的任务
+        self.pending = []
+        self.condition = threading.Condition()
+        self.enqueue_lock = threading.Lock()
         self.current_task = None
+        self.current_entry = None
         self.worker_thread = None
         self.running = False
         self._initialized = True
         
+    @property
+    def config(self):
+        return settings.AUTO_SCAN_CONFIG
+        
     def start_worker(self):
         """启动工作线程"""
         if self.worker_thread and self.worker_thread.is_alive():
@@ -39,28 +59,112 @@ class ScanQueue:
         self.worker_thread = threading.Thread(target=self._worker, daemon=True)
         self.worker_thread.start()
         logger.info("扫描队列工作线程已启动")
+        # 工作空间配额检查随扫描队列一起在后台运行
+        workspace_manager.start()
     
-    def add_task(self, scan_task_id, scanner_func):
+    def add_task(self, scan_task_id, scanner_func, project=None, cost=None):
         """添加扫描任务到队列"""
-        self.queue.put((scan_task_id, scanner_func))
-        logger.info(f"扫描任务 {scan_task_id} 已加入队列，当前队列长度: {self.queue.qsize()}")
+        if project is None:
+            project = ScanTask.objects.select_related('project__department').get(pk=scan_task_id).project
+        if cost is None:
+            cost = scan_cost_estimator.predict(project)
+        
+        entry = {
+            'scan_task_id': scan_task_id,
+            'func': scanner_func,
+            'project_id': project.id,
+            'project': str(project),
+            'department_id': project.department_id,
+            'enqueued_at': time.time(),
+            'cost': cost['seconds'],
+            'cost_basis': cost['basis'],
+        }
+        with self.condition:
+            self.pending.append(entry)
+            self.condition.notify()
+        logger.info(f"扫描任务 {scan_task_id} 已加入队列，预计耗时 {cost['seconds']:.0f}s（{cost['basis']}），"
+                    f"当前队列长度: {len(self.pending)}")
         
         # 确保工作线程运行
         self.start_worker()
     
+    def _department_usage(self, now=None):
+        """各部门在公平窗口内占用的扫描时间（秒）"""
+        now = now or time.time()
+        window = self.config['SCHEDULER_FAIRNESS_WINDOW']
+        since = timezone.now() - timedelta(seconds=window)
+        usage = {}
+        for department_id, started_at, scanned_at, completed_at in ScanTask.objects.filter(
+            started_at__gte=since
+        ).values_list('project__department_id', 'started_at', 'scanned_at', 'completed_at'):
+            # 只计算占用扫描槽的时间，不含入库
+            end = scanned_at or completed_at
+            end = end.timestamp() if end else now
+            usage[department_id] = usage.get(department_id, 0) + max(0, end - started_at.timestamp())
+        return usage
+    
+    def _score(self, entry, now, department_usage):
+        """调度分数，越小越先执行"""
+        if self.config['SCHEDULER_POLICY'] == 'fifo':
+            return entry['enqueued_at']
+        waited = max(0, now - entry['enqueued_at'])
+        return (entry['cost']
+                - self.config['SCHEDULER_AGING_RATE'] * waited
+                + self.config['SCHEDULER_FAIRNESS_WEIGHT'] * department_usage.get(entry['department_id'], 0))
+    
+    def _ready_entries(self):
+        """可以开始的任务（上一次扫描仍在入库的项目暂不扫描）"""
+        busy = ingestion_queue.busy_projects()
+        return [entry for entry in self.pending if entry['project_id'] not in busy]
+    
+    def wake(self):
+        """唤醒工作线程重新选择任务"""
+        with self.condition:
+            self.condition.notify()
+    
+    def _take_next(self, timeout=1):
+        """取出下一个要执行的任务，没有可执行的任务时等待"""
+        with self.condition:
+            ready = self._ready_entries()
+            if not ready:
+                self.condition.wait(timeout)
+                ready = self._ready_entries()
+            if not ready:
+                return None
+            now = time.time()
+            usage = self._department_usage(now)
+            entry = min(ready, key=lambda e: self._score(e, now, usage))
+            self.pending.remove(entry)
+            entry['started_at'] = now
+            self.current_task = entry['scan_task_id']
+            self.current_entry = entry
+            return entry
+    
     def _worker(self):
         """工作线程主循环"""
         while self.running:
             try:
-                # 获取任务（阻塞等待）
-                scan_task_id, scanner_func = self.queue.get(timeout=1)
-                self.current_task = scan_task_id
+                entry = self._take_next()
+                if entry is None:
+                    continue
+                scan_task_id = entry['scan_task_id']
+                
+                # 排队期间已被取消的任务直接跳过
+                if ScanTask.objects.filter(pk=scan_task_id, cancel_requested=True).exists():
+                    logger.info(f"扫描任务 {scan_task_id} 已取消，跳过")
+                    self.current_task = None
+                    self.current_entry = None
+                    continue
+                
+                # 等待进行中的工作空间淘汰完成，之后该任务的目录受保护
+                workspace_manager.wait_idle()
                 
-                logger.info(f"开始执行扫描任务 {scan_task_id}")
+                logger.info(f"开始执行扫描任务 {scan_task_id}（等待 {entry['started_at'] - entry['enqueued_at']:.0f}s）")
                 
                 try:
-                    # 执行扫描
-                    scanner_func()
+                    # 执行扫描，子进程按任务登记进程组
+                    with process_tracker.task(scan_task_id):
+                        entry['func']()
                     logger.info(f"扫描任务 {scan_task_id} 执行完成")
                 except Exception as e:
                     logger.error(f"扫描任务 {scan_task_id} 执行失败: {e}")
@@ -74,19 +178,119 @@ class ScanQueue:
                         pass
                 finally:
                     self.current_task = None
-                    self.queue.task_done()
+                    self.current_entry = None
+                    # 扫描产生了新的源码、报告和缓存，检查工作空间配额
+                    workspace_manager.request_check()
                     
-            except Exception:
-                # 队列为空或其他异常，继续循环
+            except Exception as e:
+                logger.error(f"扫描队列调度异常: {e}")
                 continue
     
+    def get_active_task_ids(self):
+        """排队中和执行中的任务ID"""
+        with self.condition:
+            active = {entry['scan_task_id'] for entry in self.pending}
+        if self.current_task:
+            active.add(self.current_task)
+        return active
+    
+    def enqueue_project_scan(self, project, git_url=None, branch=None, language=None, full_scan=False, reason='manual'):
+        """为项目加入扫描，返回 (扫描任务, 是否新建)
+        
+        项目已有排队中或执行中的扫描时合并请求，直接返回已有的任务。
+        """
+        from .scanner import AutoScanner
+        
+        with self.enqueue_lock:
+            active = ScanTask.objects.filter(
+                pk__in=self.get_active_task_ids(), project=project, cancel_requested=False
+            ).order_by('created_at').first()
+            if active:
+                logger.info(f"项目 {project} 已有扫描任务 {active.id}（{active.status}），合并扫描请求（{reason}）")
+                return active, False
+            
+            cost = scan_cost_estimator.predict(project)
+            scan_task = ScanTask.objects.create(
+                project=project,
+                tool_name='auto',
+                scan_type='full',
+                status='pending',
+                scan_config={
+                    'trigger': reason,
+                    'predicted_cost': round(cost['seconds'], 1),
+                    'cost_basis': cost['basis'],
+                },
+            )
+            git_url = git_url or project.git_url
+            branch = branch or project.git_branch or 'main'
+            
+            def scan_func():
+                scanner = AutoScanner(project)
+                return scanner.execute_scan(git_url, branch, scan_task, language, full_scan)
+            
+            self.add_task(scan_task.id, scan_func, project=project, cost=cost)
+            return scan_task, True
+    
+    def get_schedule(self):
+        """按当前调度策略模拟执行顺序，返回 (当前任务, 排队任务列表)，包含预计开始/完成时间"""
+        with self.condition:
+            pending = list(self.pending)
+            current = self.current_entry
+        
+        cancelled = set(ScanTask.objects.filter(
+            pk__in=[entry['scan_task_id'] for entry in pending], cancel_requested=True
+        ).values_list('pk', flat=True))
+        pending = [entry for entry in pending if entry['scan_task_id'] not in cancelled]
+        
+        now = time.time()
+        clock = now
+        current_info = None
+        if current:
+            elapsed = now - current['started_at']
+            clock = now + max(0, current['cost'] - elapsed)
+            current_info = {
+                'scan_task_id': current['scan_task_id'],
+                'project': current['project'],
+                'predicted_cost': round(current['cost'], 1),
+                'elapsed': round(elapsed, 1),
+                'predicted_finish': self._to_datetime(clock),
+            }
+        
+        usage = self._department_usage(now)
+        queued = []
+        while pending:
+            entry = min(pending, key=lambda e: self._score(e, clock, usage))
+            pending.remove(entry)
+            start, finish = clock, clock + entry['cost']
+            usage[entry['department_id']] = usage.get(entry['department_id'], 0) + entry['cost']
+            queued.append({
+                'scan_task_id': entry['scan_task_id'],
+                'project': entry['project'],
+                'predicted_cost': round(entry['cost'], 1),
+                'cost_basis': entry['cost_basis'],
+                'waited': round(now - entry['enqueued_at'], 1),
+                'predicted_start': self._to_datetime(start),
+                'predicted_finish': self._to_datetime(finish),
+            })
+            clock = finish
+        return current_info, queued
+    
+    @staticmethod
+    def _to_datetime(timestamp):
+        return datetime.fromtimestamp(timestamp, tz=timezone.get_current_timezone())
+    
     def get_queue_status(self):
         """获取队列状态"""
+        current, queued = self.get_schedule()
         return {
-            'queue_size': self.queue.qsize(),
+            'queue_size': len(queued),
             'current_task': self.current_task,
-            'worker_running': self.worker_thread and self.worker_thread.is_alive()
+            'worker_running': bool(self.worker_thread and self.worker_thread.is_alive()),
+            'policy': self.config['SCHEDULER_POLICY'],
+            'current': current,
+            'queued': queued,
+            'ingestion': ingestion_queue.get_status(),
         }
 
 # 全局队列实例
-scan_queue = ScanQueue()
\ No newline at end of file
+scan_queue = ScanQueue()
@@ -0,0 +1,102 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ScanTimer:
+    """扫描阶段计时器 - 记录每个阶段的耗时和峰值内存，扫描结束后写入ScanStageTiming
+
+    同名阶段多次进入（如逐条漏洞的翻译、blame）会累加耗时，合并为一条记录。
+    峰值内存：阶段内执行的子进程取子进程自身的峰值RSS（由run_command上报）；纯Python阶段不记录
+    （本进程的RSS高水位是进程启动以来的最大值，不能反映单个阶段的内存）。
+    """
+
+    def __init__(self, scan_task=None):
+        self.scan_task = scan_task
+        self.stages = {}  # (stage, engine) -> 记录
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def _active_spans(self):
+        if not hasattr(self.local, 'spans'):
+            self.local.spans = []
+        return self.local.spans
+
+    @contextmanager
+    def span(self, stage, engine=''):
+        """计时一个阶段"""
+        record = {'peak_rss_kb': None}
+        spans = self._active_spans()
+        spans.append(record)
+        started_at = timezone.now()
+        start = time.monotonic()
+        success = True
+        try:
+            yield
+        except BaseException:
+            success = False
+            raise
+        finally:
+            duration = time.monotonic() - start
+            spans.pop()
+            self._add(stage, engine, started_at, duration, record['peak_rss_kb'], success)
+
+    def record_rss(self, peak_rss_kb):
+        """上报当前线程中子进程的峰值RSS（KB），计入所有打开的阶段"""
+        for record in self._active_spans():
+            record['peak_rss_kb'] = max(record['peak_rss_kb'] or 0, peak_rss_kb)
+
+    def _add(self, stage, engine, started_at, duration, peak_rss_kb, success):
+        with self.lock:
+            key = (stage, engine)
+            item = self.stages.get(key)
+            if item is None:
+                self.stages[key] = {
+                    'stage': stage,
+                    'engine': engine,
+                    'started_at': started_at,
+                    'duration': duration,
+                    'peak_rss_kb': peak_rss_kb,
+                    'success': success,
+                    'calls': 1,
+                }
+            else:
+                item['duration'] += duration
+                item['peak_rss_kb'] = max(item['peak_rss_kb'] or 0, peak_rss_kb or 0) or None
+                item['success'] = item['success'] and success
+                item['calls'] += 1
+
+    def save(self):
+        """持久化所有阶段记录"""
+        if not self.scan_task or not self.stages:
+            return
+        from .models import ScanStageTiming
+        try:
+            ScanStageTiming.objects.bulk_create([
+                ScanStageTiming(scan_task=self.scan_task, **{**item, 'engine': item['engine'][:50]})
+                for item in self.stages.values()
+            ])
+        except Exception as e:
+            logger.warning(f"保存扫描任务 {self.scan_task.pk} 阶段耗时失败: {e}")
+        self.stages = {}
+
+    def summary(self):
+        """各阶段耗时摘要（用于写入扫描日志）"""
+        return ', '.join(
+            f"{item['stage']}{'(' + item['engine'] + ')' if item['engine'] else ''}={item['duration']:.1f}s"
+            for item in sorted(self.stages.values(), key=lambda i: i['started_at'])
+        )
+
+
+@contextmanager
+def timed_stage(timer, stage, engine=''):
+    """计时器可选时使用：没有计时器时不做任何事"""
+    if timer is None:
+        yield
+    else:
+        with timer.span(stage, engine):
+            yield
@@ -1,12 +1,24 @@
 import os
 import subprocess
 import logging
-from datetime import datetime
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.conf import settings
+from django.db import connection
 from .models import Project, ScanTask
+from .scan_log import ScanLogSink
+from .scan_timing import ScanTimer
+from .process_control import process_tracker, ScanCancelled, CANCELLED_MESSAGE
+from .workspace import workspace_manager
+from .ingestion import ingestion_queue
+from .sharding import ROOT_SHARD, detect_modules, changed_shards, rewrite_shard_report, merge_sarif
+from django.utils import timezone
 from parsers.sarif_parser import parse_sarif_file
+from statistics.rollups import rollup_service
+from statistics.snapshots import assign_fingerprints, snapshot_service
 from .scanners.codeql import CodeQLEngine
 from .scanners.semgrep import SemgrepEngine
+from .scanners.fake import FakeScanEngine, is_fake_url, fake_url_allowed, parse_fake_url, create_fake_repository
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +29,12 @@ class AutoScanner:
         self.project = project
         self.config = settings.AUTO_SCAN_CONFIG
         self.work_dir = os.path.join(self.config['WORK_DIR'], f'scan_{project.id}')
+        # 当前扫描的阶段计时器
+        self.timer = None
+        # Semgrep增量扫描计划，None表示全量扫描
+        self.incremental = None
+        # 分片扫描计划，None表示不分片
+        self.sharding = None
         
         if not self.config['ENABLED']:
             raise Exception("自动扫描功能未启用")
@@ -31,6 +49,14 @@ class AutoScanner:
             project_name = self.project.name
             target_dir = os.path.join(self.config['PROJECT_DIR'], dept_name, project_name)
             
+            # 压测使用的模拟仓库
+            if is_fake_url(git_url):
+                if not fake_url_allowed(git_url):
+                    raise Exception("模拟扫描引擎未启用，不能扫描 fake:// 地址")
+                create_fake_repository(target_dir, parse_fake_url(git_url))
+                workspace_manager.touch(target_dir, 'projects')
+                return target_dir
+            
             # 如果目录已存在，检查是否为Git仓库
             if os.path.exists(target_dir):
                 # 检查是否为Git仓库
@@ -51,7 +77,8 @@ class AutoScanner:
             
             if result.returncode != 0:
                 raise Exception(f"Git操作失败: {result.stderr}")
-                
+            
+            workspace_manager.touch(target_dir, 'projects')
             return target_dir
         except Exception as e:
             logger.error(f"Git操作失败: {e}")
@@ -84,15 +111,67 @@ class AutoScanner:
         except Exception:
             return True
             
+    # 语言 -> 源文件后缀
+    LANGUAGE_EXTENSIONS = {
+        'java': ('.java',),
+        'javascript': ('.js', '.jsx', '.mjs', '.cjs', '.ts', '.tsx', '.vue'),
+        'php': ('.php',),
+    }
+    
+    # 语言检测时跳过的目录（依赖、构建产物、版本库元数据）
+    LANGUAGE_SKIP_DIRS = {
+        '.git', '.svn', '.idea', '.vscode', '__pycache__',
+        'node_modules', 'bower_components', 'vendor',
+        'target', 'build', 'dist', 'out',
+    }
+    
+    def detect_languages(self, source_path, exclude=()):
+        """检测项目包含的所有语言
+        
+        遍历源码目录（最多LANGUAGE_DETECT_MAX_FILES个文件），按后缀统计各语言的文件数，
+        返回 {语言: 文件数}，按文件数降序。少于LANGUAGE_MIN_FILES个文件的语言忽略，
+        但构建文件（pom.xml/package.json）所在的语言始终计入。exclude 为跳过的子目录（相对路径）。
+        """
+        max_files = self.config['LANGUAGE_DETECT_MAX_FILES']
+        min_files = self.config['LANGUAGE_MIN_FILES']
+        suffix_map = {
+            suffix: language
+            for language, suffixes in self.LANGUAGE_EXTENSIONS.items()
+            for suffix in suffixes
+        }
+        counts = {}
+        marked = set()
+        visited = 0
+        exclude = {os.path.join(source_path, path) for path in exclude}
+        
+        for root, dirs, files in os.walk(source_path):
+            dirs[:] = [
+                d for d in dirs
+                if d not in self.LANGUAGE_SKIP_DIRS and not d.startswith('.') and os.path.join(root, d) not in exclude
+            ]
+            if 'pom.xml' in files:
+                marked.add('java')
+            if 'package.json' in files:
+                marked.add('javascript')
+            for filename in files:
+                language = suffix_map.get(os.path.splitext(filename)[1].lower())
+                if language:
+                    counts[language] = counts.get(language, 0) + 1
+            visited += len(files)
+            if visited >= max_files:
+                logger.info(f"语言检测达到文件数上限 {max_files}，按已遍历的文件统计")
+                break
+        
+        languages = {
+            language: count for language, count in counts.items()
+            if count >= min_files or (language in marked and count > 0)
+        }
+        return dict(sorted(languages.items(), key=lambda item: item[1], reverse=True))
+        
     def detect_language(self, source_path):
-        """检测项目语言"""
-        if os.path.exists(os.path.join(source_path, 'pom.xml')):
-            return 'java'
-        elif os.path.exists(os.path.join(source_path, 'package.json')):
-            return 'javascript'
-        elif any(f.endswith('.php') for f in os.listdir(source_path) if os.path.isfile(os.path.join(source_path, f))):
-            return 'php'
-        return None
+        """检测项目主要语言（文件数最多的语言）"""
+        languages = self.detect_languages(source_path)
+        return next(iter(languages), None)
         
     def get_scanner_engine(self, language):
         """获取扫描引擎"""
@@ -101,22 +180,38 @@ class AutoScanner:
             'javascript': CodeQLEngine('javascript', self.project),
             'php': SemgrepEngine(self.project)
         }
+        if language == 'fake':
+            return FakeScanEngine(self.project, parse_fake_url(self.git_url))
         
         engine = engines.get(language)
         if not engine:
             raise Exception(f"不支持的语言: {language}")
         return engine
         
-    def run_scan(self, source_path, language, scan_task=None):
-        """执行扫描"""
-        logs = []
+    # 支持CodeQL数据库集群的语言
+    CODEQL_LANGUAGES = ('java', 'javascript')
+    
+    def get_scanner_engines(self, languages):
+        """获取多个语言的扫描引擎，启用CODEQL_DB_CLUSTER时CodeQL语言合并为一个集群引擎"""
+        codeql_languages = [lang for lang in languages if lang in self.CODEQL_LANGUAGES]
+        if not self.config['CODEQL_DB_CLUSTER'] or len(codeql_languages) < 2:
+            return [self.get_scanner_engine(language) for language in languages]
         
-        def log_callback(message):
-            log_line = f"{datetime.now().strftime('%H:%M:%S')} {message}"
-            logs.append(log_line)
-            if scan_task:
-                scan_task.scan_log = '\n'.join(logs)
-                scan_task.save(update_fields=['scan_log'])
+        engines = [CodeQLEngine(codeql_languages, self.project)]
+        engines += [self.get_scanner_engine(lang) for lang in languages if lang not in codeql_languages]
+        return engines
+        
+    def run_scan(self, source_path, languages, scan_task=None):
+        """执行扫描
+        
+        languages 可以是单个语言或语言列表。多个语言时对应的引擎并行执行，
+        扫描槽的线程和内存预算按并行引擎数均分。返回 [(引擎名称, SARIF文件), ...]，
+        部分引擎失败时其余引擎的结果照常返回，失败信息写入 scan_config['engine_errors']。
+        """
+        if isinstance(languages, str):
+            languages = [languages]
+        log_sink = ScanLogSink(scan_task) if scan_task else None
+        log_callback = log_sink or (lambda message: None)
         
         # 按部门/项目结构组织报告输出目录
         dept_name = self.project.department.name
@@ -132,18 +227,298 @@ class AutoScanner:
             
         output_dir = os.path.join(self.config['OUTPUT_DIR'], dept_name, project_name)
         os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        
+        if self.sharding:
+            engines = self.get_shard_engines()
+            parallel = max(1, min(len(engines), self.config['SHARD_PARALLELISM']))
+        else:
+            engines = self.get_scanner_engines(languages)
+            parallel = max(1, min(len(engines), self.config['MAX_PARALLEL_ENGINES']))
+        for engine in engines:
+            engine.timer = self.timer
+            engine.set_resources(self.config['SLOT_THREADS'] // parallel,
+                                 self.config['SLOT_RAM_MB'] // parallel)
+            if self.incremental and isinstance(engine, SemgrepEngine):
+                engine.targets = self.incremental['changed']
+        
+        try:
+            if self.sharding:
+                self.prebuild_shards(source_path, log_callback)
+            
+            if len(engines) == 1:
+                try:
+                    return self._engine_reports(engines[0], engines[0].scan(source_path, output_dir, log_callback))
+                except Exception as e:
+                    log_callback(f"[ERR] 扫描失败: {e}")
+                    raise
+            
+            log_callback(f"[INFO] 并行执行 {len(engines)} 个扫描引擎: {', '.join(e.name for e in engines)}"
+                         f"（每个引擎 {engines[0].threads} 线程, {engines[0].ram_mb}MB 内存）")
+            scan_task_id = scan_task.id if scan_task else None
+            
+            def _run_engine(engine):
+                engine_log = lambda message: log_callback(f"[{engine.name}] {message}")
+                try:
+                    with process_tracker.attach(scan_task_id):
+                        return engine.scan(source_path, output_dir, engine_log)
+                finally:
+                    connection.close()
+            
+            results, errors = [], {}
+            with ThreadPoolExecutor(max_workers=parallel) as executor:
+                futures = {executor.submit(_run_engine, engine): engine for engine in engines}
+                for future in as_completed(futures):
+                    engine = futures[future]
+                    try:
+                        results.extend(self._engine_reports(engine, future.result()))
+                    except ScanCancelled:
+                        raise
+                    except Exception as e:
+                        errors[engine.name] = str(e)
+                        log_callback(f"[ERR] {engine.name} 扫描失败: {e}")
+            
+            if errors and scan_task:
+                scan_task.scan_config = {**(scan_task.scan_config or {}), 'engine_errors': errors}
+            if not results:
+                raise Exception(f"所有扫描引擎均失败: {'; '.join(f'{k}: {v}' for k, v in errors.items())}")
+            # 按引擎顺序返回，保证报告顺序稳定
+            order = [engine.name for engine in engines]
+            return sorted(results, key=lambda item: order.index(item[0]))
+        finally:
+            if log_sink:
+                log_sink.close()
+        
+    def get_head_commit(self, source_path):
+        """获取源码目录当前检出的提交"""
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=source_path, capture_output=True, text=True)
+        return result.stdout.strip() if result.returncode == 0 else ''
+        
+    def get_changed_files(self, source_path, base_commit, head_commit):
+        """两次提交之间的变更文件，返回 (修改/新增的文件, 删除的文件)，失败时返回None"""
+        result = subprocess.run(
+            ['git', 'diff', '--name-status', '--no-renames', '-z', base_commit, head_commit],
+            cwd=source_path, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            logger.warning(f"获取变更文件失败，执行全量扫描: {result.stderr.strip()}")
+            return None
+        
+        changed, deleted = [], []
+        fields = result.stdout.split('\0')
+        for status, path in zip(fields[0::2], fields[1::2]):
+            (deleted if status.startswith('D') else changed).append(path)
+        return changed, deleted
+        
+    def plan_incremental_scan(self, source_path, commit_sha, full_scan=False):
+        """规划Semgrep增量扫描
+        
+        以最近一次完成的Semgrep扫描的提交为基线，取两次提交之间变更的文件。
+        返回 None 表示执行全量扫描：未启用增量、没有基线、距上次全量扫描超过
+        SEMGREP_FULL_SCAN_INTERVAL_DAYS、基线提交不可用或变更文件过多。
+        """
+        if full_scan or not self.config['INCREMENTAL_SCAN_ENABLED'] or not commit_sha:
+            return None
+        
+        semgrep_tasks = ScanTask.objects.filter(
+            project=self.project, status='completed', tool_name__contains='semgrep'
+        ).exclude(commit_sha='').order_by('-completed_at')
+        baseline = semgrep_tasks.first()
+        if not baseline:
+            return None
+        
+        last_full = semgrep_tasks.exclude(scan_type='incremental').first()
+        interval = timedelta(days=self.config['SEMGREP_FULL_SCAN_INTERVAL_DAYS'])
+        if not last_full or last_full.completed_at < timezone.now() - interval:
+            logger.info(f"项目 {self.project} 距上次全量扫描已超过 {interval.days} 天，执行全量扫描")
+            return None
+        
+        diff = self.get_changed_files(source_path, baseline.commit_sha, commit_sha)
+        if diff is None:
+            return None
+        changed, deleted = diff
+        
+        if len(changed) + len(deleted) > self.config['INCREMENTAL_MAX_CHANGED_FILES']:
+            logger.info(f"变更文件数 {len(changed) + len(deleted)} 超过上限，执行全量扫描")
+            return None
+        
+        return {
+            'baseline': baseline,
+            'source_path': source_path,
+            'changed': changed,
+            'deleted': deleted,
+        }
+        
+    def carry_forward_findings(self, scan_task):
+        """复制基线扫描中未变更文件的Semgrep漏洞到本次扫描，保证漏洞集合完整"""
+        from core.models import Finding
+        baseline = self.incremental['baseline']
+        findings = Finding.objects.filter(scan_task=baseline)
+        if baseline.tool_name != 'semgrep':
+            # 多引擎扫描只沿用Semgrep的结果
+            findings = findings.filter(metadata__engine='semgrep')
+        
+        touched = set(self.incremental['changed']) | set(self.incremental['deleted'])
+        # Semgrep输出的是绝对路径（解析时去掉了开头的/），转换为相对源码根目录的路径再比较
+        prefix = self.incremental['source_path'].strip('/') + '/'
+        carried = []
+        for finding in findings.iterator():
+            path = finding.file_path
+            if path.startswith(prefix):
+                path = path[len(prefix):]
+            if path in touched:
+                continue
+            finding.pk = None
+            finding.scan_task = scan_task
+            finding.metadata = {**(finding.metadata or {}), 'carried_forward_from': baseline.id}
+            carried.append(finding)
+        return carried
+        
+    def plan_shards(self, source_path, languages):
+        """检测单仓多模块项目的分片，模块数不足SHARD_MIN_MODULES时返回None
+        
+        每个模块一个分片，分片只扫描模块内包含的语言；模块之外的源码作为根目录分片。
+        Maven构建只能按模块执行，根目录之外还有Java源码时不分片。
+        """
+        modules = detect_modules(source_path, self.config['SHARD_PATH_GLOBS'])
+        if len(modules) < self.config['SHARD_MIN_MODULES']:
+            return None
+        
+        shards = []
+        for module in modules:
+            counts = self.detect_languages(os.path.join(source_path, module['path']))
+            module_languages = [lang for lang in languages if lang in counts]
+            if module_languages:
+                shards.append({
+                    'name': module['path'], 'path': module['path'],
+                    'kind': module['kind'], 'languages': module_languages,
+                })
+        
+        root_counts = self.detect_languages(source_path, exclude=[module['path'] for module in modules])
+        if root_counts.get('java') and 'java' in languages:
+            logger.info("模块之外还有Java源码，不进行分片扫描")
+            return None
+        root_languages = [lang for lang in languages if lang in root_counts and lang != 'java']
+        if root_languages:
+            shards.append({'name': ROOT_SHARD, 'path': '', 'kind': 'root', 'languages': root_languages})
+        
+        if len(shards) < self.config['SHARD_MIN_MODULES']:
+            return None
+        return {'modules': [module['path'] for module in modules], 'shards': shards}
+        
+    def plan_shard_scan(self, source_path, shard_plan, commit_sha, full_scan=False):
+        """确定需要重新扫描的分片
+        
+        以最近一次完成的分片扫描为基线：文件有变化、新增、语言变化或上次扫描失败的分片重新扫描，
+        其余分片沿用基线的结果。根目录共享构建文件变化、没有基线或距上次全部分片扫描超过
+        SHARD_FULL_SCAN_INTERVAL_DAYS 时扫描所有分片。
+        """
+        shards = shard_plan['shards']
+        plan = {**shard_plan, 'scan': shards, 'carry': [], 'baseline': None, 'engines': {}}
+        if full_scan or not self.config['INCREMENTAL_SCAN_ENABLED'] or not commit_sha:
+            return plan
         
-        engine = self.get_scanner_engine(language)
-        return engine.scan(source_path, output_dir, log_callback)
+        sharded_tasks = ScanTask.objects.filter(
+            project=self.project, status='completed', scan_config__has_key='shards'
+        ).exclude(commit_sha='').order_by('-completed_at')
+        baseline = sharded_tasks.first()
+        if not baseline:
+            return plan
         
-    def execute_scan(self, git_url, branch='main', scan_task=None, language=None):
+        last_full = sharded_tasks.exclude(scan_type='incremental').first()
+        interval = timedelta(days=self.config['SHARD_FULL_SCAN_INTERVAL_DAYS'])
+        if not last_full or last_full.completed_at < timezone.now() - interval:
+            logger.info(f"项目 {self.project} 距上次全部分片扫描已超过 {interval.days} 天，扫描所有分片")
+            return plan
+        
+        diff = self.get_changed_files(source_path, baseline.commit_sha, commit_sha)
+        if diff is None:
+            return plan
+        touched = changed_shards(diff[0] + diff[1], shards)
+        if touched is None:
+            logger.info("根目录构建文件有变化，扫描所有分片")
+            return plan
+        
+        previous = {shard['name']: shard for shard in baseline.scan_config['shards']}
+        scan, carry = [], []
+        for shard in shards:
+            old = previous.get(shard['name'])
+            if (shard['name'] in touched or not old or old.get('status') == 'failed'
+                    or old.get('languages') != shard['languages']):
+                scan.append(shard)
+            else:
+                carry.append(shard)
+        plan.update({'scan': scan, 'carry': carry, 'baseline': baseline, 'changed_files': len(diff[0]) + len(diff[1])})
+        return plan
+        
+    def get_shard_engines(self):
+        """为需要扫描的分片创建扫描引擎"""
+        engines = []
+        for shard in self.sharding['scan']:
+            excluded = self.sharding['modules'] if not shard['path'] else []
+            for engine in self.get_scanner_engines(shard['languages']):
+                engine.set_shard(shard['path'], excluded)
+                self.sharding['engines'][engine.name] = shard
+                engines.append(engine)
+        return engines
+        
+    def prebuild_shards(self, source_path, log_callback):
+        """分片扫描前在仓库根目录统一安装依赖和安装Maven模块"""
+        languages = {lang for shard in self.sharding['scan'] for lang in shard['languages']}
+        languages &= set(self.CODEQL_LANGUAGES)
+        if not languages:
+            return
+        builder = CodeQLEngine(sorted(languages), self.project)
+        builder.timer = self.timer
+        builder.prebuild(source_path, languages, log_callback)
+        
+    def carry_forward_shards(self, scan_task):
+        """复制基线扫描中未变更分片的漏洞到本次扫描"""
+        from core.models import Finding
+        baseline = self.sharding['baseline']
+        names = [shard['name'] for shard in self.sharding['carry']]
+        if not baseline or not names:
+            return []
+        carried = []
+        for finding in Finding.objects.filter(scan_task=baseline, metadata__shard__in=names).iterator():
+            finding.pk = None
+            finding.scan_task = scan_task
+            finding.metadata = {**(finding.metadata or {}), 'carried_forward_from': baseline.id}
+            carried.append(finding)
+        return carried
+        
+    def merge_shard_reports(self, sarif_files, source_path):
+        """合并各分片的SARIF为一个报告，删除分片报告"""
+        timestamp = timezone.localtime().strftime('%Y%m%d-%H%M%S')
+        merged = os.path.join(self.output_dir, f'{os.path.basename(source_path)}_shards_{timestamp}.sarif')
+        merge_sarif(sarif_files, merged)
+        for sarif_file in sarif_files:
+            try:
+                os.remove(sarif_file)
+            except OSError:
+                pass
+        return merged
+        
+    @staticmethod
+    def _engine_reports(engine, sarif_files):
+        """引擎可能输出一个或多个SARIF文件（CodeQL数据库集群每个语言一个）"""
+        if isinstance(sarif_files, str):
+            sarif_files = [sarif_files]
+        return [(engine.name, sarif_file) for sarif_file in sarif_files]
+        
+    def execute_scan(self, git_url, branch='main', scan_task=None, language=None, full_scan=False):
         # 保存git_url供后续使用
         self.git_url = git_url
-        """执行扫描逻辑（使用已存在的任务）"""
+        """执行扫描逻辑（使用已存在的任务）
+        
+        full_scan 为 True 时强制全量扫描，否则包含PHP的项目在满足条件时执行Semgrep增量扫描。
+        扫描器执行完成后任务状态为 scanned，报告交给入库队列解析入库，入库完成后为 completed。
+        """
         try:
             # 1. 更新任务状态
             if scan_task:
                 scan_task.status = 'running'
+                scan_task.started_at = timezone.now()
                 scan_task.save()
             else:
                 # 如果没有传入任务，创建一个
@@ -151,49 +526,125 @@ class AutoScanner:
                     project=self.project,
                     tool_name='auto',
                     scan_type='full',
-                    status='running'
+                    status='running',
+                    started_at=timezone.now()
                 )
+            self.timer = ScanTimer(scan_task)
             
             # 2. 克隆/更新代码
             logger.info(f"开始克隆/更新仓库: {git_url}")
-            source_path = self.clone_repository(git_url, branch)
+            with self.timer.span('clone'):
+                source_path = self.clone_repository(git_url, branch)
+            scan_task.commit_sha = self.get_head_commit(source_path)
+            # 仓库大小用于预测同类项目的扫描耗时
+            scan_task.scan_config = {
+                **(scan_task.scan_config or {}),
+                'repo_size_mb': round(workspace_manager.get_size(source_path) / 1024 / 1024, 1),
+            }
+            
+            process_tracker.check_cancelled()
             
             # 3. 检测语言
-            if language:
-                # 使用用户指定的语言
-                detected_language = language
-                logger.info(f"使用指定语言: {language}")
+            if is_fake_url(git_url):
+                # 模拟仓库使用模拟扫描引擎
+                languages = ['fake']
+            elif language:
+                # 使用用户指定的语言（可用逗号分隔指定多个）
+                languages = language if isinstance(language, (list, tuple)) else [
+                    lang.strip() for lang in language.split(',') if lang.strip()
+                ]
+                logger.info(f"使用指定语言: {', '.join(languages)}")
             else:
                 # 自动检测语言
-                detected_language = self.detect_language(source_path)
-                if not detected_language:
+                with self.timer.span('detect_language'):
+                    language_counts = self.detect_languages(source_path)
+                if not language_counts:
                     raise Exception("无法检测项目语言类型")
-                logger.info(f"检测到项目语言: {detected_language}")
+                languages = list(language_counts)
+                logger.info(f"检测到项目语言: {language_counts}")
+                scan_task.scan_config = {**(scan_task.scan_config or {}), 'language_files': language_counts}
                 
-            scan_task.tool_name = f"codeql-{detected_language}" if detected_language != 'php' else 'semgrep'
+            scan_task.tool_name = '+'.join(
+                {'php': 'semgrep', 'fake': 'fake'}.get(lang, f"codeql-{lang}") for lang in languages
+            )[:50]
+            scan_task.scan_config = {**(scan_task.scan_config or {}), 'languages': languages}
+            
+            # 单仓多模块按模块分片扫描（自定义编译命令无法按模块拆分，不分片）
+            if self.config['SHARDING_ENABLED'] and not (self.project.build_command or '').strip():
+                with self.timer.span('detect_shards'):
+                    shard_plan = self.plan_shards(source_path, languages)
+                if shard_plan:
+                    self.sharding = self.plan_shard_scan(source_path, shard_plan, scan_task.commit_sha, full_scan)
+            if 'php' in languages and not self.sharding:
+                self.incremental = self.plan_incremental_scan(source_path, scan_task.commit_sha, full_scan)
+            if self.sharding:
+                baseline = self.sharding['baseline']
+                scan_task.scan_type = 'incremental' if self.sharding['carry'] else 'full'
+                scan_task.scan_config['sharding'] = {
+                    'baseline_task': baseline.id if baseline else None,
+                    'baseline_commit': baseline.commit_sha if baseline else '',
+                    'changed_files': self.sharding.get('changed_files'),
+                    'scanned': [shard['name'] for shard in self.sharding['scan']],
+                    'carried': [shard['name'] for shard in self.sharding['carry']],
+                }
+                logger.info(f"分片扫描: {len(self.sharding['shards'])} 个分片，"
+                            f"扫描 {len(self.sharding['scan'])} 个，沿用 {len(self.sharding['carry'])} 个")
+            elif self.incremental:
+                baseline = self.incremental['baseline']
+                scan_task.scan_type = 'incremental'
+                scan_task.scan_config['incremental'] = {
+                    'engine': 'semgrep',
+                    'baseline_task': baseline.id,
+                    'baseline_commit': baseline.commit_sha,
+                    'changed_files': len(self.incremental['changed']),
+                    'deleted_files': len(self.incremental['deleted']),
+                }
+                logger.info(f"Semgrep增量扫描，基线任务 {baseline.id} ({baseline.commit_sha[:8]})，"
+                            f"变更文件 {len(self.incremental['changed'])} 个")
+            else:
+                scan_task.scan_type = 'full'
             scan_task.save()
             
             # 4. 执行扫描
             logger.info(f"开始扫描项目: {source_path}")
-            sarif_file = self.run_scan(source_path, detected_language, scan_task)
+            if self.sharding and not self.sharding['scan']:
+                # 所有分片都没有变化
+                reports = []
+            else:
+                reports = self.run_scan(source_path, languages, scan_task)
             
-            # 5. 解析报告
-            logger.info(f"解析扫描报告: {sarif_file}")
-            from core.models import Finding
-            findings = parse_sarif_file(sarif_file, self.project, scan_task)
-            Finding.objects.bulk_create(findings)
+            process_tracker.check_cancelled()
             
-            # 6. 更新任务状态
-            scan_task.status = 'completed'
-            scan_task.report_file = sarif_file
-            scan_task.total_findings = len(findings)
+            if self.sharding:
+                # 分片报告的路径统一为相对仓库根目录，记录各分片状态
+                with self.timer.span('shard_merge'):
+                    for engine_name, sarif_file in reports:
+                        shard = self.sharding['engines'][engine_name]
+                        rewrite_shard_report(sarif_file, shard, self.sharding['shards'], source_path)
+                failed = {
+                    self.sharding['engines'][name]['name']
+                    for name in scan_task.scan_config.get('engine_errors', {})
+                    if name in self.sharding['engines']
+                }
+                scanned = {shard['name'] for shard in self.sharding['scan']}
+                scan_task.scan_config['shards'] = [
+                    {**shard, 'status': 'failed' if shard['name'] in failed else
+                        'scanned' if shard['name'] in scanned else 'carried'}
+                    for shard in self.sharding['shards']
+                ]
+            
+            # 5. 扫描器执行完成，释放扫描槽，解析和入库交给入库队列
+            #    （入库需要的数据保存到scan_config，服务重启后可以恢复入库）
+            scan_task.status = 'scanned'
+            scan_task.scanned_at = timezone.now()
+            scan_task.scan_config['ingest'] = self.ingest_state(source_path, reports)
             scan_task.save()
             
-            # 7. 清理临时文件
-            subprocess.run(f"rm -rf {self.work_dir}", shell=True)
-            subprocess.run(f"rm -rf {os.path.join(self.config['WORK_DIR'], 'codeql-db-*')}", shell=True)
+            # 6. 清理临时文件
+            with self.timer.span('cleanup'):
+                subprocess.run(f"rm -rf {self.work_dir}", shell=True)
             
-            # 8. 更新项目信息
+            # 7. 更新项目信息（入库读取源码上下文时使用source_path）
             self.project.source_path = source_path
             
             # 获取Git项目所属人信息（个人）
@@ -213,30 +664,165 @@ class AutoScanner:
                 logger.warning(f"获取Git项目所属人失败: {e}")
             
             self.project.save()
+            logger.info(f"扫描任务 {scan_task.id} 扫描阶段耗时: {self.timer.summary()}")
+            
+            ingestion_queue.submit(scan_task, lambda: self.ingest(scan_task, source_path, reports))
             
             return {
                 'success': True,
                 'scan_task_id': scan_task.id,
-                'findings_count': len(findings),
-                'report_file': sarif_file
+                'status': 'scanned',
+                'report_files': [sarif_file for _, sarif_file in reports],
             }
             
         except Exception as e:
-            logger.error(f"自动扫描失败: {e}")
+            cancelled = isinstance(e, ScanCancelled) or (
+                scan_task and ScanTask.objects.filter(pk=scan_task.pk, cancel_requested=True).exists()
+            )
+            if cancelled:
+                logger.info(f"扫描任务已取消: {scan_task.id if scan_task else ''}")
+            else:
+                logger.error(f"自动扫描失败: {e}")
             if scan_task:
                 scan_task.status = 'failed'
-                scan_task.error_message = str(e)
+                scan_task.error_message = CANCELLED_MESSAGE if cancelled else str(e)
+                scan_task.completed_at = timezone.now()
                 scan_task.save()
             
             # 清理临时文件
             subprocess.run(f"rm -rf {self.work_dir}", shell=True)
-            subprocess.run(f"rm -rf {os.path.join(self.config['WORK_DIR'], 'codeql-db-*')}", shell=True)
             
             return {
                 'success': False,
                 'error': str(e),
                 'scan_task_id': scan_task.id if scan_task else None
             }
+        finally:
+            if self.timer:
+                self.timer.save()
+    
+    def ingest_state(self, source_path, reports):
+        """入库需要的数据（保存到 scan_config['ingest']），分片和基线只记录名称和任务ID"""
+        state = {
+            'source_path': source_path,
+            'output_dir': getattr(self, 'output_dir', None),
+            'reports': [[engine_name, sarif_file] for engine_name, sarif_file in reports],
+            'sharding': None,
+            'incremental': None,
+        }
+        if self.sharding:
+            state['sharding'] = {
+                'engines': {name: shard['name'] for name, shard in self.sharding['engines'].items()},
+                'carry': [shard['name'] for shard in self.sharding['carry']],
+                'baseline': self.sharding['baseline'].id if self.sharding['baseline'] else None,
+            }
+        if self.incremental:
+            state['incremental'] = {
+                'source_path': self.incremental['source_path'],
+                'changed': self.incremental['changed'],
+                'deleted': self.incremental['deleted'],
+                'baseline': self.incremental['baseline'].id,
+            }
+        return state
+    
+    @classmethod
+    def restore_ingest(cls, scan_task):
+        """由 scan_config['ingest'] 恢复入库，返回 (扫描器, 源码路径, 报告列表)"""
+        state = (scan_task.scan_config or {}).get('ingest')
+        if not state:
+            raise Exception("没有保存入库数据")
+        
+        def baseline_task(pk):
+            baseline = ScanTask.objects.filter(pk=pk).first()
+            if not baseline:
+                raise Exception(f"基线扫描任务 {pk} 已删除")
+            return baseline
+        
+        scanner = cls(scan_task.project)
+        scanner.output_dir = state['output_dir']
+        if state['sharding']:
+            shards = {shard['name']: shard for shard in scan_task.scan_config.get('shards', [])}
+            sharding = state['sharding']
+            scanner.sharding = {
+                'engines': {name: shards[shard] for name, shard in sharding['engines'].items()},
+                'carry': [shards[name] for name in sharding['carry']],
+                'baseline': baseline_task(sharding['baseline']) if sharding['baseline'] else None,
+            }
+        if state['incremental']:
+            scanner.incremental = {
+                **state['incremental'],
+                'baseline': baseline_task(state['incremental']['baseline']),
+            }
+        reports = [(engine_name, sarif_file) for engine_name, sarif_file in state['reports']]
+        return scanner, state['source_path'], reports
+    
+    def ingest(self, scan_task, source_path, reports):
+        """解析扫描报告并入库（在入库线程中执行）
+        
+        多个引擎、多个分片的结果合并到同一个扫描任务，增量扫描和分片扫描沿用未变更部分的漏洞。
+        """
+        from core.models import Finding
+        from .scan_log import append_scan_log
+        timer = ScanTimer(scan_task)
+        try:
+            findings = []
+            for engine_name, sarif_file in reports:
+                shard = self.sharding['engines'].get(engine_name) if self.sharding else None
+                logger.info(f"解析扫描报告: {sarif_file}")
+                with timer.span('sarif_parse'):
+                    parsed = parse_sarif_file(sarif_file, self.project, scan_task, timer)
+                metadata = {'engine': engine_name.split('@')[0]}
+                if shard:
+                    metadata['shard'] = shard['name']
+                for finding in parsed:
+                    finding.metadata = {**(finding.metadata or {}), **metadata}
+                findings.extend(parsed)
+            
+            sarif_files = [sarif_file for _, sarif_file in reports]
+            if self.sharding:
+                if sarif_files:
+                    with timer.span('shard_merge'):
+                        sarif_files = [self.merge_shard_reports(sarif_files, source_path)]
+                with timer.span('carry_forward'):
+                    carried = self.carry_forward_shards(scan_task)
+                scan_task.scan_config['sharding']['carried_forward'] = len(carried)
+                findings.extend(carried)
+            if self.incremental:
+                with timer.span('carry_forward'):
+                    carried = self.carry_forward_findings(scan_task)
+                scan_task.scan_config['incremental']['carried_forward'] = len(carried)
+                findings.extend(carried)
+            for sarif_file in sarif_files:
+                workspace_manager.touch(sarif_file, 'reports')
+            
+            with timer.span('db_insert'):
+                assign_fingerprints(findings)
+                Finding.objects.bulk_create(findings)
+            with timer.span('rollup'):
+                rollup_service.refresh({(finding.project_id, finding.date) for finding in findings})
+            
+            now = timezone.now()
+            scan_task.status = 'completed'
+            scan_task.report_file = sarif_files[0] if sarif_files else ''
+            scan_task.scan_config = {**(scan_task.scan_config or {}), 'report_files': sarif_files}
+            scan_task.scan_config.pop('ingest', None)
+            scan_task.total_findings = len(findings)
+            scan_task.ingested_at = now
+            scan_task.completed_at = now
+            scan_task.save()
+            with timer.span('snapshot'):
+                snapshot_service.safe_record(scan_task)
+            append_scan_log(scan_task, f"[INFO] 入库完成: {len(findings)} 个漏洞")
+            logger.info(f"扫描任务 {scan_task.id} 入库完成，{len(findings)} 个漏洞，入库耗时: {timer.summary()}")
+        except Exception as e:
+            logger.error(f"扫描任务 {scan_task.id} 入库失败: {e}")
+            scan_task.status = 'failed'
+            scan_task.error_message = f"入库失败: {e}"
+            scan_task.completed_at = timezone.now()
+            scan_task.save()
+            append_scan_log(scan_task, f"[ERR] 入库失败: {e}")
+        finally:
+            timer.save()
     
     def auto_scan(self, git_url, branch='main'):
         """完整的自动扫描流程（兼容旧接口）"""
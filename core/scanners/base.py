@@ -2,12 +2,29 @@ import os
 import subprocess
 from abc import ABC, abstractmethod
 from django.conf import settings
+from .dependency_cache import dependency_cache
+from ..scan_timing import timed_stage
+from ..process_control import process_tracker, terminate_process_groups, ScanCancelled
 
 class BaseScanEngine(ABC):
     """扫描引擎基类"""
     
+    # 引擎名称，用于阶段耗时统计
+    name = ''
+    
     def __init__(self):
         self.config = settings.AUTO_SCAN_CONFIG
+        # 由AutoScanner注入的阶段计时器
+        self.timer = None
+        # 资源预算，多个引擎并行时由AutoScanner均分
+        self.threads = self.config['SLOT_THREADS']
+        self.ram_mb = self.config['SLOT_RAM_MB']
+        # 分片扫描的模块目录（相对源码根目录，''为根目录分片），None表示扫描整个仓库
+        self.module = None
+        # 根目录分片需要排除的模块目录
+        self.excluded_modules = []
+        # 分片扫描前已在仓库根目录统一安装依赖/构建，分片不再单独构建
+        self.prebuilt = False
         
     @abstractmethod
     def scan(self, source_path, output_path):
@@ -19,22 +36,58 @@ class BaseScanEngine(ABC):
         """获取支持的语言"""
         pass
         
-    def run_command(self, cmd, cwd=None, timeout=None, log_callback=None):
+    def set_resources(self, threads, ram_mb):
+        """设置引擎可用的线程数和内存（MB）"""
+        self.threads = max(1, threads)
+        self.ram_mb = max(512, ram_mb)
+        
+    def set_shard(self, module, excluded_modules=()):
+        """只扫描仓库中的一个模块"""
+        self.module = module
+        self.excluded_modules = list(excluded_modules)
+        self.prebuilt = True
+        self.name = f"{self.name}@{module or '.'}"
+        
+    def report_name(self, source_path):
+        """报告文件名前缀，分片扫描时带上模块路径，避免并行分片的报告重名"""
+        name = os.path.basename(source_path)
+        if self.module:
+            name += '_' + self.module.replace('/', '_')
+        return name
+        
+    def stage(self, stage_name):
+        """阶段计时"""
+        return timed_stage(self.timer, stage_name, self.name)
+        
+    def run_command(self, cmd, cwd=None, timeout=None, log_callback=None, env=None):
         """执行命令"""
         timeout = timeout or self.config['TIMEOUT']
+        # 默认注入共享依赖缓存，构建工具（包括codeql --command启动的构建）复用同一份缓存
+        env = env or dependency_cache.get_build_env()
         
         if log_callback:
             # 将命令中的绝对路径转为相对路径显示
             display_cmd = self._format_cmd_for_display(cmd)
             log_callback(f"[CMD] {display_cmd}")
         
-        # 使用Popen实现实时输出
+        # 取消请求可能在两个命令之间到达
+        process_tracker.check_cancelled()
+        
+        # 使用Popen实现实时输出，命令运行在独立的进程组中，取消/超时时整组终止
         import subprocess
         process = subprocess.Popen(
             cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-            cwd=cwd, text=True, bufsize=1, universal_newlines=True
+            cwd=cwd, env=env, text=True, bufsize=1, universal_newlines=True,
+            start_new_session=True
         )
-        
+        process_tracker.register(process.pid)
+        try:
+            return self._wait_command(process, timeout, log_callback)
+        finally:
+            process_tracker.unregister(process.pid)
+    
+    def _wait_command(self, process, timeout, log_callback=None):
+        """读取命令输出直到结束"""
         stdout_lines = []
         stderr_lines = []
         
@@ -45,11 +98,21 @@ class BaseScanEngine(ABC):
         
         while True:
             if timeout and time.time() - start_time > timeout:
-                process.kill()
+                terminate_process_groups([process.pid], grace_period=0)
+                process.wait()
                 raise Exception(f"命令执行超时: {timeout}秒")
+            
+            if process_tracker.is_cancelled():
+                # 进程组已由cancel()发送终止信号，宽限期后由后台线程强制终止，
+                # 这里不等待进程退出，工作线程立即释放
+                raise ScanCancelled("扫描任务已被取消")
                 
-            # 检查进程是否结束
-            if process.poll() is not None:
+            # 检查进程是否结束（wait4同时取得子进程的资源使用，用于记录峰值内存）
+            pid, wait_status, rusage = os.wait4(process.pid, os.WNOHANG)
+            if pid != 0:
+                process.returncode = os.waitstatus_to_exitcode(wait_status)
+                if self.timer:
+                    self.timer.record_rss(rusage.ru_maxrss)
                 break
                 
             # 读取可用的输出
@@ -1,13 +1,27 @@
 import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
+from django.db import connection
 from .base import BaseScanEngine
+from .dependency_cache import dependency_cache
+from .rule_cache import rule_cache
+from ..scan_timing import timed_stage
+from ..process_control import process_tracker
 
 class CodeQLEngine(BaseScanEngine):
-    """CodeQL扫描引擎"""
+    """CodeQL扫描引擎
+    
+    language 可以是单个语言或语言列表。多个语言时使用 database create --db-cluster
+    一次遍历源码创建各语言数据库，然后并行分析每个语言的数据库。
+    """
     
     def __init__(self, language, project=None):
         super().__init__()
-        self.language = language
+        self.languages = [language] if isinstance(language, str) else list(language)
+        self.language = self.languages[0]
+        self.name = f"codeql-{'+'.join(self.languages)}"
         self.project = project
         self.codeql_bin = self.config['TOOLS']['CODEQL_BIN']
         self.codeql_rules = self.config['TOOLS']['CODEQL_RULES']
@@ -16,30 +30,46 @@ class CodeQLEngine(BaseScanEngine):
         return self.language
         
     def scan(self, source_path, output_path, log_callback=None):
-        """执行CodeQL扫描"""
-        project_name = os.path.basename(source_path)
+        """执行CodeQL扫描，多语言时返回每个语言的SARIF文件列表"""
+        project_name = self.report_name(source_path)
         timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
-        sarif_file = os.path.join(output_path, f'{project_name}_codeql_{self.language}_{timestamp}.sarif')
+        sarif_files = {
+            language: os.path.join(output_path, f'{project_name}_codeql_{language}_{timestamp}.sarif')
+            for language in self.languages
+        }
         import uuid
         unique_id = str(uuid.uuid4())[:8]
         db_path = os.path.join(self.config['WORK_DIR'], f'codeql-db-{unique_id}')
+        # 分片扫描时以模块目录为源码根，Maven构建仍从仓库根目录执行
+        self.root_path = source_path
+        if self.module:
+            source_path = os.path.join(source_path, self.module)
         
         if log_callback:
             from django.conf import settings
             relative_path = os.path.relpath(source_path, settings.BASE_DIR)
-            log_callback(f"[INFO] 开始{self.language}扫描: {relative_path}")
+            log_callback(f"[INFO] 开始{'/'.join(self.languages)}扫描: {relative_path}")
         
-        if self.language == 'java':
-            self._scan_java(source_path, db_path, sarif_file, log_callback)
-        elif self.language == 'javascript':
-            self._scan_javascript(source_path, db_path, sarif_file, log_callback)
+        try:
+            if len(self.languages) > 1:
+                self._scan_cluster(source_path, db_path, sarif_files, log_callback)
+            elif self.language == 'java':
+                self._scan_java(source_path, db_path, sarif_files['java'], log_callback)
+            elif self.language == 'javascript':
+                self._scan_javascript(source_path, db_path, sarif_files['javascript'], log_callback)
+        finally:
+            # 只清理本引擎的数据库，不影响并行执行的其他扫描
+            shutil.rmtree(db_path, ignore_errors=True)
             
         if log_callback:
             from django.conf import settings
-            relative_sarif = os.path.relpath(sarif_file, settings.BASE_DIR)
-            log_callback(f"[INFO] 扫描完成: {relative_sarif}")
+            for sarif_file in sarif_files.values():
+                relative_sarif = os.path.relpath(sarif_file, settings.BASE_DIR)
+                log_callback(f"[INFO] 扫描完成: {relative_sarif}")
             
-        return sarif_file
+        if len(self.languages) == 1:
+            return sarif_files[self.language]
+        return list(sarif_files.values())
         
     def _get_build_command(self, source_path, language):
         """获取编译命令"""
@@ -49,43 +79,105 @@ class CodeQLEngine(BaseScanEngine):
         
         # 默认命令
         jdk_home = self.config['TOOLS']['JDK_HOME']
+        if language == 'java' and self.module:
+            # 只编译本模块，依赖的其他模块已由分片前的 mvn install 安装到本地仓库
+            return f"env JAVA_HOME={jdk_home} PATH={jdk_home}/bin:$PATH mvn -f {self.root_path}/pom.xml -pl {self.module} clean compile -DskipTests"
         if language == 'java':
             return f"env JAVA_HOME={jdk_home} PATH={jdk_home}/bin:$PATH mvn clean compile -DskipTests"
         elif language == 'javascript':
-            return "npm install --ignore-scripts --no-audit --no-fund --legacy-peer-deps"
+            # 保留package-lock.json并优先使用本地缓存，--no-save 避免改写锁文件影响后续 git pull
+            return "npm install --prefer-offline --no-save --ignore-scripts --no-audit --no-fund --legacy-peer-deps"
         
         return ""
     
+    def _extractor_env(self):
+        """根目录分片排除各模块目录（JavaScript提取器读取LGTM_INDEX_FILTERS）"""
+        env = dependency_cache.get_build_env()
+        if self.excluded_modules:
+            env = {**env, 'LGTM_INDEX_FILTERS': '\n'.join(f'exclude:{module}/**' for module in self.excluded_modules)}
+        return env
+        
+    def prebuild(self, source_path, languages, log_callback=None):
+        """分片扫描前在仓库根目录统一安装依赖/构建一次，分片只编译自身模块"""
+        if 'java' in languages:
+            jdk_home = self.config['TOOLS']['JDK_HOME']
+            install_cmd = f"cd {source_path} && env JAVA_HOME={jdk_home} PATH={jdk_home}/bin:$PATH mvn install -DskipTests -q"
+            with timed_stage(self.timer, 'build', 'maven'), dependency_cache.track('maven', log_callback):
+                self.run_command(install_cmd, log_callback=log_callback)
+        if 'javascript' in languages and os.path.exists(os.path.join(source_path, 'package.json')):
+            compile_cmd = f"cd {source_path} && {self._get_build_command(source_path, 'javascript')}"
+            with timed_stage(self.timer, 'build', 'npm'), dependency_cache.track('npm', log_callback):
+                self.run_command(compile_cmd, log_callback=log_callback, timeout=900)
+        
     def _scan_java(self, source_path, db_path, sarif_file, log_callback=None):
         """Java项目扫描"""
         build_command = self._get_build_command(source_path, 'java')
         
-        compile_cmd = f"cd {source_path} && {build_command}"
-        self.run_command(compile_cmd, log_callback=log_callback)
-        
+        # 编译只在 database create 的 --command 中执行一次，依赖从共享Maven仓库读取
         create_cmd = f"{self.codeql_bin} database create {db_path} --language=java --source-root={source_path} --overwrite --command='{build_command}'"
-        self.run_command(create_cmd, log_callback=log_callback)
+        with self.stage('database_create'), dependency_cache.track('maven', log_callback):
+            self.run_command(create_cmd, log_callback=log_callback)
         
-        analyze_cmd = f"{self.codeql_bin} database analyze {db_path} --format=sarifv2.1.0 --output={sarif_file} --threads=8 --ram=7000 --search-path={self.codeql_rules} {self.codeql_rules}/java/ql/src/codeql-suites/java-security-extended.qls"
-        self.run_command(analyze_cmd, log_callback=log_callback)
+        with self.stage('database_analyze'):
+            self._analyze(db_path, 'java', sarif_file, log_callback)
         
     def _scan_javascript(self, source_path, db_path, sarif_file, log_callback=None):
         """JavaScript项目扫描"""
         build_command = self._get_build_command(source_path, 'javascript')
         
-        if build_command and build_command.strip():
+        if build_command and build_command.strip() and not self.prebuilt:
             compile_cmd = f"cd {source_path} && {build_command}"
-            self.run_command(compile_cmd, log_callback=log_callback, timeout=900)
-        elif os.path.exists(os.path.join(source_path, 'package.json')):
-            import subprocess
-            cleanup_cmd = f"cd {source_path} && rm -f package-lock.json"
-            subprocess.run(cleanup_cmd, shell=True)
-            
-            install_cmd = f"cd {source_path} && npm install --ignore-scripts --no-audit --no-fund --legacy-peer-deps"
-            self.run_command(install_cmd, log_callback=log_callback, timeout=900)
+            with self.stage('build'), dependency_cache.track('npm', log_callback):
+                self.run_command(compile_cmd, log_callback=log_callback, timeout=900)
         
         create_cmd = f"{self.codeql_bin} database create {db_path} --language=javascript --source-root={source_path} --overwrite"
-        self.run_command(create_cmd, log_callback=log_callback, timeout=900)
+        with self.stage('database_create'):
+            self.run_command(create_cmd, log_callback=log_callback, timeout=900, env=self._extractor_env())
+        
+        with self.stage('database_analyze'):
+            self._analyze(db_path, 'javascript', sarif_file, log_callback)
+        
+    def _scan_cluster(self, source_path, db_path, sarif_files, log_callback=None):
+        """多语言项目扫描：一次database create创建数据库集群，再并行分析各语言数据库"""
+        if 'javascript' in self.languages and not self.prebuilt and os.path.exists(os.path.join(source_path, 'package.json')):
+            build_command = self._get_build_command(source_path, 'javascript')
+            # 自定义编译命令作为 --command 交给编译型语言使用，这里只安装前端依赖
+            if build_command and not (self.project and self.project.build_command and self.project.build_command.strip()):
+                compile_cmd = f"cd {source_path} && {build_command}"
+                with self.stage('build'), dependency_cache.track('npm', log_callback):
+                    self.run_command(compile_cmd, log_callback=log_callback, timeout=900)
+        
+        create_cmd = f"{self.codeql_bin} database create {db_path} --db-cluster --language={','.join(self.languages)} --source-root={source_path} --overwrite"
+        if 'java' in self.languages:
+            create_cmd += f" --command='{self._get_build_command(source_path, 'java')}'"
+        # 只有Java编译会读取Maven缓存
+        maven_cache = dependency_cache.track('maven', log_callback) if 'java' in self.languages else nullcontext()
+        with self.stage('database_create'), maven_cache:
+            self.run_command(create_cmd, log_callback=log_callback, env=self._extractor_env())
+        
+        # 各语言数据库并行分析，线程和内存预算按语言数均分
+        threads = max(1, self.threads // len(self.languages))
+        ram_mb = max(512, self.ram_mb // len(self.languages))
+        scan_task_id = process_tracker.current_task()
+        
+        def _analyze_language(language):
+            language_log = (lambda message: log_callback(f"[{language}] {message}")) if log_callback else None
+            try:
+                with process_tracker.attach(scan_task_id), timed_stage(self.timer, 'database_analyze', f'codeql-{language}'):
+                    self._analyze(os.path.join(db_path, language), language, sarif_files[language],
+                                  language_log, threads, ram_mb)
+            finally:
+                connection.close()
+        
+        with ThreadPoolExecutor(max_workers=len(self.languages)) as executor:
+            for future in [executor.submit(_analyze_language, language) for language in self.languages]:
+                future.result()
         
-        analyze_cmd = f"{self.codeql_bin} database analyze {db_path} --format=sarifv2.1.0 --output={sarif_file} --threads=8 --ram=7000 --search-path={self.codeql_rules} {self.codeql_rules}/javascript/ql/src/codeql-suites/javascript-security-extended.qls"
+    def _analyze(self, db_path, language, sarif_file, log_callback=None, threads=None, ram_mb=None):
+        """分析单个语言的数据库"""
+        threads = threads or self.threads
+        ram_mb = ram_mb or self.ram_mb
+        suite = rule_cache.get_codeql_suite(language)
+        # 查询计划写入共享编译缓存，后续扫描不再重复编译
+        analyze_cmd = f"{self.codeql_bin} database analyze {db_path} --format=sarifv2.1.0 --output={sarif_file} --threads={threads} --ram={ram_mb} --compilation-cache={rule_cache.get_codeql_cache_dir()} --search-path={self.codeql_rules} {suite}"
         self.run_command(analyze_cmd, log_callback=log_callback)
\ No newline at end of file
@@ -0,0 +1,112 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class DependencyCache:
+    """构建依赖缓存 - 同一主机上所有扫描共享Maven/npm/Composer缓存"""
+
+    # 缓存类型 -> (子目录, 环境变量构造函数, 统计的文件后缀)
+    CACHE_TYPES = {
+        'maven': {
+            'subdir': 'maven',
+            'env': lambda path: {'MAVEN_OPTS': f"{os.environ.get('MAVEN_OPTS', '')} -Dmaven.repo.local={path}".strip()},
+            'suffixes': ('.jar', '.pom'),
+        },
+        'npm': {
+            'subdir': 'npm',
+            'env': lambda path: {'npm_config_cache': path},
+            'suffixes': None,  # _cacache 内容文件无后缀
+        },
+        'composer': {
+            'subdir': 'composer',
+            'env': lambda path: {'COMPOSER_CACHE_DIR': path},
+            'suffixes': ('.zip', '.json'),
+        },
+    }
+
+    @property
+    def base_dir(self):
+        return settings.AUTO_SCAN_CONFIG['CACHE_DIR']
+
+    def get_cache_dir(self, cache_type):
+        """获取缓存目录（不存在时自动创建）"""
+        path = os.path.join(self.base_dir, self.CACHE_TYPES[cache_type]['subdir'])
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def get_build_env(self):
+        """获取注入了所有依赖缓存的构建环境变量"""
+        env = os.environ.copy()
+        for cache_type, cache_info in self.CACHE_TYPES.items():
+            env.update(cache_info['env'](self.get_cache_dir(cache_type)))
+        return env
+
+    def list_entries(self, cache_type):
+        """缓存中的构件文件路径"""
+        suffixes = self.CACHE_TYPES[cache_type]['suffixes']
+        cache_dir = self.get_cache_dir(cache_type)
+        if cache_type == 'npm':
+            # npm 只统计内容寻址存储中的条目
+            cache_dir = os.path.join(cache_dir, '_cacache', 'content-v2')
+
+        entries = set()
+        for root, _, files in os.walk(cache_dir):
+            entries.update(os.path.join(root, f) for f in files if not suffixes or f.endswith(suffixes))
+        return entries
+
+    @staticmethod
+    def _used_since(path, since):
+        """构件在 since 之后被读取或更新过（按 atime/mtime 判断）"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        return max(stat.st_atime, stat.st_mtime) >= since
+
+    @contextmanager
+    def track(self, cache_type, log_callback=None):
+        """统计一次构建期间的缓存命中率，并写入扫描日志
+
+        命中数为构建前已在缓存中、构建期间被读取过（atime/mtime 晚于构建开始）的构件数，
+        未命中数为构建期间新下载的构件数；缓存中本次构建没有用到的构件不计入。
+        文件系统以 noatime 挂载，或 relatime 下构件在24小时内已被读取过时 atime 不会更新，
+        命中数偏低；同一缓存上并行的其他构建读取的构件也会计入。
+        """
+        from ..workspace import workspace_manager
+        workspace_manager.touch(self.get_cache_dir(cache_type), 'cache')
+        # 文件时间戳精度可能只有1秒
+        started = time.time() - 1
+        try:
+            before = self.list_entries(cache_type)
+        except Exception as e:
+            logger.warning(f"统计{cache_type}缓存失败: {e}")
+            before = None
+
+        yield
+
+        if before is None:
+            return
+        try:
+            after = self.list_entries(cache_type)
+            hits = sum(1 for path in before & after if self._used_since(path, started))
+        except Exception as e:
+            logger.warning(f"统计{cache_type}缓存失败: {e}")
+            return
+
+        downloaded = len(after - before)
+        resolved = hits + downloaded
+        hit_rate = (hits / resolved * 100) if resolved else 0
+
+        if log_callback:
+            log_callback(
+                f"[CACHE] {cache_type}缓存: 本次构建使用 {resolved} 个构件, 命中 {hits} 个, 新下载 {downloaded} 个, "
+                f"命中率 {hit_rate:.1f}%（缓存共 {len(after)} 个构件）"
+            )
+
+# 全局缓存实例
+dependency_cache = DependencyCache()
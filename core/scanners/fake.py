@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import shlex
+import random
+import subprocess
+from datetime import datetime
+from urllib.parse import urlsplit, parse_qs
+from django.conf import settings
+from .base import BaseScanEngine
+
+# 模拟扫描器输出日志的子进程：在delay秒内均匀输出指定行数的日志
+LOG_EMITTER = '''
+import sys, time
+lines, delay = int(sys.argv[1]), float(sys.argv[2])
+batch = max(1, lines // max(1, int(delay * 10)))
+interval = delay / max(1, lines / batch)
+for i in range(lines):
+    print(f"[fake] analyzing file_{i % 1000}.fake: {i + 1}/{lines} queries evaluated", flush=(i + 1) % batch == 0)
+    if (i + 1) % batch == 0:
+        time.sleep(interval)
+if not lines:
+    time.sleep(delay)
+'''
+
+# 模拟的规则：(规则ID, CWE, security-severity)
+FAKE_RULES = [
+    ('fake/sql-injection', 89, '9.8'),
+    ('fake/xss', 79, '6.1'),
+    ('fake/path-traversal', 22, '7.5'),
+    ('fake/weak-hash', 327, '5.3'),
+    ('fake/info-leak', 200, '3.1'),
+]
+
+# URL参数默认值
+FAKE_DEFAULTS = {
+    'delay': 5.0,        # 扫描耗时（秒）
+    'log_lines': 1000,   # 扫描日志行数
+    'findings': 100,     # SARIF结果数
+    'files': 20,         # 模拟仓库的源文件数
+    'fail_rate': 0.0,    # 扫描失败的概率
+    'seed': None,        # 随机种子，固定后每次生成相同的结果
+}
+
+
+def is_fake_url(git_url):
+    return (git_url or '').startswith('fake://')
+
+
+def fake_url_allowed(git_url):
+    """不是模拟地址，或已启用模拟扫描引擎（AUTO_SCAN_CONFIG['FAKE_ENGINES_ENABLED']，仅用于压测环境）"""
+    return not is_fake_url(git_url) or settings.AUTO_SCAN_CONFIG['FAKE_ENGINES_ENABLED']
+
+
+def parse_fake_url(git_url):
+    """解析 fake://<名称>?delay=5&log_lines=1000&findings=100&files=20&fail_rate=0 形式的地址"""
+    parts = urlsplit(git_url)
+    query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+    options = dict(FAKE_DEFAULTS)
+    for key, default in FAKE_DEFAULTS.items():
+        if key not in query:
+            continue
+        cast = type(default) if default is not None else int
+        options[key] = cast(query[key])
+    options['name'] = parts.netloc or 'fake'
+    return options
+
+
+def create_fake_repository(target_dir, options):
+    """生成模拟仓库：files个源文件并提交到本地git仓库（入库时读取源码上下文和blame）"""
+    marker = os.path.join(target_dir, '.fake-repo')
+    if os.path.exists(marker):
+        with open(marker, 'r', encoding='utf-8') as f:
+            if f.read().strip() == str(options['files']):
+                return target_dir
+
+    subprocess.run(['rm', '-rf', target_dir])
+    os.makedirs(os.path.join(target_dir, 'src'))
+    for i in range(options['files']):
+        with open(os.path.join(target_dir, 'src', f'file_{i}.fake'), 'w', encoding='utf-8') as f:
+            f.writelines(f"line {line} of file_{i}: query(input_{line})\n" for line in range(1, 201))
+    env = dict(os.environ, GIT_AUTHOR_NAME='loadtest', GIT_AUTHOR_EMAIL='loadtest@example.com',
+               GIT_COMMITTER_NAME='loadtest', GIT_COMMITTER_EMAIL='loadtest@example.com')
+    for cmd in (['git', 'init', '-q'], ['git', 'add', 'src'], ['git', 'commit', '-qm', 'fake repository']):
+        subprocess.run(cmd, cwd=target_dir, env=env, capture_output=True)
+    with open(marker, 'w', encoding='utf-8') as f:
+        f.write(str(options['files']))
+    return target_dir
+
+
+class FakeScanEngine(BaseScanEngine):
+    """模拟扫描引擎 - 用于离线压测扫描队列、日志和入库
+
+    不依赖CodeQL/Maven/Semgrep：通过子进程在delay秒内输出log_lines行日志（经过与真实引擎
+    相同的进程组登记、取消和日志管道），然后生成包含findings个结果的SARIF。参数来自
+    fake:// 仓库地址，见 parse_fake_url。
+    """
+
+    name = 'fake'
+
+    def __init__(self, project=None, options=None):
+        super().__init__()
+        self.project = project
+        self.options = options or dict(FAKE_DEFAULTS)
+
+    def get_language(self):
+        return 'fake'
+
+    def scan(self, source_path, output_path, log_callback=None):
+        options = self.options
+        rng = random.Random(options['seed'])
+        timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        sarif_file = os.path.join(output_path, f'{self.report_name(source_path)}_fake_{timestamp}.sarif')
+
+        if log_callback:
+            log_callback(f"[INFO] 模拟扫描: {options['delay']}s, {options['log_lines']} 行日志, {options['findings']} 个结果")
+
+        cmd = f"{sys.executable} -c {shlex.quote(LOG_EMITTER)} {int(options['log_lines'])} {float(options['delay'])}"
+        with self.stage('fake_scan'):
+            self.run_command(cmd, log_callback=log_callback, timeout=max(self.config['TIMEOUT'], options['delay'] * 2 + 60))
+
+        if rng.random() < options['fail_rate']:
+            raise Exception("模拟扫描失败")
+
+        self._write_sarif(sarif_file, source_path, rng)
+        if log_callback:
+            log_callback(f"[INFO] 扫描完成: {os.path.basename(sarif_file)}")
+        return sarif_file
+
+    def _write_sarif(self, sarif_file, source_path, rng):
+        files = sorted(
+            os.path.relpath(os.path.join(root, name), source_path)
+            for root, _, names in os.walk(os.path.join(source_path, 'src'))
+            for name in names
+        ) or ['src/file_0.fake']
+        rules = [
+            {
+                'id': rule_id,
+                'name': rule_id.split('/')[-1],
+                'shortDescription': {'text': f'Fake {rule_id.split("/")[-1]}'},
+                'properties': {'security-severity': severity, 'tags': ['security', f'external/cwe/cwe-{cwe:03d}']},
+            }
+            for rule_id, cwe, severity in FAKE_RULES
+        ]
+        results = []
+        for i in range(self.options['findings']):
+            rule_id = rng.choice(FAKE_RULES)[0]
+            results.append({
+                'ruleId': rule_id,
+                'message': {'text': f'Fake {rule_id} finding #{i}: untrusted data flows to a sensitive sink'},
+                'locations': [{
+                    'physicalLocation': {
+                        'artifactLocation': {'uri': rng.choice(files), 'uriBaseId': '%SRCROOT%'},
+                        'region': {'startLine': rng.randint(1, 200), 'startColumn': 1},
+                    }
+                }],
+                'partialFingerprints': {'primaryLocationLineHash': f'{rng.getrandbits(64):016x}'},
+            })
+        with open(sarif_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': '2.1.0',
+                'runs': [{'tool': {'driver': {'name': 'FakeScanner', 'rules': rules}}, 'results': results}],
+            }, f)
@@ -0,0 +1,187 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import subprocess
+import urllib.request
+from datetime import datetime
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RuleCacheError(Exception):
+    """规则缓存不可用"""
+    pass
+
+
+class RuleCache:
+    """扫描规则本地缓存 - 扫描时只使用本地规则，不访问网络
+
+    Semgrep规则包按版本保存为本地YAML文件（<规则目录>/<规则包>/<版本>.yaml），
+    manifest.json 记录每个规则包的当前版本和历史版本；CodeQL使用持久的查询编译缓存，
+    查询计划编译一次后所有扫描复用。两者都由 refresh_rule_cache 命令刷新。
+    """
+
+    MANIFEST_FILE = 'manifest.json'
+
+    # CodeQL语言 -> 查询套件（相对CODEQL_RULES）
+    CODEQL_SUITES = {
+        'java': 'java/ql/src/codeql-suites/java-security-extended.qls',
+        'javascript': 'javascript/ql/src/codeql-suites/javascript-security-extended.qls',
+    }
+
+    @property
+    def config(self):
+        return settings.AUTO_SCAN_CONFIG
+
+    @property
+    def semgrep_rules_dir(self):
+        return self.config['SEMGREP_RULES_DIR']
+
+    # ---------------- Semgrep ----------------
+
+    def _pack_dir(self, pack):
+        # p/php -> p_php
+        return os.path.join(self.semgrep_rules_dir, pack.replace('/', '_'))
+
+    def load_manifest(self):
+        path = os.path.join(self.semgrep_rules_dir, self.MANIFEST_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_manifest(self, manifest):
+        os.makedirs(self.semgrep_rules_dir, exist_ok=True)
+        path = os.path.join(self.semgrep_rules_dir, self.MANIFEST_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    def get_semgrep_config(self, pack):
+        """获取规则包当前版本的本地文件路径，未缓存时抛出RuleCacheError"""
+        entry = self.load_manifest().get(pack)
+        if entry:
+            version = entry['versions'].get(entry['current'])
+            path = os.path.join(self._pack_dir(pack), version['file']) if version else None
+            if path and os.path.exists(path):
+                return path
+        raise RuleCacheError(f"Semgrep规则包 {pack} 未缓存，请先执行: python manage.py refresh_rule_cache")
+
+    def refresh_semgrep_pack(self, pack):
+        """从规则库下载规则包，内容有变化时保存为新版本
+
+        返回 (版本号, 是否为新版本)。
+        """
+        url = f"{self.config['SEMGREP_REGISTRY_URL'].rstrip('/')}/{pack}"
+        request = urllib.request.Request(url, headers={'Accept': 'application/x-yaml', 'User-Agent': 'semgrep'})
+        with urllib.request.urlopen(request, timeout=120) as response:
+            content = response.read()
+
+        sha256 = hashlib.sha256(content).hexdigest()
+        manifest = self.load_manifest()
+        entry = manifest.setdefault(pack, {'current': None, 'versions': {}})
+        for version, info in entry['versions'].items():
+            if info['sha256'] == sha256 and os.path.exists(os.path.join(self._pack_dir(pack), info['file'])):
+                entry['current'] = version
+                self.save_manifest(manifest)
+                return version, False
+
+        version = f"{datetime.now().strftime('%Y%m%d%H%M%S')}-{sha256[:8]}"
+        pack_dir = self._pack_dir(pack)
+        os.makedirs(pack_dir, exist_ok=True)
+        filename = f"{version}.yaml"
+        tmp_path = os.path.join(pack_dir, f"{filename}.tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, os.path.join(pack_dir, filename))
+
+        entry['versions'][version] = {
+            'file': filename,
+            'sha256': sha256,
+            'rules': self._count_rules(content),
+            'source': url,
+            'fetched_at': datetime.now().isoformat(timespec='seconds'),
+        }
+        entry['current'] = version
+        self._prune_versions(pack, entry)
+        self.save_manifest(manifest)
+        return version, True
+
+    def _count_rules(self, content):
+        try:
+            import yaml
+            return len((yaml.safe_load(content) or {}).get('rules', []))
+        except Exception:
+            return None
+
+    def _prune_versions(self, pack, entry):
+        """只保留最近的若干个版本"""
+        keep = self.config['SEMGREP_RULE_VERSIONS_KEEP']
+        versions = sorted(entry['versions'])
+        for version in versions[:-keep] if keep > 0 else []:
+            if version == entry['current']:
+                continue
+            info = entry['versions'].pop(version)
+            try:
+                os.remove(os.path.join(self._pack_dir(pack), info['file']))
+            except FileNotFoundError:
+                pass
+
+    # ---------------- CodeQL ----------------
+
+    def get_codeql_cache_dir(self):
+        """CodeQL查询编译缓存目录（所有扫描共享）"""
+        from ..workspace import workspace_manager
+        path = self.config['CODEQL_COMPILATION_CACHE']
+        os.makedirs(path, exist_ok=True)
+        workspace_manager.touch(path, 'cache')
+        return path
+
+    def get_codeql_suite(self, language):
+        return os.path.join(self.config['TOOLS']['CODEQL_RULES'], self.CODEQL_SUITES[language])
+
+    def warm_codeql_cache(self, language, clear=False):
+        """预编译查询套件写入编译缓存，之后的analyze直接复用查询计划"""
+        cache_dir = self.get_codeql_cache_dir()
+        if clear:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            os.makedirs(cache_dir, exist_ok=True)
+
+        codeql_bin = self.config['TOOLS']['CODEQL_BIN']
+        codeql_rules = self.config['TOOLS']['CODEQL_RULES']
+        cmd = [
+            codeql_bin, 'query', 'compile', '--threads=0',
+            f'--compilation-cache={cache_dir}', f'--search-path={codeql_rules}',
+            self.get_codeql_suite(language),
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuleCacheError(f"预编译{language}查询失败: {result.stderr.strip()[-2000:]}")
+
+    def status(self):
+        """缓存状态（用于命令行展示）"""
+        manifest = self.load_manifest()
+        cache_dir = self.config['CODEQL_COMPILATION_CACHE']
+        cache_size = 0
+        for root, _, files in os.walk(cache_dir):
+            cache_size += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        return {
+            'semgrep': {
+                pack: {
+                    'current': entry['current'],
+                    'versions': len(entry['versions']),
+                    'rules': entry['versions'].get(entry['current'], {}).get('rules'),
+                }
+                for pack, entry in manifest.items()
+            },
+            'codeql_cache_dir': cache_dir,
+            'codeql_cache_bytes': cache_size,
+        }
+
+
+# 全局规则缓存实例
+rule_cache = RuleCache()
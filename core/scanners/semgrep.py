@@ -1,13 +1,21 @@
 import os
+import json
+import shlex
 from datetime import datetime
 from .base import BaseScanEngine
+from .dependency_cache import dependency_cache
+from .rule_cache import rule_cache
 
 class SemgrepEngine(BaseScanEngine):
     """Semgrep扫描引擎"""
     
+    name = 'semgrep'
+    
     def __init__(self, project=None):
         super().__init__()
         self.project = project
+        # 增量扫描时只扫描这些文件（相对源码根目录的路径），None表示全量扫描
+        self.targets = None
     
     def get_language(self):
         return 'php'
@@ -26,7 +34,7 @@ class SemgrepEngine(BaseScanEngine):
         
     def scan(self, source_path, output_path, log_callback=None):
         """执行Semgrep扫描"""
-        project_name = os.path.basename(source_path)
+        project_name = self.report_name(source_path)
         timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
         sarif_file = os.path.join(output_path, f'{project_name}_semgrep_{timestamp}.sarif')
         
@@ -35,22 +43,49 @@ class SemgrepEngine(BaseScanEngine):
             relative_path = os.path.relpath(source_path, settings.BASE_DIR)
             log_callback(f"[INFO] 开始PHP扫描: {relative_path}")
         
-        # 执行PHP编译命令（如果有）
-        build_command = self._get_build_command(source_path)
-        if build_command:
+        semgrep_bin = self.config['TOOLS']['SEMGREP_BIN']
+        # 使用本地缓存的规则包，扫描时不访问规则库
+        rules_file = rule_cache.get_semgrep_config(self.config['SEMGREP_RULE_PACKS']['php'])
+        excludes = ''
+        if self.module is not None:
+            # 分片扫描只分析模块目录，根目录分片排除各模块
+            targets = shlex.quote(os.path.join(source_path, self.module) if self.module else source_path)
+            excludes = ''.join(f' --exclude={shlex.quote(module)}' for module in self.excluded_modules)
+        elif self.targets is None:
+            # 执行PHP编译命令（如果有）
+            build_command = self._get_build_command(source_path)
+            if build_command:
+                if log_callback:
+                    log_callback(f"[INFO] 执行PHP编译: {build_command}")
+                compile_cmd = f"cd {source_path} && {build_command}"
+                with self.stage('build'), dependency_cache.track('composer', log_callback):
+                    self.run_command(compile_cmd, log_callback=log_callback, timeout=600)
+            targets = source_path
+        else:
+            # 增量扫描只分析变更的源码文件，不需要安装依赖
             if log_callback:
-                log_callback(f"[INFO] 执行PHP编译: {build_command}")
-            compile_cmd = f"cd {source_path} && {build_command}"
-            self.run_command(compile_cmd, log_callback=log_callback, timeout=600)
+                log_callback(f"[INFO] 增量扫描 {len(self.targets)} 个变更文件")
+            if not self.targets:
+                self._write_empty_sarif(sarif_file)
+                return sarif_file
+            targets = ' '.join(shlex.quote(os.path.join(source_path, path)) for path in self.targets)
         
-        semgrep_bin = self.config['TOOLS']['SEMGREP_BIN']
-        cmd = f"{semgrep_bin} --config=p/php --sarif --output={sarif_file} {source_path}"
+        cmd = f"{semgrep_bin} --config={rules_file} --metrics=off --disable-version-check --sarif --jobs={self.threads} --max-memory={self.ram_mb} --output={sarif_file}{excludes} {targets}"
         
-        self.run_command(cmd, log_callback=log_callback)
+        with self.stage('semgrep_scan'):
+            self.run_command(cmd, log_callback=log_callback)
         
         if log_callback:
             from django.conf import settings
             relative_sarif = os.path.relpath(sarif_file, settings.BASE_DIR)
             log_callback(f"[INFO] 扫描完成: {relative_sarif}")
             
-        return sarif_file
\ No newline at end of file
+        return sarif_file
+        
+    def _write_empty_sarif(self, sarif_file):
+        """没有需要扫描的文件时输出空结果"""
+        with open(sarif_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': '2.1.0',
+                'runs': [{'tool': {'driver': {'name': 'Semgrep'}}, 'results': []}],
+            }, f)
\ No newline at end of file
@@ -0,0 +1,171 @@
+import os
+import glob
+import json
+import posixpath
+import logging
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+# 根目录分片（不属于任何模块的源码）的名称
+ROOT_SHARD = '.'
+
+# 根目录下这些文件变化会影响所有模块，需要重新扫描全部分片
+SHARED_BUILD_FILES = {
+    'pom.xml', 'package.json', 'package-lock.json', 'yarn.lock',
+    'pnpm-lock.yaml', 'pnpm-workspace.yaml', 'composer.json', 'composer.lock',
+}
+
+
+def maven_modules(source_path, rel=''):
+    """读取pom.xml中的<modules>，递归展开聚合模块，返回叶子模块的相对路径"""
+    try:
+        tree = ET.parse(os.path.join(source_path, rel, 'pom.xml'))
+    except (OSError, ET.ParseError):
+        return []
+
+    modules = []
+    for element in tree.iter():
+        if element.tag.rsplit('}', 1)[-1] != 'module' or not (element.text or '').strip():
+            continue
+        path = posixpath.normpath(posixpath.join(rel, element.text.strip()))
+        if path.startswith('..') or not os.path.isfile(os.path.join(source_path, path, 'pom.xml')):
+            continue
+        # 聚合模块本身不含源码，只保留叶子模块
+        modules.extend(maven_modules(source_path, path) or [path])
+    return modules
+
+
+def expand_globs(source_path, patterns):
+    """展开目录通配符（相对源码根目录），以!开头的模式表示排除"""
+    included, excluded = [], set()
+    for pattern in patterns:
+        pattern = pattern.strip()
+        if not pattern:
+            continue
+        target = excluded if pattern.startswith('!') else None
+        for path in glob.glob(os.path.join(source_path, pattern.lstrip('!'))):
+            if not os.path.isdir(path):
+                continue
+            rel = os.path.relpath(path, source_path).replace(os.sep, '/')
+            if rel == '.' or rel.startswith('..') or 'node_modules' in rel.split('/'):
+                continue
+            if target is not None:
+                target.add(rel)
+            else:
+                included.append(rel)
+    return [path for path in included if path not in excluded]
+
+
+def npm_workspaces(source_path):
+    """读取package.json的workspaces"""
+    try:
+        with open(os.path.join(source_path, 'package.json'), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return []
+    patterns = (data.get('workspaces') or []) if isinstance(data, dict) else []
+    if isinstance(patterns, dict):
+        patterns = patterns.get('packages') or []
+    return expand_globs(source_path, patterns)
+
+
+def detect_modules(source_path, path_globs=(), maven=True):
+    """检测单仓多模块项目的模块：Maven模块、npm workspaces、配置的目录通配符
+
+    返回 [{'path': 相对路径, 'kind': 'maven'|'npm'|'glob'}]。互相嵌套的模块只保留外层，
+    避免同一文件属于多个分片。
+    """
+    found = {}
+    sources = [
+        ('maven', maven_modules(source_path) if maven else []),
+        ('npm', npm_workspaces(source_path)),
+        ('glob', expand_globs(source_path, path_globs)),
+    ]
+    for kind, paths in sources:
+        for path in paths:
+            found.setdefault(path, kind)
+
+    modules = []
+    for path in sorted(found, key=lambda p: (p.count('/'), p)):
+        if any(path.startswith(outer['path'] + '/') for outer in modules):
+            continue
+        modules.append({'path': path, 'kind': found[path]})
+    return sorted(modules, key=lambda m: m['path'])
+
+
+def find_shard(path, shards):
+    """文件（相对源码根目录）所属的分片名称"""
+    owner = None
+    for shard in shards:
+        if shard['path'] and (path == shard['path'] or path.startswith(shard['path'] + '/')):
+            if owner is None or len(shard['path']) > len(owner['path']):
+                owner = shard
+    return owner['name'] if owner else ROOT_SHARD
+
+
+def changed_shards(paths, shards):
+    """变更文件涉及的分片名称集合；根目录共享构建文件有变化时返回None（全部重新扫描）"""
+    touched = set()
+    for path in paths:
+        if path in SHARED_BUILD_FILES:
+            return None
+        touched.add(find_shard(path, shards))
+    return touched
+
+
+def rewrite_shard_report(sarif_file, shard, shards, source_path):
+    """把分片SARIF中的文件路径统一为相对源码根目录，并去掉不属于该分片的结果
+
+    CodeQL以模块目录为源码根，输出的路径相对模块目录；Semgrep输出绝对路径，保持不变。
+    Maven模块编译时可能带出其他模块的源码，归属其他分片的结果丢弃，避免重复。
+    返回保留的结果数。
+    """
+    with open(sarif_file, 'r', encoding='utf-8') as f:
+        sarif = json.load(f)
+
+    root = source_path.rstrip('/') + '/'
+    kept = 0
+    for run in sarif.get('runs', []):
+        run.setdefault('properties', {})['shard'] = shard['name']
+        results = []
+        for result in run.get('results', []):
+            owner = None
+            for location in result.get('locations', []):
+                artifact = location.get('physicalLocation', {}).get('artifactLocation', {})
+                uri = artifact.get('uri', '')
+                if not uri:
+                    continue
+                if uri.startswith('file://'):
+                    uri = uri[len('file://'):]
+                if uri.startswith('/'):
+                    rel = uri[len(root):] if uri.startswith(root) else uri.lstrip('/')
+                else:
+                    rel = posixpath.normpath(posixpath.join(shard['path'], uri)) if shard['path'] else uri
+                    artifact['uri'] = rel
+                    artifact.pop('uriBaseId', None)
+                if owner is None:
+                    owner = find_shard(rel, shards)
+            if owner in (None, shard['name']):
+                results.append(result)
+        run['results'] = results
+        kept += len(results)
+
+    with open(sarif_file, 'w', encoding='utf-8') as f:
+        json.dump(sarif, f, ensure_ascii=False)
+    return kept
+
+
+def merge_sarif(sarif_files, output_file):
+    """合并多个SARIF文件的runs到一个文件"""
+    merged = {'version': '2.1.0', 'runs': []}
+    for sarif_file in sarif_files:
+        with open(sarif_file, 'r', encoding='utf-8') as f:
+            sarif = json.load(f)
+        merged.setdefault('$schema', sarif.get('$schema'))
+        merged['runs'].extend(sarif.get('runs', []))
+    if merged.get('$schema') is None:
+        merged.pop('$schema', None)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(merged, f, ensure_ascii=False)
+    return output_file
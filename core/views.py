@@ -8,12 +8,15 @@ from django.db.models import Count, Q
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import subprocess
 import re
 from .models import Department, Project, ScanTask, Finding, SeverityManager
 from .cwe_utils import CWEExplainer
+from statistics.engine import statistics_engine, annotate_project_severity, project_severity_stats
+from statistics.trends import TrendEngine
+from statistics.cache import statistics_cache, department_scope, GLOBAL_SCOPE
 from .authorization.decorators import smart_login_required, require_permission
 from .authorization.roles_permissions import Permissions
 from django.utils import timezone
@@ -88,9 +91,16 @@ def dashboard(request):
 
 @login_required
 def dashboard_stats(request):
-    """获取统计数据API"""
+    """获取统计数据API（漏洞有变化前使用缓存的结果）"""
     department_filter = request.GET.get('department')
-    
+    scope = department_scope(department_filter) if department_filter else GLOBAL_SCOPE
+    data = statistics_cache.get_or_compute(
+        'dashboard_stats', lambda: _dashboard_data(department_filter), scopes=[scope], args=(department_filter,)
+    )
+    return JsonResponse(data)
+
+def _dashboard_data(department_filter):
+    """计算统计看板数据"""
     # 基础查询
     findings_query = Finding.objects.select_related('project', 'project__department')
     projects_query = Project.objects.select_related('department')
@@ -99,41 +109,28 @@ def dashboard_stats(request):
         findings_query = findings_query.filter(project__department__name=department_filter)
         projects_query = projects_query.filter(department__name=department_filter)
     
-    # 总体统计
-    total_findings = findings_query.count()
-    active_findings = findings_query.filter(active=True).count()
-    
-    # 严重程度统计 - 三级分级
-    severity_stats = {}
-    for severity, _ in SeverityManager.SEVERITY_CHOICES:
-        count = findings_query.filter(severity=severity, active=True).count()
-        severity_stats[severity] = count
+    # 总体统计、严重程度统计、状态统计（一次聚合查询，默认读取每日汇总表）
+    engine = statistics_engine(**({'project__department__name': department_filter} if department_filter else {}))
+    stats = engine.compute()
+    total_findings = stats['status_stats']['total']
+    active_findings = stats['status_stats']['active']
+    severity_stats = {
+        severity: stats['active_severity_stats'][severity]
+        for severity, _ in SeverityManager.SEVERITY_CHOICES
+    }
     
-    # 项目统计
+    # 项目统计（一条注解查询：各严重程度活跃漏洞数和最高严重程度）
     projects_data = []
-    for project in projects_query:
-        project_findings = findings_query.filter(project=project)
-        active_count = project_findings.filter(active=True).count()
-        
-        # 计算最高严重程度
-        max_severity = '低危'
-        for severity, _ in reversed(SeverityManager.SEVERITY_CHOICES):
-            if project_findings.filter(severity=severity, active=True).exists():
-                max_severity = severity
-                break
-        
-        # 各严重程度统计
-        project_severity_stats = {}
-        for severity, _ in SeverityManager.SEVERITY_CHOICES:
-            count = project_findings.filter(severity=severity, active=True).count()
-            project_severity_stats[severity] = count
+    for project in annotate_project_severity(projects_query, active_only=True):
+        severity_counts = project_severity_stats(project)
+        severity_counts.pop('total')
         
         projects_data.append({
             'name': project.name,
             'department': project.department.name,
-            'total_issues': active_count,
-            'max_severity': max_severity,
-            'stats': project_severity_stats,
+            'total_issues': project.finding_count,
+            'max_severity': SeverityManager.get_severity_from_numerical(project.max_numerical_severity),
+            'stats': severity_counts,
             'business_criticality': project.business_criticality
         })
     
@@ -141,39 +138,29 @@ def dashboard_stats(request):
     projects_data.sort(key=lambda x: x['total_issues'], reverse=True)
     
     # 趋势数据（最近30天）
-    trend_data = []
-    for i in range(30):
-        date = timezone.now().date() - timedelta(days=i)
-        count = findings_query.filter(date=date).count()
-        trend_data.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'count': count
-        })
-    trend_data.reverse()
+    trend_data = [
+        {'date': item['date'], 'count': item['new_findings']['total']}
+        for item in TrendEngine(findings_query).series(days=29)
+    ]
     
     # 高危漏洞分类统计（按CWE）- 只显示高危漏洞
     cwe_stats = {}
-    high_risk_findings = findings_query.filter(active=True, severity='高危', cwe__isnull=False)
-    cwe_findings = high_risk_findings.values('cwe').annotate(count=Count('cwe'))
-    for item in cwe_findings:
-        cwe_num = item['cwe']
+    cwe_counts = engine.count_by('cwe', Q(active=True, severity='高危', cwe__isnull=False))
+    for cwe_num, count in cwe_counts.items():
         cwe_info = CWEExplainer.get_cwe_info(cwe_num)
         cwe_stats[f"CWE-{cwe_num}"] = {
-            'count': item['count'],
+            'count': count,
             'name': cwe_info['name'] if cwe_info else f'CWE-{cwe_num}',
             'category': cwe_info['category'] if cwe_info else '其他'
         }
     
     # 状态统计
     status_stats = {
-        'active': findings_query.filter(active=True).count(),
-        'verified': findings_query.filter(verified=True).count(),
-        'false_positive': findings_query.filter(false_p=True).count(),
-        'mitigated': findings_query.filter(is_mitigated=True).count(),
-        'risk_accepted': findings_query.filter(risk_accepted=True).count(),
+        name: stats['status_stats'][name]
+        for name in ('active', 'verified', 'false_positive', 'mitigated', 'risk_accepted')
     }
     
-    return JsonResponse({
+    return {
         'department': department_filter or 'all',
         'metrics': {
             'total_findings': total_findings,
@@ -188,7 +175,7 @@ def dashboard_stats(request):
             'projects': projects_data
         },
         'projects': projects_data
-    })
+    }
 
 @csrf_exempt
 @require_http_methods(["POST"])
@@ -594,8 +581,6 @@ def rate_ai_analysis(request, pk):
 @smart_login_required
 def ai_quality_statistics(request):
     """AI分析质量统计页面"""
-    from django.db.models import Count, Q
-    
     # 获取统计数据
     total_analyzed = Finding.objects.filter(
         ai_analysis__isnull=False,
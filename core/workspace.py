@@ -0,0 +1,306 @@
+import os
+import time
+import shutil
+import logging
+import threading
+from datetime import datetime
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class WorkspaceManager:
+    """工作空间管理器 - 统计各类目录的占用和最近使用时间，超出配额时按LRU淘汰
+
+    管理的条目：
+    - projects:  项目源码克隆 PROJECT_DIR/<部门>/<项目>
+    - scan_temp: 扫描临时目录 WORK_DIR/<条目>（scan_<id>、残留的codeql-db-*）
+    - cache:     构建缓存 CACHE_DIR/<类型>（maven、npm、composer、codeql编译缓存）
+    - reports:   扫描报告 OUTPUT_DIR/<部门>/<项目>/<文件>
+
+    扫描使用条目时调用 touch() 更新最近使用时间；后台线程定期统计占用并淘汰。
+    运行中扫描的源码、临时目录和报告，以及每个项目最近一次扫描的报告不会被淘汰；
+    有扫描运行时构建缓存和CodeQL数据库也不会被淘汰。
+    """
+
+    CATEGORIES = ('projects', 'scan_temp', 'cache', 'reports')
+
+    # 类别 -> (根目录配置项, 条目所在深度)
+    CATEGORY_LAYOUT = {
+        'projects': ('PROJECT_DIR', 2),
+        'scan_temp': ('WORK_DIR', 1),
+        'cache': ('CACHE_DIR', 1),
+        'reports': ('OUTPUT_DIR', 3),
+    }
+
+    def __init__(self):
+        # 删除条目与扫描开始互斥，避免删除刚开始使用的目录
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+
+    @property
+    def config(self):
+        return settings.AUTO_SCAN_CONFIG
+
+    def get_root(self, category):
+        return self.config[self.CATEGORY_LAYOUT[category][0]]
+
+    def list_items(self, category):
+        """列出某个类别下的所有条目路径"""
+        root = self.get_root(category)
+        depth = self.CATEGORY_LAYOUT[category][1]
+        paths = [root]
+        for _ in range(depth):
+            children = []
+            for path in paths:
+                if not os.path.isdir(path) or os.path.islink(path):
+                    continue
+                try:
+                    children.extend(os.path.join(path, name) for name in os.listdir(path))
+                except OSError:
+                    continue
+            paths = children
+        if category == 'reports':
+            return [path for path in paths if os.path.isfile(path)]
+        return paths
+
+    @staticmethod
+    def get_size(path):
+        """统计路径占用的字节数（不跟随符号链接）"""
+        if not os.path.isdir(path) or os.path.islink(path):
+            try:
+                return os.lstat(path).st_size
+            except OSError:
+                return 0
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                except OSError:
+                    pass
+        return total
+
+    def touch(self, path, category):
+        """记录条目被使用"""
+        from .models import WorkspaceItem
+        try:
+            WorkspaceItem.objects.update_or_create(
+                path=os.path.abspath(path),
+                defaults={'category': category, 'last_used_at': timezone.now()},
+            )
+        except Exception as e:
+            logger.warning(f"记录工作空间使用失败 {path}: {e}")
+
+    def refresh_usage(self):
+        """重新统计所有条目的占用，同步到WorkspaceItem"""
+        from .models import WorkspaceItem
+        now = timezone.now()
+        for category in self.CATEGORIES:
+            paths = {os.path.abspath(path) for path in self.list_items(category)}
+            existing = {item.path: item for item in WorkspaceItem.objects.filter(category=category)}
+
+            new_items, changed = [], []
+            for path in paths:
+                size = self.get_size(path)
+                item = existing.get(path)
+                if item is None:
+                    # 没有使用记录的条目以修改时间作为最近使用时间
+                    try:
+                        mtime = datetime.fromtimestamp(os.lstat(path).st_mtime, tz=timezone.get_current_timezone())
+                    except OSError:
+                        continue
+                    new_items.append(WorkspaceItem(
+                        category=category, path=path, size_bytes=size, last_used_at=mtime, measured_at=now
+                    ))
+                else:
+                    item.size_bytes = size
+                    item.measured_at = now
+                    changed.append(item)
+
+            WorkspaceItem.objects.bulk_create(new_items, ignore_conflicts=True)
+            WorkspaceItem.objects.bulk_update(changed, ['size_bytes', 'measured_at'])
+            # 已不存在的条目
+            WorkspaceItem.objects.filter(category=category).exclude(path__in=paths).delete()
+
+    def get_protected(self):
+        """返回 (受保护的路径集合, 是否有扫描正在运行)"""
+        from .models import ScanTask
+        from .scan_queue import scan_queue
+        from django.db.models import OuterRef, Subquery
+
+        # 入库中的任务仍在读取源码和报告
+        active = ScanTask.objects.filter(status__in=('running', 'scanned'))
+        if scan_queue.current_task:
+            active = active | ScanTask.objects.filter(pk=scan_queue.current_task)
+        active = list(active.select_related('project__department'))
+
+        protected = set()
+        for task in active:
+            project = task.project
+            protected.add(os.path.join(self.config['PROJECT_DIR'], project.department.name, project.name))
+            protected.add(os.path.join(self.config['OUTPUT_DIR'], project.department.name, project.name))
+            protected.add(os.path.join(self.config['WORK_DIR'], f'scan_{project.id}'))
+
+        # 每个项目最近一次完成的扫描报告保留（重新解析、下载报告使用）
+        latest = ScanTask.objects.filter(
+            project=OuterRef('project'), status='completed'
+        ).exclude(report_file='').order_by('-completed_at').values('pk')[:1]
+        for report_file, scan_config in ScanTask.objects.filter(pk=Subquery(latest)).values_list('report_file', 'scan_config'):
+            protected.add(report_file)
+            protected.update((scan_config or {}).get('report_files', []))
+
+        return {os.path.abspath(path) for path in protected if path}, bool(active)
+
+    def is_protected(self, item, protected, scanning):
+        if scanning and item.category == 'cache':
+            return True
+        if scanning and item.category == 'scan_temp' and os.path.basename(item.path).startswith('codeql-db-'):
+            return True
+        return any(item.path == path or item.path.startswith(path + os.sep) for path in protected)
+
+    def remove(self, item):
+        """删除条目，删除前在锁内重新检查是否被运行中的扫描使用"""
+        with self.lock:
+            protected, scanning = self.get_protected()
+            if self.is_protected(item, protected, scanning):
+                return False
+            try:
+                if os.path.isdir(item.path) and not os.path.islink(item.path):
+                    shutil.rmtree(item.path)
+                elif os.path.lexists(item.path):
+                    os.remove(item.path)
+            except Exception as e:
+                logger.warning(f"删除工作空间条目失败 {item.path}: {e}")
+                return False
+            item.delete()
+        logger.info(f"[WORKSPACE] 淘汰{item.get_category_display()} {item.path}，"
+                    f"释放 {item.size_bytes / 1024 / 1024:.1f} MB，最近使用 {timezone.localtime(item.last_used_at):%Y-%m-%d %H:%M}")
+        return True
+
+    def evict(self):
+        """统计占用并淘汰超出配额的条目，返回被淘汰的条目列表"""
+        from .models import WorkspaceItem
+        self.refresh_usage()
+        protected, scanning = self.get_protected()
+        evicted = []
+
+        def _evict_until(items, done):
+            for item in items:
+                if done():
+                    break
+                if item.size_bytes <= 0 or self.is_protected(item, protected, scanning):
+                    continue
+                if self.remove(item):
+                    evicted.append({'category': item.category, 'path': item.path, 'size_bytes': item.size_bytes})
+                    yield item
+
+        for category in self.CATEGORIES:
+            quota = self.config['WORKSPACE_QUOTAS'].get(category, 0) * 1024 * 1024
+            if quota <= 0:
+                continue
+            items = WorkspaceItem.objects.filter(category=category).order_by('last_used_at')
+            total = sum(item.size_bytes for item in items)
+            if total <= quota:
+                continue
+            for item in _evict_until(list(items), lambda: total <= quota):
+                total -= item.size_bytes
+
+        # 磁盘剩余空间不足时跨类别淘汰
+        min_free = self.config['WORKSPACE_MIN_FREE_MB'] * 1024 * 1024
+        if min_free > 0 and self.get_disk_usage()['free'] < min_free:
+            items = list(WorkspaceItem.objects.order_by('last_used_at'))
+            for _ in _evict_until(items, lambda: self.get_disk_usage()['free'] >= min_free):
+                pass
+
+        return evicted
+
+    def get_disk_usage(self):
+        root = self.get_root('scan_temp')
+        os.makedirs(root, exist_ok=True)
+        usage = shutil.disk_usage(root)
+        return {'total': usage.total, 'used': usage.used, 'free': usage.free}
+
+    def get_usage(self, refresh=False):
+        """工作空间占用概况"""
+        from .models import WorkspaceItem
+        from django.db.models import Sum, Count, Min
+        if refresh or not WorkspaceItem.objects.exists():
+            self.refresh_usage()
+
+        rows = {
+            row['category']: row
+            for row in WorkspaceItem.objects.values('category').annotate(
+                size_bytes=Sum('size_bytes'), items=Count('id'), oldest_used_at=Min('last_used_at')
+            )
+        }
+        categories = {}
+        for category in self.CATEGORIES:
+            row = rows.get(category, {})
+            quota = self.config['WORKSPACE_QUOTAS'].get(category, 0) * 1024 * 1024
+            size = row.get('size_bytes') or 0
+            categories[category] = {
+                'root': self.get_root(category),
+                'size_bytes': size,
+                'items': row.get('items', 0),
+                'quota_bytes': quota,
+                'usage_percent': round(size / quota * 100, 1) if quota else None,
+                'oldest_used_at': row.get('oldest_used_at'),
+            }
+
+        largest = WorkspaceItem.objects.order_by('-size_bytes')[:20]
+        return {
+            'categories': categories,
+            'disk': self.get_disk_usage(),
+            'min_free_bytes': self.config['WORKSPACE_MIN_FREE_MB'] * 1024 * 1024,
+            'largest_items': [
+                {
+                    'category': item.category,
+                    'path': item.path,
+                    'size_bytes': item.size_bytes,
+                    'last_used_at': item.last_used_at,
+                }
+                for item in largest
+            ],
+        }
+
+    def wait_idle(self):
+        """等待进行中的删除完成（扫描开始前调用）"""
+        with self.lock:
+            pass
+
+    def request_check(self):
+        """唤醒后台线程立即检查"""
+        self.start()
+        self.wakeup.set()
+
+    def start(self):
+        """启动后台检查线程"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        logger.info("工作空间管理线程已启动")
+
+    def _run(self):
+        while True:
+            self.wakeup.wait(self.config['WORKSPACE_CHECK_INTERVAL'])
+            self.wakeup.clear()
+            try:
+                start = time.monotonic()
+                evicted = self.evict()
+                if evicted:
+                    freed = sum(item['size_bytes'] for item in evicted)
+                    logger.info(f"[WORKSPACE] 淘汰 {len(evicted)} 个条目，释放 {freed / 1024 / 1024:.1f} MB，"
+                                f"耗时 {time.monotonic() - start:.1f}s")
+            except Exception as e:
+                logger.error(f"工作空间检查失败: {e}")
+            finally:
+                connection.close()
+
+
+# 全局工作空间管理器
+workspace_manager = WorkspaceManager()
@@ -9,6 +9,7 @@ from django.utils import timezone
 from core.models import Finding, SeverityManager, Project, ScanTask
 from translation.services import translation_service
 from core.git_utils import get_line_author, get_file_author
+from core.scan_timing import timed_stage
 
 logger = logging.getLogger(__name__)
 
@@ -26,9 +27,11 @@ except ImportError:
 class EnhancedSARIFParser:
     """增强的SARIF解析器 - 集成DefectDojo逻辑和您的功能"""
     
-    def __init__(self):
+    def __init__(self, timer=None):
         self.translation_service = translation_service
         self.severity_manager = SeverityManager()
+        # 扫描阶段计时器（可选），翻译/源码读取/blame 分别累计耗时
+        self.timer = timer
     
     def parse_file(self, file_path: str, project: Project, scan_task: ScanTask) -> List[Finding]:
         """解析SARIF文件"""
@@ -98,15 +101,18 @@ class EnhancedSARIFParser:
             message = self._get_message(result, rule)
             
             # 翻译消息 - 继承您的翻译功能
-            translated_message = self._translate_message(message)
+            with timed_stage(self.timer, 'translation'):
+                translated_message = self._translate_message(message)
             
             # 获取源码上下文 - 继承您的源码展示功能
-            source_context = self._get_source_context(
-                project, location['file_path'], location['line_number']
-            )
+            with timed_stage(self.timer, 'source_context'):
+                source_context = self._get_source_context(
+                    project, location['file_path'], location['line_number']
+                )
             
             # 获取git作者信息 - 确保自动扫描也能获取代码负责人
-            git_author = self._get_git_author(project, location['file_path'], location['line_number'])
+            with timed_stage(self.timer, 'blame'):
+                git_author = self._get_git_author(project, location['file_path'], location['line_number'])
             logger.debug(f"Git author for {location['file_path']}:{location['line_number']}: {git_author}")
             
             # 创建Finding对象
@@ -458,7 +464,7 @@ class EnhancedSARIFParser:
         pass
 
 
-def parse_sarif_file(file_path: str, project: Project, scan_task: ScanTask) -> List[Finding]:
+def parse_sarif_file(file_path: str, project: Project, scan_task: ScanTask, timer=None) -> List[Finding]:
     """便捷的SARIF解析函数"""
-    parser = EnhancedSARIFParser()
+    parser = EnhancedSARIFParser(timer)
     return parser.parse_file(file_path, project, scan_task)
@@ -211,13 +211,106 @@ TRANSLATION_CONFIG = {
     'CACHE_ENABLED': True,
 }
 
+# 统计配置
+STATISTICS_CONFIG = {
+    # 统计接口读取漏洞每日汇总表（python manage.py rebuild_rollups 重建）
+    'USE_ROLLUPS': os.getenv('STATISTICS_USE_ROLLUPS', 'True').lower() == 'true',
+    # 统计结果缓存（漏洞变化时按全局/部门/项目版本号失效）
+    'CACHE_ENABLED': os.getenv('STATISTICS_CACHE_ENABLED', 'True').lower() == 'true',
+    'CACHE_TIMEOUT': int(os.getenv('STATISTICS_CACHE_TIMEOUT', '3600')),  # 缓存有效期，兜底扫描状态等不触发失效的变化
+    'CACHE_STALE_TIMEOUT': int(os.getenv('STATISTICS_CACHE_STALE_TIMEOUT', '86400')),  # 重算期间返回的旧结果保留时间
+    'CACHE_LOCK_TIMEOUT': 120,  # 重算锁超时（秒）
+    'CACHE_WAIT': 10,  # 没有旧结果时等待其他请求重算的最长时间（秒）
+    # 目录热点汇总的最大目录层级（更深目录中的漏洞只计入到该层级为止的各级目录）
+    'HOTSPOT_MAX_DEPTH': int(os.getenv('STATISTICS_HOTSPOT_MAX_DEPTH', '8')),
+    # 漏洞变化后延迟该秒数在后台合并重建目录热点（0 表示在汇总重算后同步重建）
+    'HOTSPOT_REBUILD_DELAY': float(os.getenv('STATISTICS_HOTSPOT_REBUILD_DELAY', '5')),
+    # 报告导出（PDF/XLSX/CSV在后台工作进程中生成，数据没有变化时复用已生成的文件）
+    'REPORT_DIR': os.getenv('STATISTICS_REPORT_DIR', str(BASE_DIR / 'workspace' / 'exports')),
+    'REPORT_WORKERS': int(os.getenv('STATISTICS_REPORT_WORKERS', '2')),  # 同时运行的报告生成进程数
+    'REPORT_TIMEOUT': int(os.getenv('STATISTICS_REPORT_TIMEOUT', '600')),  # 单个报告的生成超时（秒）
+    'REPORT_RETENTION_DAYS': int(os.getenv('STATISTICS_REPORT_RETENTION_DAYS', '7')),  # 报告文件保留天数
+    'REPORT_MAX_FINDINGS': int(os.getenv('STATISTICS_REPORT_MAX_FINDINGS', '100000')),  # 导出的漏洞明细最大行数
+}
+
 # 自动扫描配置
 AUTO_SCAN_CONFIG = {
     'ENABLED': os.getenv('AUTO_SCAN_ENABLED', 'True').lower() == 'true',
     'WORK_DIR': os.getenv('SCAN_WORK_DIR', str(BASE_DIR / 'workspace' / 'scan_temp')),
     'OUTPUT_DIR': os.getenv('SCAN_OUTPUT_DIR', str(BASE_DIR / 'workspace' / 'reports')),
     'PROJECT_DIR': os.getenv('SCAN_PROJECT_DIR', str(BASE_DIR / 'workspace' / 'projects')),
+    # 构建依赖缓存（Maven本地仓库/npm缓存/Composer缓存），所有扫描共享
+    'CACHE_DIR': os.getenv('SCAN_CACHE_DIR', str(BASE_DIR / 'workspace' / 'cache')),
     'TIMEOUT': int(os.getenv('SCAN_TIMEOUT', '3600')),
+    # 扫描调度：sjf（预测耗时短的优先，带老化和部门公平）或 fifo
+    'SCHEDULER_POLICY': os.getenv('SCAN_SCHEDULER_POLICY', 'sjf'),
+    # 每等待1秒，调度分数减少的秒数（老化，避免大任务一直排不上）
+    'SCHEDULER_AGING_RATE': float(os.getenv('SCAN_SCHEDULER_AGING_RATE', '1.0')),
+    # 部门在公平窗口内每占用1秒扫描时间，其任务调度分数增加的秒数
+    'SCHEDULER_FAIRNESS_WEIGHT': float(os.getenv('SCAN_SCHEDULER_FAIRNESS_WEIGHT', '0.5')),
+    'SCHEDULER_FAIRNESS_WINDOW': int(os.getenv('SCAN_SCHEDULER_FAIRNESS_WINDOW', '3600')),
+    # 没有历史数据时预测的扫描耗时（秒）
+    'SCHEDULER_DEFAULT_COST': int(os.getenv('SCAN_SCHEDULER_DEFAULT_COST', '600')),
+    # 入库线程数：扫描完成后解析报告、翻译、读取源码、blame和写库在独立线程池执行，不占用扫描槽
+    'INGESTION_WORKERS': int(os.getenv('SCAN_INGESTION_WORKERS', '2')),
+    # 远程变更检测：定期用 git ls-remote 检查启用自动扫描的项目（间隔秒数，0表示不检测）
+    'CHANGE_DETECT_INTERVAL': int(os.getenv('SCAN_CHANGE_DETECT_INTERVAL', '300')),
+    'CHANGE_DETECT_WORKERS': int(os.getenv('SCAN_CHANGE_DETECT_WORKERS', '8')),
+    'CHANGE_DETECT_TIMEOUT': int(os.getenv('SCAN_CHANGE_DETECT_TIMEOUT', '30')),
+    # 工作空间磁盘配额（MB，0表示不限制），超出时按最近使用时间淘汰，不影响运行中的扫描
+    'WORKSPACE_QUOTAS': {
+        'projects': int(os.getenv('WORKSPACE_QUOTA_PROJECTS_MB', '51200')),
+        'scan_temp': int(os.getenv('WORKSPACE_QUOTA_SCAN_TEMP_MB', '20480')),
+        'cache': int(os.getenv('WORKSPACE_QUOTA_CACHE_MB', '20480')),
+        'reports': int(os.getenv('WORKSPACE_QUOTA_REPORTS_MB', '10240')),
+    },
+    # 磁盘剩余空间低于该值（MB）时，不论配额按最近使用时间淘汰
+    'WORKSPACE_MIN_FREE_MB': int(os.getenv('WORKSPACE_MIN_FREE_MB', '10240')),
+    # 后台检查间隔（秒）
+    'WORKSPACE_CHECK_INTERVAL': int(os.getenv('WORKSPACE_CHECK_INTERVAL', '600')),
+    # 扫描规则本地缓存：Semgrep规则包按版本保存在本地，CodeQL查询编译缓存所有扫描共享，
+    # 扫描时不访问网络，由 refresh_rule_cache 命令刷新
+    'SEMGREP_RULES_DIR': os.getenv('SEMGREP_RULES_DIR', str(BASE_DIR / 'tools' / 'semgrep-rules')),
+    'SEMGREP_RULE_PACKS': {'php': os.getenv('SEMGREP_PHP_RULE_PACK', 'p/php')},
+    'SEMGREP_REGISTRY_URL': os.getenv('SEMGREP_REGISTRY_URL', 'https://semgrep.dev/c'),
+    'SEMGREP_RULE_VERSIONS_KEEP': int(os.getenv('SEMGREP_RULE_VERSIONS_KEEP', '3')),
+    'CODEQL_COMPILATION_CACHE': os.getenv('CODEQL_COMPILATION_CACHE', str(BASE_DIR / 'workspace' / 'cache' / 'codeql')),
+    # 扫描槽资源预算：同一扫描并行运行多个引擎时按引擎数均分线程和内存
+    'SLOT_THREADS': int(os.getenv('SCAN_SLOT_THREADS', '8')),
+    'SLOT_RAM_MB': int(os.getenv('SCAN_SLOT_RAM_MB', '7000')),
+    'MAX_PARALLEL_ENGINES': int(os.getenv('SCAN_MAX_PARALLEL_ENGINES', '3')),
+    # 同时扫描多个CodeQL语言时使用 database create --db-cluster 一次提取
+    'CODEQL_DB_CLUSTER': os.getenv('SCAN_CODEQL_DB_CLUSTER', 'True').lower() == 'true',
+    # Semgrep增量扫描：只扫描自上次扫描以来变更的文件，未变更文件的漏洞沿用上次结果
+    'INCREMENTAL_SCAN_ENABLED': os.getenv('SCAN_INCREMENTAL_ENABLED', 'True').lower() == 'true',
+    # 距上次全量扫描超过该天数时执行全量扫描
+    'SEMGREP_FULL_SCAN_INTERVAL_DAYS': int(os.getenv('SEMGREP_FULL_SCAN_INTERVAL_DAYS', '7')),
+    # 变更文件超过该数量时执行全量扫描
+    'INCREMENTAL_MAX_CHANGED_FILES': int(os.getenv('SCAN_INCREMENTAL_MAX_CHANGED_FILES', '1000')),
+    # 单仓多模块分片扫描：按Maven模块、npm workspaces和配置的目录通配符（逗号分隔）拆分，
+    # 各分片并行扫描后合并到同一个扫描任务，未变更的分片沿用上次结果（默认关闭，需显式开启）
+    'SHARDING_ENABLED': os.getenv('SCAN_SHARDING_ENABLED', 'False').lower() == 'true',
+    'SHARD_PATH_GLOBS': [p for p in os.getenv('SCAN_SHARD_PATH_GLOBS', '').split(',') if p.strip()],
+    'SHARD_MIN_MODULES': int(os.getenv('SCAN_SHARD_MIN_MODULES', '2')),
+    'SHARD_PARALLELISM': int(os.getenv('SCAN_SHARD_PARALLELISM', '4')),
+    # 距上次全部分片扫描超过该天数时重新扫描所有分片
+    'SHARD_FULL_SCAN_INTERVAL_DAYS': int(os.getenv('SCAN_SHARD_FULL_SCAN_INTERVAL_DAYS', '7')),
+    # 语言检测：最多遍历的文件数，以及判定为项目语言所需的最少源文件数
+    'LANGUAGE_DETECT_MAX_FILES': int(os.getenv('SCAN_LANGUAGE_DETECT_MAX_FILES', '50000')),
+    'LANGUAGE_MIN_FILES': int(os.getenv('SCAN_LANGUAGE_MIN_FILES', '3')),
+    # 模拟扫描引擎（fake:// 地址，压测使用），生产环境保持关闭
+    'FAKE_ENGINES_ENABLED': os.getenv('SCAN_FAKE_ENGINES_ENABLED', 'False').lower() == 'true',
+    # 取消扫描时SIGTERM之后等待进程组退出的宽限期（秒），超时发送SIGKILL
+    'CANCEL_GRACE_PERIOD': int(os.getenv('SCAN_CANCEL_GRACE_PERIOD', '10')),
+    # 扫描日志：完整日志追加写入文件，按时间/行数批量刷新，任务记录只保留尾部
+    'LOG_DIR': os.getenv('SCAN_LOG_DIR', str(BASE_DIR / 'logs' / 'scans')),
+    'LOG_FLUSH_INTERVAL': float(os.getenv('SCAN_LOG_FLUSH_INTERVAL', '1')),
+    'LOG_FLUSH_LINES': int(os.getenv('SCAN_LOG_FLUSH_LINES', '200')),
+    'LOG_TAIL_LINES': int(os.getenv('SCAN_LOG_TAIL_LINES', '200')),
+    # 日志推送（SSE）：轮询文件增量的间隔、单连接最长时长、单次读取上限
+    'LOG_STREAM_POLL_INTERVAL': float(os.getenv('SCAN_LOG_STREAM_POLL_INTERVAL', '1')),
+    'LOG_STREAM_MAX_DURATION': int(os.getenv('SCAN_LOG_STREAM_MAX_DURATION', '300')),
+    'LOG_STREAM_CHUNK_BYTES': int(os.getenv('SCAN_LOG_STREAM_CHUNK_BYTES', '262144')),
     'TOOLS': {
         'CODEQL_RULES': os.getenv('CODEQL_RULES', str(BASE_DIR / 'tools' / 'codeql-rules')),
         'CODEQL_BIN': os.getenv('CODEQL_BIN', str(BASE_DIR / 'tools' / 'codeql' / 'codeql')),
@@ -0,0 +1,60 @@
+from django.db.models import Aggregate, F, FloatField, Func, IntegerField
+
+
+class PercentileCont(Aggregate):
+    """连续百分位数聚合 - PostgreSQL percentile_cont 有序集聚合
+
+    用法: PercentileCont('duration', 0.9)
+    """
+    function = 'PERCENTILE_CONT'
+    name = 'PercentileCont'
+    template = '%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, expression, percentile, **extra):
+        percentile = float(percentile)
+        if not 0 <= percentile <= 1:
+            raise ValueError('percentile 必须在 0 到 1 之间')
+        super().__init__(expression, percentile=percentile, **extra)
+
+
+class RunningSum(Func):
+    """累计求和窗口 - SUM(表达式) OVER (ORDER BY 排序字段)
+
+    Django的Window不允许对聚合再求和（Window(Sum(Count(...))) 会报错），分组查询按分组
+    累计时用这个表达式，表达式可以是聚合。用法: RunningSum(Count('id'), 'bucket')
+    """
+    contains_over_clause = True
+
+    def __init__(self, expression, order_by, **extra):
+        if isinstance(order_by, str):
+            order_by = F(order_by)
+        extra.setdefault('output_field', IntegerField())
+        super().__init__(expression, order_by, **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        expression, order_by = self.get_source_expressions()
+        expression_sql, expression_params = compiler.compile(expression)
+        order_sql, order_params = compiler.compile(order_by)
+        return f'SUM({expression_sql}) OVER (ORDER BY {order_sql})', (*expression_params, *order_params)
+
+
+class DaysBetween(Func):
+    """两个日期（时间取日期部分）相差的天数 - PostgreSQL 日期相减得到整数天数
+
+    用法: DaysBetween(TruncDate('mitigated'), 'date')
+    """
+    template = '(CAST(%(expressions)s AS date))'
+    arg_joiner = ' AS date) - CAST('
+    output_field = IntegerField()
+
+    def __init__(self, end, start, **extra):
+        super().__init__(end, start, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='CAST(julianday(date(%(expressions)s)) AS integer)',
+            arg_joiner=')) - julianday(date(',
+            **extra_context
+        )
@@ -0,0 +1,121 @@
+from datetime import timedelta
+from typing import Dict, List
+from django.db.models import Avg, Count, F, Max, Q, Value, Window, DateField
+from django.db.models.functions import Rank, TruncDate
+from django.utils import timezone
+
+from core.models import Finding
+from .aggregates import DaysBetween, PercentileCont
+
+# 支持的分组: 分组名称 -> 分组字段
+AGING_GROUP_FIELDS = {
+    'department': 'project__department__name',
+    'project': 'project_id',
+    'severity': 'severity',
+    'cwe': 'cwe',
+}
+
+# 漏洞年龄分布的区间上限（天），最后一个区间没有上限
+AGE_BUCKET_EDGES = (7, 30, 90, 180, 365)
+
+
+def age_buckets() -> List[tuple]:
+    """年龄区间: [(名称, 最小天数, 最大天数)]，最大天数为None表示没有上限"""
+    buckets, low = [], 0
+    for edge in AGE_BUCKET_EDGES:
+        buckets.append((f'{low}-{edge}', low, edge))
+        low = edge + 1
+    buckets.append((f'>{AGE_BUCKET_EDGES[-1]}', low, None))
+    return buckets
+
+
+class AgingEngine:
+    """修复时效引擎 - 平均修复时间（MTTR）、修复时间和未修复漏洞年龄的分位数、年龄分布
+
+    修复时间 = 缓解日期 - 发现日期，只统计最近 days 天内缓解的漏洞；年龄 = 今天 - 发现日期，
+    只统计未缓解的活跃漏洞。分位数用 percentile_cont 在数据库里算，年龄分布按发现日期的
+    区间条件计数，各分组按 MTTR、年龄中位数的排名由窗口函数给出；每次统计一条SQL。
+    """
+
+    def __init__(self, queryset=None):
+        self.queryset = Finding.objects.all() if queryset is None else queryset
+
+    def expressions(self, today, days: int) -> Dict:
+        """全部指标的聚合表达式"""
+        open_findings = Q(active=True, is_mitigated=False)
+        remediated = Q(is_mitigated=True, mitigated__isnull=False,
+                       mitigated__date__gte=today - timedelta(days=days))
+        age = DaysBetween(Value(today, output_field=DateField()), 'date')
+        # 缓解时间按当前时区取日期，与 mitigated__date 的过滤一致
+        remediation = DaysBetween(TruncDate('mitigated'), 'date')
+
+        exprs = {
+            'open_count': Count('id', filter=open_findings),
+            'median_age_days': PercentileCont(age, 0.5, filter=open_findings),
+            'p90_age_days': PercentileCont(age, 0.9, filter=open_findings),
+            'max_age_days': Max(age, filter=open_findings),
+            'remediated_count': Count('id', filter=remediated),
+            'mttr_days': Avg(remediation, filter=remediated),
+            'median_ttr_days': PercentileCont(remediation, 0.5, filter=remediated),
+            'p90_ttr_days': PercentileCont(remediation, 0.9, filter=remediated),
+        }
+        for index, (_, low, high) in enumerate(age_buckets()):
+            # 年龄在 [low, high] 天 <=> 发现日期在 [today - high, today - low]
+            condition = open_findings & Q(date__lte=today - timedelta(days=low))
+            if high is not None:
+                condition &= Q(date__gte=today - timedelta(days=high))
+            exprs[f'age_{index}'] = Count('id', filter=condition)
+        return exprs
+
+    @staticmethod
+    def _shape(row: Dict) -> Dict:
+        """把一行聚合结果整理成时效统计"""
+        def rounded(value):
+            return round(float(value), 1) if value is not None else None
+
+        return {
+            'open_count': row['open_count'],
+            'median_age_days': rounded(row['median_age_days']),
+            'p90_age_days': rounded(row['p90_age_days']),
+            'max_age_days': row['max_age_days'],
+            'age_histogram': {name: row[f'age_{index}'] for index, (name, _, _) in enumerate(age_buckets())},
+            'remediated_count': row['remediated_count'],
+            'mttr_days': rounded(row['mttr_days']),
+            'median_ttr_days': rounded(row['median_ttr_days']),
+            'p90_ttr_days': rounded(row['p90_ttr_days']),
+        }
+
+    def compute(self, days: int = 90, today=None) -> Dict:
+        """整个查询集的时效统计"""
+        today = today or timezone.localdate()
+        row = self.queryset.order_by().aggregate(**self.expressions(today, days))
+        return self._shape(row)
+
+    def compute_by(self, group_by: str, days: int = 90, today=None) -> List[Dict]:
+        """按分组计算时效统计，按未修复漏洞数降序
+
+        mttr_rank、age_rank 为分组按 MTTR、年龄中位数从长到短的排名（没有数据的排在最后）。
+        """
+        if group_by not in AGING_GROUP_FIELDS:
+            raise ValueError(f"不支持的分组方式: {group_by}")
+        field = AGING_GROUP_FIELDS[group_by]
+        today = today or timezone.localdate()
+
+        values = [field, 'project__name'] if group_by == 'project' else [field]
+        rows = self.queryset.order_by().values(*values).annotate(
+            **self.expressions(today, days)
+        ).annotate(
+            mttr_rank=Window(Rank(), order_by=F('mttr_days').desc(nulls_last=True)),
+            age_rank=Window(Rank(), order_by=F('median_age_days').desc(nulls_last=True)),
+        ).order_by('-open_count', field)
+
+        groups = []
+        for row in rows:
+            group = {group_by: row[field]}
+            if group_by == 'project':
+                group['project_name'] = row['project__name']
+            group.update(self._shape(row))
+            group['mttr_rank'] = row['mttr_rank']
+            group['age_rank'] = row['age_rank']
+            groups.append(group)
+        return groups
@@ -0,0 +1,20 @@
+from django.apps import AppConfig
+
+
+class StatisticsConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'statistics'
+    verbose_name = '统计分析'
+    
+    def ready(self):
+        """连接漏洞、项目变更信号，维护每日汇总表和统计缓存"""
+        from django.db.models.signals import post_init, post_save, post_delete
+        from core.models import Finding, Project
+        from .rollups import finding_loaded, finding_saved
+        from .cache import project_changed
+        post_init.connect(finding_loaded, sender=Finding, dispatch_uid='statistics_rollup_loaded')
+        post_save.connect(finding_saved, sender=Finding, dispatch_uid='statistics_rollup_saved')
+        # Finding 不连接 pre_delete/post_delete：有删除信号时级联删除要逐行加载漏洞，
+        # 删除漏洞的调用方用 rollup_service.delete 显式重算
+        post_save.connect(project_changed, sender=Project, dispatch_uid='statistics_cache_project_saved')
+        post_delete.connect(project_changed, sender=Project, dispatch_uid='statistics_cache_project_deleted')
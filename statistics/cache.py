@@ -0,0 +1,119 @@
+import time
+import hashlib
+import logging
+from typing import Callable, Iterable, List
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# 全局范围：任何漏洞变化都会使其失效
+GLOBAL_SCOPE = 'global'
+
+
+def department_scope(name) -> str:
+    return f'department:{name}'
+
+
+def project_scope(project_id) -> str:
+    return f'project:{project_id}'
+
+
+class StatisticsCache:
+    """统计缓存 - 按范围（全局、部门、项目）的版本号失效
+
+    每个范围有一个版本号，缓存键包含结果依赖的各范围版本号和当天日期（SLA、趋势按天变化）。
+    漏洞入库、状态变更、删除时 bump 受影响范围的版本号，旧的缓存键不再被读取，自然过期。
+
+    缓存未命中时用 cache.add 抢重算锁：抢到的请求重算并写入缓存，其他请求返回上一次的结果
+    （stale），没有上一次结果时等待重算完成，超时后自己重算。
+    """
+
+    @property
+    def config(self):
+        return settings.STATISTICS_CONFIG
+
+    def _version_key(self, scope: str) -> str:
+        return f"stats:version:{hashlib.md5(scope.encode('utf-8')).hexdigest()}"
+
+    def version(self, scope: str) -> int:
+        """范围的当前版本号"""
+        key = self._version_key(scope)
+        version = cache.get(key)
+        if version is None:
+            # 以时间戳为初始值：版本号被缓存淘汰后重新初始化，不会与旧的缓存键重复
+            cache.add(key, time.time_ns(), timeout=None)
+            version = cache.get(key)
+        return version
+
+    def bump(self, scopes: Iterable[str]):
+        """使范围的缓存失效"""
+        for scope in set(scopes):
+            key = self._version_key(scope)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, time.time_ns(), timeout=None)
+
+    def invalidate_projects(self, project_ids: Iterable):
+        """项目的漏洞有变化：使项目、所属部门和全局范围失效"""
+        from core.models import Project
+
+        project_ids = [pk for pk in set(project_ids) if pk is not None]
+        departments = Project.objects.filter(pk__in=project_ids).values_list('department__name', flat=True).distinct()
+        self.bump([GLOBAL_SCOPE]
+                  + [project_scope(pk) for pk in project_ids]
+                  + [department_scope(name) for name in departments])
+
+    @staticmethod
+    def _base_key(name: str, args, scopes: List[str]) -> str:
+        return f"stats:{name}:{hashlib.md5(repr((args, scopes)).encode('utf-8')).hexdigest()}"
+
+    def get_or_compute(self, name: str, compute: Callable, scopes: List[str] = (GLOBAL_SCOPE,), args=()):
+        """读取缓存的统计结果，未命中时重算（同一时间只有一个请求重算）"""
+        if not self.config['CACHE_ENABLED']:
+            return compute()
+
+        scopes = list(scopes)
+        base_key = self._base_key(name, args, scopes)
+        versions = ':'.join(str(self.version(scope)) for scope in scopes)
+        key = f"{base_key}:{timezone.localdate().isoformat()}:{versions}"
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        stale_key = f"{base_key}:stale"
+        lock_key = f"{key}:lock"
+        deadline = time.monotonic() + self.config['CACHE_WAIT']
+        while not cache.add(lock_key, 1, timeout=self.config['CACHE_LOCK_TIMEOUT']):
+            stale = cache.get(stale_key)
+            if stale is not None:
+                return stale
+            if time.monotonic() > deadline:
+                logger.warning(f"等待统计 {name} 重算超时，直接计算")
+                return compute()
+            time.sleep(0.1)
+            value = cache.get(key)
+            if value is not None:
+                return value
+
+        try:
+            # 等锁期间其他请求可能已经写入
+            value = cache.get(key)
+            if value is None:
+                value = compute()
+                cache.set(key, value, timeout=self.config['CACHE_TIMEOUT'])
+                cache.set(stale_key, value, timeout=self.config['CACHE_STALE_TIMEOUT'])
+            return value
+        finally:
+            cache.delete(lock_key)
+
+
+def project_changed(sender, instance, **kwargs):
+    """项目新增、修改、删除：项目数、部门分布等统计失效"""
+    statistics_cache.bump([GLOBAL_SCOPE, project_scope(instance.pk), department_scope(instance.department.name)])
+
+
+# 全局统计缓存实例
+statistics_cache = StatisticsCache()
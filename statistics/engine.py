@@ -0,0 +1,249 @@
+import operator
+from functools import reduce
+from datetime import timedelta
+from typing import Dict, Optional
+from django.conf import settings
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.models import Finding, SeverityManager
+from .models import FindingDailyRollup
+
+# 状态统计: 输出名称 -> Finding布尔字段
+STATUS_FIELDS = {
+    'active': 'active',
+    'verified': 'verified',
+    'false_positive': 'false_p',
+    'duplicate': 'duplicate',
+    'out_of_scope': 'out_of_scope',
+    'risk_accepted': 'risk_accepted',
+    'mitigated': 'is_mitigated',
+    'under_review': 'under_review',
+}
+
+# 支持的统计范围: 范围名称 -> 分组字段
+SCOPE_FIELDS = {
+    'project': 'project_id',
+    'department': 'project__department__name',
+    'tool': 'scan_task__tool_name',
+}
+
+
+class FindingStatisticsEngine:
+    """漏洞统计引擎 - 一次聚合查询计算严重程度、状态、SLA、AI分析和翻译覆盖率
+
+    每个指标是一个带条件的 COUNT(...) FILTER (WHERE ...)，同一查询集的所有指标在一条SQL里
+    算出；compute_by 按范围（项目、部门、工具）分组，每个范围一行。
+    """
+
+    # 支持的统计范围
+    scope_fields = SCOPE_FIELDS
+
+    def __init__(self, queryset=None):
+        self.queryset = self.default_queryset() if queryset is None else queryset
+
+    def default_queryset(self):
+        return Finding.objects.all()
+
+    def measure(self, condition=None):
+        """满足条件的漏洞数"""
+        return Count('id', filter=condition)
+
+    def ai_analyzed_condition(self) -> Q:
+        return ~Q(ai_analysis={})
+
+    def ai_cached_condition(self) -> Q:
+        return ~Q(ai_analysis={}) & Q(ai_cached=True)
+
+    def translated_condition(self) -> Q:
+        return Q(translated_message__gt='')
+
+    @staticmethod
+    def sla_conditions(today=None) -> Dict[str, Q]:
+        """SLA分桶条件（只统计未缓解的活跃漏洞）
+
+        与 Finding.get_sla_days_remaining 一致：剩余天数 = 期限 - (今天 - 发现日期)，
+        不超过0为已逾期，不超过 SLA_DUE_SOON_DAYS 为即将到期。按严重程度把剩余天数换算成
+        发现日期的边界，直接比较 date 字段。
+        """
+        today = today or timezone.now().date()
+        due_soon_days = SeverityManager.SLA_DUE_SOON_DAYS
+        # 各严重程度的期限，未知严重程度按默认期限
+        targets = [(Q(severity=severity), days) for severity, days in SeverityManager.SLA_DAYS.items()]
+        targets.append((~Q(severity__in=list(SeverityManager.SLA_DAYS)), SeverityManager.DEFAULT_SLA_DAYS))
+
+        overdue, due_soon = [], []
+        for severity_q, days in targets:
+            overdue_before = today - timedelta(days=days)
+            due_soon_before = overdue_before + timedelta(days=due_soon_days)
+            overdue.append(severity_q & Q(date__lte=overdue_before))
+            due_soon.append(severity_q & Q(date__gt=overdue_before, date__lte=due_soon_before))
+        overdue, due_soon = reduce(operator.or_, overdue), reduce(operator.or_, due_soon)
+
+        open_findings = Q(active=True, is_mitigated=False)
+        return {
+            'overdue': open_findings & overdue,
+            'due_soon': open_findings & due_soon,
+            'on_track': open_findings & ~overdue & ~due_soon,
+        }
+
+    def expressions(self, today=None) -> Dict:
+        """全部指标的聚合表达式"""
+        severities = [severity for severity, _ in SeverityManager.SEVERITY_CHOICES]
+        exprs = {'total': self.measure()}
+        for index, severity in enumerate(severities):
+            exprs[f'severity_{index}'] = self.measure(Q(severity=severity))
+            exprs[f'active_severity_{index}'] = self.measure(Q(severity=severity, active=True))
+        for name, field in STATUS_FIELDS.items():
+            exprs[f'status_{name}'] = self.measure(Q(**{field: True}))
+        for name, condition in self.sla_conditions(today).items():
+            exprs[f'sla_{name}'] = self.measure(condition)
+        exprs['coverage_ai_analyzed'] = self.measure(self.ai_analyzed_condition())
+        exprs['coverage_ai_cached'] = self.measure(self.ai_cached_condition())
+        exprs['coverage_translated'] = self.measure(self.translated_condition())
+        return exprs
+
+    @staticmethod
+    def _shape(row: Dict) -> Dict:
+        """把一行聚合结果整理成各类统计"""
+        severities = [severity for severity, _ in SeverityManager.SEVERITY_CHOICES]
+        total = row['total'] or 0
+
+        def coverage(count):
+            return (count / total * 100) if total > 0 else 0
+
+        severity_stats = {severity: row[f'severity_{i}'] for i, severity in enumerate(severities)}
+        severity_stats['total'] = sum(severity_stats.values())
+        active_severity_stats = {severity: row[f'active_severity_{i}'] for i, severity in enumerate(severities)}
+        active_severity_stats['total'] = sum(active_severity_stats.values())
+
+        status_stats = {name: row[f'status_{name}'] for name in STATUS_FIELDS}
+        status_stats['total'] = total
+
+        sla_stats = {name: row[f'sla_{name}'] for name in ('overdue', 'due_soon', 'on_track')}
+        sla_stats['total'] = sum(sla_stats.values())
+
+        return {
+            'severity_stats': severity_stats,
+            'active_severity_stats': active_severity_stats,
+            'status_stats': status_stats,
+            'sla_stats': sla_stats,
+            'ai_stats': {
+                'total_analyzed': row['coverage_ai_analyzed'],
+                'cached_results': row['coverage_ai_cached'],
+                'analysis_coverage': coverage(row['coverage_ai_analyzed']),
+            },
+            'translation_stats': {
+                'total_translated': row['coverage_translated'],
+                'translation_coverage': coverage(row['coverage_translated']),
+            },
+        }
+
+    @classmethod
+    def empty(cls) -> Dict:
+        """没有漏洞时的统计"""
+        return cls._shape({name: 0 for name in FindingStatisticsEngine().expressions()})
+
+    def compute(self, today=None) -> Dict:
+        """计算查询集的全部统计（一条SQL）"""
+        row = self.queryset.order_by().aggregate(**self.expressions(today))
+        return self._shape(row)
+
+    def count_by(self, field: str, condition: Optional[Q] = None) -> Dict:
+        """按字段分组计数，返回 {字段值: 漏洞数}"""
+        queryset = self.queryset.order_by()
+        if condition is not None:
+            queryset = queryset.filter(condition)
+        return {row[field]: row['count'] for row in queryset.values(field).annotate(count=self.measure())}
+
+    def compute_by(self, scope: str, today=None, scope_ids: Optional[list] = None) -> Dict:
+        """按范围分组计算统计（一条SQL），返回 {范围值: 统计}"""
+        if scope not in self.scope_fields:
+            raise ValueError(f"不支持的统计范围: {scope}")
+        field = self.scope_fields[scope]
+
+        queryset = self.queryset
+        if scope_ids is not None:
+            queryset = queryset.filter(**{f'{field}__in': scope_ids})
+        rows = queryset.order_by().values(field).annotate(**self.expressions(today))
+        return {row[field]: self._shape(row) for row in rows}
+
+
+class RollupStatisticsEngine(FindingStatisticsEngine):
+    """从漏洞每日汇总表计算与 FindingStatisticsEngine 相同的统计
+
+    汇总表的状态字段与 Finding 同名，过滤条件相同，只是计数改为对 count 求和；查询的行数
+    取决于 (日期, 项目, 严重程度, 状态, CWE) 组合数，与漏洞表的大小无关。
+    """
+
+    scope_fields = {
+        'project': 'project_id',
+        'department': 'project__department__name',
+    }
+
+    def default_queryset(self):
+        return FindingDailyRollup.objects.all()
+
+    def measure(self, condition=None):
+        return Coalesce(Sum('count', filter=condition), 0)
+
+    def ai_analyzed_condition(self) -> Q:
+        return Q(ai_analyzed=True)
+
+    def ai_cached_condition(self) -> Q:
+        return Q(ai_analyzed=True, ai_cached=True)
+
+    def translated_condition(self) -> Q:
+        return Q(translated=True)
+
+
+def use_rollups() -> bool:
+    """统计是否读取每日汇总表"""
+    return settings.STATISTICS_CONFIG['USE_ROLLUPS']
+
+
+def statistics_engine(**filters) -> FindingStatisticsEngine:
+    """按过滤条件（Finding 与汇总表通用的字段，如 project、project__department__name）创建统计引擎"""
+    if use_rollups():
+        return RollupStatisticsEngine(FindingDailyRollup.objects.filter(**filters))
+    return FindingStatisticsEngine(Finding.objects.filter(**filters))
+
+
+def compute_finding_statistics(queryset=None, today=None) -> Dict:
+    """计算查询集的全部漏洞统计"""
+    return FindingStatisticsEngine(queryset).compute(today)
+
+
+def annotate_project_severity(projects, active_only: bool = False, rollups: Optional[bool] = None):
+    """给项目查询集加上漏洞数、各严重程度漏洞数和最高数值严重程度（一条SQL，替代逐项目统计）
+
+    注解字段: finding_count、severity_<序号>（序号对应 SEVERITY_CHOICES）、max_numerical_severity。
+    rollups 为None时按配置决定是否读取每日汇总表。
+    """
+    rollups = use_rollups() if rollups is None else rollups
+    relation = 'finding_rollups' if rollups else 'finding'
+
+    def measure(condition):
+        if rollups:
+            return Coalesce(Sum(f'{relation}__count', filter=condition), 0)
+        return Count(relation, filter=condition)
+
+    base = Q(**{f'{relation}__active': True}) if active_only else Q()
+    exprs = {
+        'finding_count': measure(base or None),
+        'max_numerical_severity': Max(f'{relation}__numerical_severity', filter=base or None),
+    }
+    for index, (severity, _) in enumerate(SeverityManager.SEVERITY_CHOICES):
+        exprs[f'severity_{index}'] = measure(base & Q(**{f'{relation}__severity': severity}))
+    return projects.annotate(**exprs)
+
+
+def project_severity_stats(project) -> Dict:
+    """读取 annotate_project_severity 注解的各严重程度漏洞数"""
+    stats = {
+        severity: getattr(project, f'severity_{index}')
+        for index, (severity, _) in enumerate(SeverityManager.SEVERITY_CHOICES)
+    }
+    stats['total'] = sum(stats.values())
+    return stats
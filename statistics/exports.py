@@ -0,0 +1,290 @@
+import io
+import csv
+import logging
+import importlib.util
+from typing import Dict, Iterator, List
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import Finding, SeverityManager
+from .services import ReportGenerator
+from .trends import TrendEngine
+
+logger = logging.getLogger(__name__)
+
+# 报告格式 -> 需要的Python模块（openpyxl为可选依赖，没有安装时不能导出XLSX）
+FORMAT_MODULES = {
+    'pdf': ('reportlab', 'matplotlib'),
+    'xlsx': ('pandas', 'openpyxl'),
+    'csv': (),
+}
+
+# 漏洞明细: (Finding字段, 列名)，之后追加 SLA剩余天数
+FINDING_COLUMNS = [
+    ('id', 'ID'),
+    ('severity', '严重程度'),
+    ('title', '标题'),
+    ('project__name', '项目'),
+    ('project__department__name', '部门'),
+    ('file_path', '文件路径'),
+    ('line_number', '行号'),
+    ('cwe', 'CWE'),
+    ('date', '发现日期'),
+    ('verified', '已验证'),
+    ('code_owner', '代码负责人'),
+]
+
+# PDF中列出的漏洞数（完整明细见XLSX/CSV）
+PDF_FINDINGS = 50
+
+# 图表中文字体，按顺序使用第一个已安装的字体
+CHART_FONTS = ['Noto Sans CJK SC', 'WenQuanYi Micro Hei', 'SimHei', 'Microsoft YaHei', 'DejaVu Sans']
+
+RISK_LEVELS = {'critical': '严重', 'high': '高', 'medium': '中', 'low': '低'}
+
+
+def available_formats() -> List[str]:
+    """已安装依赖、可以生成的报告格式"""
+    return [
+        fmt for fmt, modules in FORMAT_MODULES.items()
+        if all(importlib.util.find_spec(module) for module in modules)
+    ]
+
+
+def report_content(job) -> Dict:
+    """报告内容：标题、统计报告、摘要指标、严重程度分布、项目分布、趋势和漏洞查询集"""
+    if job.scope == 'project':
+        title = f'{job.project.name} 项目安全报告'
+        report = ReportGenerator.generate_project_report(job.project)
+        findings = Finding.objects.filter(project=job.project)
+        projects = []
+    elif job.scope == 'department':
+        title = f'{job.department.name} 部门安全报告'
+        report = ReportGenerator.generate_department_report(job.department.name)
+        findings = Finding.objects.filter(project__department=job.department)
+        projects = [
+            {
+                '项目': item['project_name'],
+                '代码负责人': item['code_owner'],
+                **{severity: item['severity_stats'].get(severity, 0) for severity in reversed(SeverityManager.SEVERITIES)},
+                '漏洞总数': item['severity_stats']['total'],
+            }
+            for item in report['statistics'].get('project_breakdown', [])
+        ]
+    else:
+        title = '全局安全报告'
+        report = ReportGenerator.generate_global_report()
+        findings = Finding.objects.all()
+        projects = [
+            {
+                '项目': item['project_name'],
+                '部门': item['department'],
+                '代码负责人': item['code_owner'],
+                '高危': item['high_findings'],
+                '中危': item['medium_findings'],
+                '活跃漏洞数': item['total_findings'],
+            }
+            for item in report['statistics'].get('top_vulnerable_projects', [])
+        ]
+
+    stats, summary = report['statistics'], report['summary']
+    severity_stats, active_stats = stats['severity_stats'], stats['active_severity_stats']
+    sla_stats = stats['sla_stats']
+    return {
+        'title': title,
+        'generated_at': timezone.localtime(),
+        'summary': [
+            ('漏洞总数', summary['total_findings']),
+            ('高危、中危漏洞', summary['high_risk_findings']),
+            ('逾期漏洞', summary['overdue_findings']),
+            ('即将到期漏洞', sla_stats['due_soon']),
+            ('风险等级', RISK_LEVELS.get(summary['risk_level'], summary['risk_level'])),
+            ('AI分析覆盖率', f"{summary['ai_analysis_coverage']:.1f}%"),
+            ('翻译覆盖率', f"{summary['translation_coverage']:.1f}%"),
+        ],
+        'severity': [
+            (severity, severity_stats.get(severity, 0), active_stats.get(severity, 0))
+            for severity in reversed(SeverityManager.SEVERITIES)
+        ],
+        'projects': projects,
+        'trend': TrendEngine(findings).series(days=30),
+        'findings': findings,
+    }
+
+
+def finding_header() -> List[str]:
+    return [name for _, name in FINDING_COLUMNS] + ['SLA剩余天数']
+
+
+def finding_rows(findings, limit: int = None) -> Iterator[List]:
+    """活跃漏洞明细，按严重程度从高到低、发现日期从早到晚"""
+    today = timezone.localdate()
+    limit = limit or settings.STATISTICS_CONFIG['REPORT_MAX_FINDINGS']
+    rows = findings.filter(active=True).order_by('-numerical_severity', 'date', 'id').values_list(
+        *[field for field, _ in FINDING_COLUMNS]
+    )[:limit]
+    severity_index = [field for field, _ in FINDING_COLUMNS].index('severity')
+    date_index = [field for field, _ in FINDING_COLUMNS].index('date')
+    for row in rows.iterator(chunk_size=2000):
+        sla_days = SeverityManager.get_sla_days(row[severity_index]) - (today - row[date_index]).days
+        yield [*row, sla_days]
+
+
+def render_csv(content: Dict, path: str):
+    """CSV：活跃漏洞明细（带BOM，Excel直接打开不乱码）"""
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(finding_header())
+        writer.writerows(finding_rows(content['findings']))
+
+
+def render_xlsx(content: Dict, path: str):
+    """XLSX：摘要、严重程度（柱状图）、趋势（折线图）、项目分布和漏洞明细工作表"""
+    import pandas as pd
+    from openpyxl.chart import BarChart, LineChart, Reference
+
+    trend = pd.DataFrame([
+        {'日期': point['date'], '新增': point['new_findings']['total'],
+         '修复': point['fixed_count'], '活跃': point['active_count']}
+        for point in content['trend']
+    ], columns=['日期', '新增', '修复', '活跃'])
+
+    with pd.ExcelWriter(path, engine='openpyxl') as writer:
+        pd.DataFrame(content['summary'], columns=['指标', '值']).to_excel(writer, sheet_name='摘要', index=False)
+        pd.DataFrame(content['severity'], columns=['严重程度', '漏洞数', '活跃漏洞数']).to_excel(
+            writer, sheet_name='严重程度', index=False
+        )
+        trend.to_excel(writer, sheet_name='趋势', index=False)
+        if content['projects']:
+            pd.DataFrame(content['projects']).to_excel(writer, sheet_name='项目', index=False)
+        pd.DataFrame(list(finding_rows(content['findings'])), columns=finding_header()).to_excel(
+            writer, sheet_name='漏洞明细', index=False
+        )
+
+        sheet = writer.sheets['严重程度']
+        chart = BarChart()
+        chart.title = '严重程度分布'
+        chart.add_data(Reference(sheet, min_col=2, max_col=3, min_row=1, max_row=len(content['severity']) + 1),
+                       titles_from_data=True)
+        chart.set_categories(Reference(sheet, min_col=1, min_row=2, max_row=len(content['severity']) + 1))
+        sheet.add_chart(chart, 'E2')
+
+        if len(trend):
+            sheet = writer.sheets['趋势']
+            chart = LineChart()
+            chart.title = '最近30天趋势'
+            chart.add_data(Reference(sheet, min_col=2, max_col=4, min_row=1, max_row=len(trend) + 1),
+                           titles_from_data=True)
+            chart.set_categories(Reference(sheet, min_col=1, min_row=2, max_row=len(trend) + 1))
+            sheet.add_chart(chart, 'F2')
+
+
+def _charts(content: Dict) -> List[bytes]:
+    """PDF中的图表（PNG）：严重程度分布和最近30天趋势"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    plt.rcParams['font.sans-serif'] = CHART_FONTS
+    plt.rcParams['axes.unicode_minus'] = False
+
+    images = []
+    fig, ax = plt.subplots(figsize=(7, 3))
+    labels = [severity for severity, _, _ in content['severity']]
+    ax.bar(labels, [active for _, _, active in content['severity']],
+           color=[SeverityManager.get_severity_color(severity) for severity in labels])
+    ax.set_title('活跃漏洞严重程度分布')
+    images.append(fig)
+
+    if content['trend']:
+        fig, ax = plt.subplots(figsize=(7, 3))
+        dates = [point['date'][5:] for point in content['trend']]
+        ax.plot(dates, [point['active_count'] for point in content['trend']], label='活跃')
+        ax.plot(dates, [point['new_findings']['total'] for point in content['trend']], label='新增')
+        ax.plot(dates, [point['fixed_count'] for point in content['trend']], label='修复')
+        ax.set_xticks(dates[::5])
+        ax.set_title('最近30天趋势')
+        ax.legend()
+        images.append(fig)
+
+    result = []
+    for fig in images:
+        buffer = io.BytesIO()
+        fig.tight_layout()
+        fig.savefig(buffer, format='png', dpi=150)
+        plt.close(fig)
+        result.append(buffer.getvalue())
+    return result
+
+
+def render_pdf(content: Dict, path: str):
+    """PDF：摘要、图表、严重程度、项目分布和最严重的 PDF_FINDINGS 个活跃漏洞"""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    # reportlab内置的中文字体，不依赖系统字体文件
+    pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
+    styles = getSampleStyleSheet()
+    for style in styles.byName.values():
+        style.fontName = 'STSong-Light'
+
+    def table(rows, widths=None):
+        result = Table(rows, colWidths=widths, repeatRows=1)
+        result.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), 'STSong-Light'),
+            ('FONTSIZE', (0, 0), (-1, -1), 8),
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#e9ecef')),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]))
+        return result
+
+    def cell(value, width=40):
+        text = '' if value is None else str(value)
+        return text if len(text) <= width else text[:width - 1] + '…'
+
+    story = [
+        Paragraph(content['title'], styles['Title']),
+        Paragraph(f"生成时间: {content['generated_at']:%Y-%m-%d %H:%M}", styles['Normal']),
+        Spacer(1, 0.5 * cm),
+        Paragraph('摘要', styles['Heading2']),
+        table([['指标', '值']] + [[name, value] for name, value in content['summary']], [6 * cm, 6 * cm]),
+        Spacer(1, 0.5 * cm),
+    ]
+    for png in _charts(content):
+        story += [Image(io.BytesIO(png), width=16 * cm, height=16 * cm * 3 / 7), Spacer(1, 0.3 * cm)]
+
+    story += [
+        Paragraph('严重程度分布', styles['Heading2']),
+        table([['严重程度', '漏洞数', '活跃漏洞数']] + [list(row) for row in content['severity']]),
+    ]
+    if content['projects']:
+        header = list(content['projects'][0])
+        story += [
+            Paragraph('项目分布', styles['Heading2']),
+            table([header] + [[cell(project[name], 30) for name in header] for project in content['projects']]),
+        ]
+
+    columns = ['严重程度', '标题', '项目', '文件路径', '行号', 'SLA剩余天数']
+    indexes = [finding_header().index(name) for name in columns]
+    rows = [[cell(row[i]) for i in indexes] for row in finding_rows(content['findings'], PDF_FINDINGS)]
+    story += [
+        Paragraph(f'最严重的 {len(rows)} 个活跃漏洞', styles['Heading2']),
+        table([columns] + rows, [1.6 * cm, 5 * cm, 2.6 * cm, 5 * cm, 1.2 * cm, 2 * cm]),
+    ]
+
+    SimpleDocTemplate(path, pagesize=A4, title=content['title'],
+                      leftMargin=1.5 * cm, rightMargin=1.5 * cm).build(story)
+
+
+# 报告格式 -> 渲染函数
+RENDERERS = {
+    'pdf': render_pdf,
+    'xlsx': render_xlsx,
+    'csv': render_csv,
+}
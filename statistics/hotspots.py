@@ -0,0 +1,153 @@
+import logging
+import posixpath
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+
+from core.models import Finding, Project
+from .models import DirectoryHotspot
+
+logger = logging.getLogger(__name__)
+
+# 严重程度 -> 目录热点的计数字段
+SEVERITY_COUNT_FIELDS = {
+    '高危': 'high_count',
+    '中危': 'medium_count',
+    '低危': 'low_count',
+}
+
+# 每次重建的项目数
+PROJECTS_PER_BATCH = 100
+
+
+def relative_path(file_path: str, source_path: str) -> str:
+    """相对项目源码根目录的文件路径（Semgrep输出的是绝对路径，解析时去掉了开头的/）"""
+    path = (file_path or '').strip('/')
+    prefix = (source_path or '').strip('/')
+    if prefix and path.startswith(prefix + '/'):
+        path = path[len(prefix) + 1:]
+    return posixpath.normpath(path) if path else ''
+
+
+def directory_prefixes(path: str, max_depth: int) -> List[str]:
+    """文件所在目录及其各级上级目录（含根目录''），最多到 max_depth 层"""
+    parts = path.split('/')[:-1][:max_depth]
+    return [''] + ['/'.join(parts[:depth]) for depth in range(1, len(parts) + 1)]
+
+
+class DirectoryHotspotService:
+    """目录热点维护 - 按项目把活跃漏洞数汇总到文件所在的每一级目录
+
+    按 (文件, 严重程度) 分组读取项目的活跃漏洞数，逐级累加到上级目录后整体替换项目的目录热点；
+    查询某一层级的热点目录只需读取 (项目, 层级) 索引上的少量行。
+
+    漏洞变化后由 schedule 标记项目，HOTSPOT_REBUILD_DELAY 秒内的多次变化合并为一次后台重建，
+    单个漏洞的状态变更不会同步重建整个项目的目录热点。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = set()
+        self.timer = None
+
+    @property
+    def max_depth(self) -> int:
+        return settings.STATISTICS_CONFIG['HOTSPOT_MAX_DEPTH']
+
+    def schedule(self, project_ids):
+        """标记项目的目录热点需要重建，延迟后在后台线程中批量重建（延迟为0时立即重建）"""
+        project_ids = [pk for pk in project_ids if pk is not None]
+        delay = settings.STATISTICS_CONFIG['HOTSPOT_REBUILD_DELAY']
+        if delay <= 0:
+            self.rebuild(project_ids)
+            return
+        with self.lock:
+            self.pending.update(project_ids)
+            if self.timer is None:
+                # 非守护线程：管理命令退出前会等待已标记的项目重建完成
+                self.timer = threading.Timer(delay, self.flush)
+                self.timer.start()
+
+    def flush(self):
+        """重建已标记项目的目录热点"""
+        with self.lock:
+            project_ids, self.pending, self.timer = sorted(self.pending), set(), None
+        if not project_ids:
+            return
+        try:
+            self.rebuild(project_ids)
+        except Exception as e:
+            # 目录热点可以用 rebuild_rollups 恢复
+            logger.error(f"重建目录热点失败（{len(project_ids)} 个项目）: {e}")
+        finally:
+            connection.close()
+
+    def build(self, rows, source_paths: Dict) -> List[DirectoryHotspot]:
+        """由 (项目, 文件, 严重程度, 漏洞数) 分组结果生成未保存的目录热点"""
+        tree = defaultdict(lambda: {'total': 0, 'files': set(), **{field: 0 for field in SEVERITY_COUNT_FIELDS.values()}})
+        for row in rows:
+            path = relative_path(row['file_path'], source_paths.get(row['project_id']))
+            field = SEVERITY_COUNT_FIELDS.get(row['severity'])
+            for prefix in directory_prefixes(path, self.max_depth):
+                node = tree[(row['project_id'], prefix)]
+                node['total'] += row['count']
+                node['files'].add(path)
+                if field:
+                    node[field] += row['count']
+
+        return [
+            DirectoryHotspot(
+                project_id=project_id,
+                path=prefix,
+                depth=prefix.count('/') + 1 if prefix else 0,
+                total=node['total'],
+                file_count=len(node['files']),
+                **{field: node[field] for field in SEVERITY_COUNT_FIELDS.values()}
+            )
+            for (project_id, prefix), node in tree.items()
+        ]
+
+    def rebuild(self, project_ids=None) -> int:
+        """重建项目（默认全部项目）的目录热点，返回写入的行数"""
+        if project_ids is None:
+            project_ids = list(Project.objects.order_by('pk').values_list('pk', flat=True))
+        project_ids = [pk for pk in project_ids if pk is not None]
+
+        written = 0
+        for start in range(0, len(project_ids), PROJECTS_PER_BATCH):
+            chunk = project_ids[start:start + PROJECTS_PER_BATCH]
+            with transaction.atomic():
+                # 与汇总重算一样锁住项目行，同一项目的重建串行执行
+                source_paths = dict(
+                    Project.objects.select_for_update().filter(pk__in=chunk).values_list('pk', 'source_path')
+                )
+                rows = Finding.objects.filter(project_id__in=chunk, active=True).order_by().values(
+                    'project_id', 'file_path', 'severity'
+                ).annotate(count=Count('id'))
+                hotspots = self.build(rows, source_paths)
+                DirectoryHotspot.objects.filter(project_id__in=chunk).delete()
+                DirectoryHotspot.objects.bulk_create(hotspots, batch_size=1000)
+            written += len(hotspots)
+        return written
+
+    @staticmethod
+    def top(project, depth: Optional[int] = None, limit: int = 10, under: str = '', order: str = 'severity'):
+        """项目的热点目录：depth 为None时不限层级（不含根目录），under 只返回该目录下的子目录
+
+        order 为 severity 时按高危、中危、总数排序，为 total 时按总数排序。
+        """
+        hotspots = DirectoryHotspot.objects.filter(project=project, depth__gt=0)
+        if depth is not None:
+            hotspots = hotspots.filter(depth=depth)
+        under = under.strip('/')
+        if under:
+            hotspots = hotspots.filter(path__startswith=under + '/')
+        ordering = ['-total', '-high_count'] if order == 'total' else ['-high_count', '-medium_count', '-total']
+        return hotspots.order_by(*ordering, 'path')[:limit]
+
+
+# 全局目录热点实例
+hotspot_service = DirectoryHotspotService()
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.models import ScanTask
+from statistics.snapshots import snapshot_service
+
+
+class Command(BaseCommand):
+    help = '为已完成的扫描任务补录扫描快照（升级前的扫描、记录快照失败的扫描）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', help='只处理指定项目ID（可重复）')
+        parser.add_argument('--rebuild', action='store_true', help='重新记录已有快照的扫描')
+
+    def handle(self, *args, **options):
+        tasks = ScanTask.objects.filter(status='completed')
+        if options['project']:
+            tasks = tasks.filter(project_id__in=options['project'])
+            if not tasks.exists():
+                raise CommandError('没有匹配的扫描任务')
+        if not options['rebuild']:
+            tasks = tasks.filter(snapshot__isnull=True)
+
+        start = time.monotonic()
+        recorded = fingerprinted = 0
+        # 按任务ID顺序记录，每个快照的上一次扫描已经有快照
+        for scan_task in tasks.order_by('project_id', 'id').iterator():
+            fingerprinted += snapshot_service.fingerprint_scan(scan_task)
+            snapshot_service.record(scan_task)
+            recorded += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'已记录 {recorded} 个扫描快照，补充 {fingerprinted} 个漏洞指纹，耗时 {time.monotonic() - start:.1f}s'
+        ))
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Project
+from statistics.models import FindingDailyRollup
+from statistics.rollups import rollup_service
+
+
+class Command(BaseCommand):
+    help = '从漏洞表重建漏洞每日汇总和目录热点（汇总与漏洞不一致时恢复用）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', help='只重建指定项目ID（可重复）')
+        parser.add_argument('--department', type=str, help='只重建指定部门的项目')
+
+    def handle(self, *args, **options):
+        project_ids = None
+        if options['project'] or options['department']:
+            projects = Project.objects.all()
+            if options['project']:
+                projects = projects.filter(pk__in=options['project'])
+            if options['department']:
+                projects = projects.filter(department__name=options['department'])
+            project_ids = list(projects.values_list('pk', flat=True))
+            if not project_ids:
+                raise CommandError('没有匹配的项目')
+
+        start = time.monotonic()
+        written = rollup_service.rebuild(project_ids)
+        scope = f'{len(project_ids)} 个项目' if project_ids is not None else '全部项目'
+        self.stdout.write(self.style.SUCCESS(
+            f'已重建{scope}的漏洞汇总: {written} 行，耗时 {time.monotonic() - start:.1f}s'
+            f'（汇总表共 {FindingDailyRollup.objects.count()} 行）'
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from statistics.models import ReportJob
+from statistics.report_jobs import report_job_service
+
+
+class Command(BaseCommand):
+    help = '生成报告文件（报告任务的工作进程；也可用于重新生成排队中的任务、清理过期报告）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_ids', nargs='*', type=int, help='报告任务ID')
+        parser.add_argument('--pending', action='store_true', help='生成所有排队中的任务（服务重启后遗留的任务）')
+        parser.add_argument('--cleanup', action='store_true', help='删除超过保留天数的报告文件和任务记录')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            count = report_job_service.cleanup()
+            self.stdout.write(self.style.SUCCESS(f'已删除 {count} 个过期报告任务'))
+
+        jobs = list(ReportJob.objects.filter(pk__in=options['job_ids']).select_related('project', 'department'))
+        if len(jobs) < len(set(options['job_ids'])):
+            raise CommandError('报告任务不存在')
+        if options['pending']:
+            jobs += list(ReportJob.objects.filter(status='pending').exclude(pk__in=options['job_ids'])
+                         .select_related('project', 'department').order_by('created_at'))
+
+        failed = 0
+        for job in jobs:
+            job = report_job_service.render(job)
+            if job.status == 'failed':
+                failed += 1
+                self.stderr.write(f'报告任务 {job.id} 生成失败: {job.error_message}')
+            else:
+                self.stdout.write(f'报告任务 {job.id} 已生成: {job.artifact_path}')
+        if failed:
+            raise CommandError(f'{failed} 个报告任务生成失败')
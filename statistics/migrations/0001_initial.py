@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('core', '0016_scantask_ingestion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FindingDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='发现日期')),
+                ('severity', models.CharField(blank=True, max_length=200, verbose_name='严重程度')),
+                ('numerical_severity', models.CharField(blank=True, max_length=4, verbose_name='数值严重程度')),
+                ('cwe', models.IntegerField(blank=True, null=True, verbose_name='CWE编号')),
+                ('active', models.BooleanField(default=True, verbose_name='活跃')),
+                ('verified', models.BooleanField(default=False, verbose_name='已验证')),
+                ('false_p', models.BooleanField(default=False, verbose_name='误报')),
+                ('duplicate', models.BooleanField(default=False, verbose_name='重复')),
+                ('out_of_scope', models.BooleanField(default=False, verbose_name='超出范围')),
+                ('risk_accepted', models.BooleanField(default=False, verbose_name='风险接受')),
+                ('is_mitigated', models.BooleanField(default=False, verbose_name='已缓解')),
+                ('under_review', models.BooleanField(default=False, verbose_name='审查中')),
+                ('ai_analyzed', models.BooleanField(default=False, verbose_name='已AI分析')),
+                ('ai_cached', models.BooleanField(default=False, verbose_name='AI结果已缓存')),
+                ('translated', models.BooleanField(default=False, verbose_name='已翻译')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='漏洞数')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='finding_rollups', to='core.project', verbose_name='项目')),
+            ],
+            options={
+                'verbose_name': '漏洞每日汇总',
+                'verbose_name_plural': '漏洞每日汇总',
+                'indexes': [models.Index(fields=['project', 'date'], name='statistics__project_77a65d_idx'), models.Index(fields=['date'], name='statistics__date_5b7d43_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+from django.db.models import BooleanField, Case, Count, Q, Value, When
+
+GROUP_FIELDS = [
+    'date', 'project_id', 'severity', 'cwe',
+    'active', 'verified', 'false_p', 'duplicate', 'out_of_scope', 'risk_accepted', 'is_mitigated', 'under_review',
+    'ai_cached',
+]
+
+NUMERICAL_SEVERITY = {"低危": "S1", "中危": "S2", "高危": "S3"}
+
+
+def build_finding_rollups(apps, schema_editor):
+    """根据现有漏洞生成每日汇总（之后由 statistics.rollups 增量维护）"""
+    Finding = apps.get_model('core', 'Finding')
+    FindingDailyRollup = apps.get_model('statistics', 'FindingDailyRollup')
+
+    rows = Finding.objects.order_by().annotate(
+        ai_analyzed=Case(When(~Q(ai_analysis={}), then=Value(True)), default=Value(False), output_field=BooleanField()),
+        translated=Case(When(translated_message__gt='', then=Value(True)), default=Value(False), output_field=BooleanField()),
+    ).values(*GROUP_FIELDS, 'ai_analyzed', 'translated').annotate(count=Count('id'))
+
+    batch = []
+    for row in rows.iterator():
+        batch.append(FindingDailyRollup(numerical_severity=NUMERICAL_SEVERITY.get(row['severity'], 'S1'), **row))
+        if len(batch) >= 1000:
+            FindingDailyRollup.objects.bulk_create(batch)
+            batch = []
+    FindingDailyRollup.objects.bulk_create(batch)
+
+
+def clear_finding_rollups(apps, schema_editor):
+    apps.get_model('statistics', 'FindingDailyRollup').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('statistics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_finding_rollups, clear_finding_rollups),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_finding_fingerprint'),
+        ('statistics', '0002_build_finding_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('commit_sha', models.CharField(blank=True, max_length=64, verbose_name='提交版本')),
+                ('fingerprints', models.JSONField(default=list, verbose_name='漏洞指纹')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='漏洞数')),
+                ('severity_counts', models.JSONField(default=dict, verbose_name='严重程度分布')),
+                ('cwe_counts', models.JSONField(default=dict, verbose_name='CWE分布')),
+                ('added', models.JSONField(default=list, verbose_name='新增指纹')),
+                ('removed', models.JSONField(default=list, verbose_name='消失指纹')),
+                ('added_count', models.PositiveIntegerField(default=0, verbose_name='新增数')),
+                ('removed_count', models.PositiveIntegerField(default=0, verbose_name='修复数')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('previous', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='statistics.scansnapshot', verbose_name='上一次扫描快照')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scan_snapshots', to='core.project', verbose_name='项目')),
+                ('scan_task', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='core.scantask', verbose_name='扫描任务')),
+            ],
+            options={
+                'verbose_name': '扫描快照',
+                'verbose_name_plural': '扫描快照',
+                'ordering': ['-scan_task_id'],
+                'indexes': [models.Index(fields=['project', 'scan_task'], name='statistics__project_6e7b77_idx')],
+            },
+        ),
+    ]
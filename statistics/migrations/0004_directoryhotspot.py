@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_finding_fingerprint'),
+        ('statistics', '0003_scansnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirectoryHotspot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(blank=True, max_length=1000, verbose_name='目录')),
+                ('depth', models.PositiveSmallIntegerField(default=0, verbose_name='目录层级')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='活跃漏洞数')),
+                ('high_count', models.PositiveIntegerField(default=0, verbose_name='高危')),
+                ('medium_count', models.PositiveIntegerField(default=0, verbose_name='中危')),
+                ('low_count', models.PositiveIntegerField(default=0, verbose_name='低危')),
+                ('file_count', models.PositiveIntegerField(default=0, verbose_name='有漏洞的文件数')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='directory_hotspots', to='core.project', verbose_name='项目')),
+            ],
+            options={
+                'verbose_name': '目录热点',
+                'verbose_name_plural': '目录热点',
+                'indexes': [models.Index(fields=['project', 'depth'], name='statistics__project_d68e18_idx')],
+            },
+        ),
+    ]
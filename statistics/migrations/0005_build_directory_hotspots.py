@@ -0,0 +1,59 @@
+import posixpath
+from collections import defaultdict
+from django.db import migrations
+from django.db.models import Count
+
+SEVERITY_COUNT_FIELDS = {'高危': 'high_count', '中危': 'medium_count', '低危': 'low_count'}
+
+MAX_DEPTH = 8
+
+
+def build_directory_hotspots(apps, schema_editor):
+    """根据现有活跃漏洞生成目录热点（之后由 statistics.hotspots 随漏洞汇总一起重建）"""
+    Finding = apps.get_model('core', 'Finding')
+    Project = apps.get_model('core', 'Project')
+    DirectoryHotspot = apps.get_model('statistics', 'DirectoryHotspot')
+
+    source_paths = dict(Project.objects.values_list('pk', 'source_path'))
+    rows = Finding.objects.filter(active=True, project__isnull=False).order_by().values(
+        'project_id', 'file_path', 'severity'
+    ).annotate(count=Count('id'))
+
+    tree = defaultdict(lambda: {'total': 0, 'files': set(), 'high_count': 0, 'medium_count': 0, 'low_count': 0})
+    for row in rows.iterator():
+        path = (row['file_path'] or '').strip('/')
+        prefix = (source_paths.get(row['project_id']) or '').strip('/')
+        if prefix and path.startswith(prefix + '/'):
+            path = path[len(prefix) + 1:]
+        path = posixpath.normpath(path) if path else ''
+        parts = path.split('/')[:-1][:MAX_DEPTH]
+        for depth in range(len(parts) + 1):
+            node = tree[(row['project_id'], '/'.join(parts[:depth]))]
+            node['total'] += row['count']
+            node['files'].add(path)
+            if row['severity'] in SEVERITY_COUNT_FIELDS:
+                node[SEVERITY_COUNT_FIELDS[row['severity']]] += row['count']
+
+    DirectoryHotspot.objects.bulk_create([
+        DirectoryHotspot(
+            project_id=project_id, path=path, depth=path.count('/') + 1 if path else 0,
+            total=node['total'], file_count=len(node['files']),
+            high_count=node['high_count'], medium_count=node['medium_count'], low_count=node['low_count'],
+        )
+        for (project_id, path), node in tree.items()
+    ], batch_size=1000)
+
+
+def clear_directory_hotspots(apps, schema_editor):
+    apps.get_model('statistics', 'DirectoryHotspot').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('statistics', '0004_directoryhotspot'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_directory_hotspots, clear_directory_hotspots),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-19 05:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0017_finding_fingerprint'),
+        ('statistics', '0005_build_directory_hotspots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('project', '项目'), ('department', '部门'), ('global', '全局')], max_length=20, verbose_name='报告范围')),
+                ('format', models.CharField(choices=[('pdf', 'PDF'), ('xlsx', 'Excel'), ('csv', 'CSV')], max_length=10, verbose_name='格式')),
+                ('status', models.CharField(choices=[('pending', '排队中'), ('running', '生成中'), ('completed', '已完成'), ('failed', '失败')], default='pending', max_length=20, verbose_name='状态')),
+                ('data_version', models.CharField(blank=True, max_length=200, verbose_name='数据版本')),
+                ('cache_key', models.CharField(db_index=True, max_length=32, verbose_name='缓存键')),
+                ('artifact_path', models.CharField(blank=True, max_length=1000, verbose_name='报告文件路径')),
+                ('file_size', models.BigIntegerField(blank=True, null=True, verbose_name='文件大小')),
+                ('error_message', models.TextField(blank=True, verbose_name='错误信息')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='开始时间')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='完成时间')),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to='core.department', verbose_name='部门')),
+                ('project', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='report_jobs', to='core.project', verbose_name='项目')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='请求人')),
+            ],
+            options={
+                'verbose_name': '报告生成任务',
+                'verbose_name_plural': '报告生成任务',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
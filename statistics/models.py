@@ -0,0 +1,174 @@
+import os
+from django.contrib.auth.models import User
+from django.db import models
+
+from core.models import Department, Project, ScanTask
+
+
+class FindingDailyRollup(models.Model):
+    """漏洞每日汇总 - 按 (发现日期, 项目, 严重程度, 状态, CWE) 分组的漏洞数
+
+    状态字段与 Finding 同名，统计引擎的过滤条件可以直接用在汇总表上；count 为该组合的漏洞数。
+    由 statistics.rollups 在漏洞入库、状态变更、删除时按 (项目, 发现日期) 分区重算。
+    """
+
+    date = models.DateField(verbose_name="发现日期")
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='finding_rollups', verbose_name="项目")
+    severity = models.CharField(max_length=200, blank=True, verbose_name="严重程度")
+    numerical_severity = models.CharField(max_length=4, blank=True, verbose_name="数值严重程度")
+    cwe = models.IntegerField(null=True, blank=True, verbose_name="CWE编号")
+
+    # 状态
+    active = models.BooleanField(default=True, verbose_name="活跃")
+    verified = models.BooleanField(default=False, verbose_name="已验证")
+    false_p = models.BooleanField(default=False, verbose_name="误报")
+    duplicate = models.BooleanField(default=False, verbose_name="重复")
+    out_of_scope = models.BooleanField(default=False, verbose_name="超出范围")
+    risk_accepted = models.BooleanField(default=False, verbose_name="风险接受")
+    is_mitigated = models.BooleanField(default=False, verbose_name="已缓解")
+    under_review = models.BooleanField(default=False, verbose_name="审查中")
+
+    # AI分析、翻译覆盖
+    ai_analyzed = models.BooleanField(default=False, verbose_name="已AI分析")
+    ai_cached = models.BooleanField(default=False, verbose_name="AI结果已缓存")
+    translated = models.BooleanField(default=False, verbose_name="已翻译")
+
+    count = models.PositiveIntegerField(default=0, verbose_name="漏洞数")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "漏洞每日汇总"
+        verbose_name_plural = "漏洞每日汇总"
+        indexes = [
+            models.Index(fields=['project', 'date']),
+            models.Index(fields=['date']),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id} - {self.date} - {self.severity}: {self.count}"
+
+
+class ScanSnapshot(models.Model):
+    """扫描快照 - 每个完成的扫描任务的漏洞指纹集合、分布和相对上一次扫描的变化
+
+    由 statistics.snapshots 在扫描入库完成时写入。added/removed 为相对同项目同工具上一次扫描新增、
+    消失的指纹，查询扫描间变化和按扫描的趋势只需读取快照，不需要比较漏洞集合。
+    """
+
+    scan_task = models.OneToOneField(ScanTask, on_delete=models.CASCADE, related_name='snapshot', verbose_name="扫描任务")
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='scan_snapshots', verbose_name="项目")
+    previous = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='+', verbose_name="上一次扫描快照")
+    commit_sha = models.CharField(max_length=64, blank=True, verbose_name="提交版本")
+
+    fingerprints = models.JSONField(default=list, verbose_name="漏洞指纹")
+    total = models.PositiveIntegerField(default=0, verbose_name="漏洞数")
+    severity_counts = models.JSONField(default=dict, verbose_name="严重程度分布")
+    cwe_counts = models.JSONField(default=dict, verbose_name="CWE分布")
+
+    added = models.JSONField(default=list, verbose_name="新增指纹")
+    removed = models.JSONField(default=list, verbose_name="消失指纹")
+    added_count = models.PositiveIntegerField(default=0, verbose_name="新增数")
+    removed_count = models.PositiveIntegerField(default=0, verbose_name="修复数")
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "扫描快照"
+        verbose_name_plural = "扫描快照"
+        ordering = ['-scan_task_id']
+        indexes = [
+            models.Index(fields=['project', 'scan_task']),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id} - 扫描 {self.scan_task_id}: {self.total} (+{self.added_count} -{self.removed_count})"
+
+
+class DirectoryHotspot(models.Model):
+    """目录热点 - 项目每个目录（含子目录）下活跃漏洞的数量，按严重程度
+
+    path 为相对项目源码根目录的目录路径，根目录为空字符串（depth 0，即项目合计）。
+    由 statistics.hotspots 在漏洞入库、状态变更后按项目重建。
+    """
+
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='directory_hotspots', verbose_name="项目")
+    path = models.CharField(max_length=1000, blank=True, verbose_name="目录")
+    depth = models.PositiveSmallIntegerField(default=0, verbose_name="目录层级")
+
+    total = models.PositiveIntegerField(default=0, verbose_name="活跃漏洞数")
+    high_count = models.PositiveIntegerField(default=0, verbose_name="高危")
+    medium_count = models.PositiveIntegerField(default=0, verbose_name="中危")
+    low_count = models.PositiveIntegerField(default=0, verbose_name="低危")
+    file_count = models.PositiveIntegerField(default=0, verbose_name="有漏洞的文件数")
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "目录热点"
+        verbose_name_plural = "目录热点"
+        indexes = [
+            models.Index(fields=['project', 'depth']),
+        ]
+
+    def __str__(self):
+        return f"{self.project_id} - {self.path or '/'}: {self.total}"
+
+
+class ReportJob(models.Model):
+    """报告生成任务 - 在后台工作进程中把项目、部门或全局报告渲染为 PDF/XLSX/CSV 文件
+
+    cache_key 由范围、格式和数据版本（统计缓存的范围版本号和日期）得出：数据没有变化时
+    重复的请求直接复用已生成的文件或正在生成的任务。
+    """
+
+    SCOPE_CHOICES = [
+        ('project', '项目'),
+        ('department', '部门'),
+        ('global', '全局'),
+    ]
+
+    FORMAT_CHOICES = [
+        ('pdf', 'PDF'),
+        ('xlsx', 'Excel'),
+        ('csv', 'CSV'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', '排队中'),
+        ('running', '生成中'),
+        ('completed', '已完成'),
+        ('failed', '失败'),
+    ]
+
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES, verbose_name="报告范围")
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='report_jobs', verbose_name="项目")
+    department = models.ForeignKey(Department, on_delete=models.CASCADE, null=True, blank=True,
+                                   related_name='report_jobs', verbose_name="部门")
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES, verbose_name="格式")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="状态")
+
+    data_version = models.CharField(max_length=200, blank=True, verbose_name="数据版本")
+    cache_key = models.CharField(max_length=32, db_index=True, verbose_name="缓存键")
+    artifact_path = models.CharField(max_length=1000, blank=True, verbose_name="报告文件路径")
+    file_size = models.BigIntegerField(null=True, blank=True, verbose_name="文件大小")
+    error_message = models.TextField(blank=True, verbose_name="错误信息")
+
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="请求人")
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="开始时间")
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name="完成时间")
+
+    class Meta:
+        verbose_name = "报告生成任务"
+        verbose_name_plural = "报告生成任务"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_scope_display()}报告 {self.format} - {self.status}"
+
+    @property
+    def artifact_exists(self) -> bool:
+        return bool(self.artifact_path) and os.path.isfile(self.artifact_path)
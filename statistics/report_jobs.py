@@ -0,0 +1,182 @@
+import os
+import sys
+import time
+import hashlib
+import logging
+import threading
+import subprocess
+from datetime import timedelta
+from queue import Queue
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import ReportJob
+from .cache import GLOBAL_SCOPE, statistics_cache, department_scope, project_scope
+from .exports import RENDERERS, available_formats, report_content
+
+logger = logging.getLogger(__name__)
+
+
+class ReportJobService:
+    """报告生成任务 - 请求时按数据版本复用已生成的报告，否则排队在工作进程中生成
+
+    数据版本由统计缓存的范围版本号和日期组成：范围内的漏洞有变化（入库、状态变更、删除）
+    或跨天后版本变化，之后的请求重新生成。每个报告在独立的 manage.py render_report 子进程
+    中渲染，matplotlib、pandas 的内存随进程退出释放，也不占用Web进程的GIL；同时运行的
+    进程数由 REPORT_WORKERS 限制。
+    """
+
+    def __init__(self):
+        self.queue = Queue()
+        self.lock = threading.Lock()
+        self.workers = []
+        # 本进程中排队和生成中的任务ID
+        self.active = set()
+
+    @property
+    def config(self):
+        return settings.STATISTICS_CONFIG
+
+    @staticmethod
+    def scopes(scope, project=None, department=None):
+        if scope == 'project':
+            return [project_scope(project.id)]
+        if scope == 'department':
+            return [department_scope(department.name)]
+        return [GLOBAL_SCOPE]
+
+    def data_version(self, scope, project=None, department=None) -> str:
+        versions = ':'.join(str(statistics_cache.version(name)) for name in self.scopes(scope, project, department))
+        return f"{timezone.localdate().isoformat()}:{versions}"
+
+    def request(self, scope, fmt, project=None, department=None, user=None):
+        """请求生成报告，返回 (任务, 是否复用已有任务)"""
+        if fmt not in available_formats():
+            raise ValueError(f"不支持或服务器未安装依赖的报告格式: {fmt}")
+        data_version = self.data_version(scope, project, department)
+        target = project.id if project else department.id if department else ''
+        cache_key = hashlib.md5(f"{scope}:{target}:{fmt}:{data_version}".encode('utf-8')).hexdigest()
+
+        job = ReportJob.objects.filter(cache_key=cache_key).exclude(status='failed').order_by('-created_at').first()
+        if job and job.status in ('pending', 'running') and not self.is_alive(job):
+            # 服务重启前排队或生成中的任务不会再被处理，标记为失败后重新生成
+            ReportJob.objects.filter(pk=job.pk, status=job.status).update(
+                status='failed', error_message='任务未在队列中且超过生成超时时间（服务可能已重启）',
+                completed_at=timezone.now()
+            )
+            job = None
+        if job and (job.status != 'completed' or job.artifact_exists):
+            return job, True
+
+        job = ReportJob.objects.create(
+            scope=scope, project=project, department=department, format=fmt,
+            data_version=data_version, cache_key=cache_key, requested_by=user
+        )
+        self.submit(job)
+        return job, False
+
+    def is_alive(self, job) -> bool:
+        """排队或生成中的任务是否仍会完成：在本进程的队列中，或在 REPORT_TIMEOUT 内开始生成"""
+        with self.lock:
+            if job.id in self.active:
+                return True
+        deadline = timezone.now() - timedelta(seconds=self.config['REPORT_TIMEOUT'])
+        return job.status == 'running' and job.started_at is not None and job.started_at >= deadline
+
+    def submit(self, job):
+        """排队生成报告"""
+        with self.lock:
+            self.active.add(job.id)
+        self.queue.put(job.id)
+        logger.info(f"报告任务 {job.id} 已加入队列，当前队列长度: {self.queue.qsize()}")
+        self.start()
+
+    def start(self):
+        """启动调度线程"""
+        with self.lock:
+            self.workers = [worker for worker in self.workers if worker.is_alive()]
+            for _ in range(max(1, self.config['REPORT_WORKERS']) - len(self.workers)):
+                worker = threading.Thread(target=self._worker, daemon=True)
+                worker.start()
+                self.workers.append(worker)
+
+    def _worker(self):
+        while True:
+            job_id = self.queue.get()
+            try:
+                self.spawn(job_id)
+            except Exception as e:
+                logger.error(f"报告任务 {job_id} 生成失败: {e}")
+                ReportJob.objects.filter(pk=job_id, status__in=['pending', 'running']).update(
+                    status='failed', error_message=str(e), completed_at=timezone.now()
+                )
+            finally:
+                with self.lock:
+                    self.active.discard(job_id)
+                connection.close()
+
+    def spawn(self, job_id):
+        """在子进程中生成报告，子进程异常退出或超时时任务标记为失败"""
+        manage_py = os.path.join(settings.BASE_DIR, 'manage.py')
+        try:
+            result = subprocess.run(
+                [sys.executable, manage_py, 'render_report', str(job_id)],
+                capture_output=True, text=True, timeout=self.config['REPORT_TIMEOUT']
+            )
+            error = result.stderr.strip()[-2000:] if result.returncode else ''
+        except subprocess.TimeoutExpired:
+            error = f"生成超时（{self.config['REPORT_TIMEOUT']}秒）"
+        if error:
+            ReportJob.objects.filter(pk=job_id, status__in=['pending', 'running']).update(
+                status='failed', error_message=error, completed_at=timezone.now()
+            )
+
+    def render(self, job):
+        """生成报告文件（在 render_report 子进程中执行）"""
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+
+        directory = os.path.join(self.config['REPORT_DIR'], job.scope)
+        os.makedirs(directory, exist_ok=True)
+        name = f"report_{job.id}_{job.cache_key[:8]}"
+        path = os.path.join(directory, f"{name}.{job.format}")
+        # 先写临时文件，完成后再改名，下载时不会读到不完整的文件（保留扩展名，pandas按扩展名检查格式）
+        temp_path = os.path.join(directory, f"{name}.tmp.{job.format}")
+        try:
+            start = time.monotonic()
+            RENDERERS[job.format](report_content(job), temp_path)
+            os.replace(temp_path, path)
+            job.status = 'completed'
+            job.artifact_path = path
+            job.file_size = os.path.getsize(path)
+            logger.info(f"报告任务 {job.id} 生成完成，耗时 {time.monotonic() - start:.1f}s")
+        except Exception as e:
+            logger.error(f"报告任务 {job.id} 生成失败: {e}")
+            job.status = 'failed'
+            job.error_message = str(e)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        job.completed_at = timezone.now()
+        job.save()
+        return job
+
+    def cleanup(self) -> int:
+        """删除超过保留天数的报告文件和任务记录，返回删除的任务数"""
+        expired = ReportJob.objects.filter(
+            created_at__lt=timezone.now() - timedelta(days=self.config['REPORT_RETENTION_DAYS'])
+        ).exclude(status__in=['pending', 'running'])
+        for path in expired.exclude(artifact_path='').values_list('artifact_path', flat=True):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"删除报告文件失败 {path}: {e}")
+        count, _ = expired.delete()
+        return count
+
+
+# 全局报告任务实例
+report_job_service = ReportJobService()
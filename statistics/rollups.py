@@ -0,0 +1,195 @@
+import logging
+import operator
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+from functools import reduce
+from django.db import transaction
+from django.db.models import BooleanField, Case, Count, Q, Value, When
+
+from core.models import Finding, Project, SeverityManager
+from .models import FindingDailyRollup
+from .cache import statistics_cache
+from .hotspots import hotspot_service
+
+logger = logging.getLogger(__name__)
+
+# 汇总表按这些 Finding 字段分组
+GROUP_FIELDS = [
+    'date', 'project_id', 'severity', 'cwe',
+    'active', 'verified', 'false_p', 'duplicate', 'out_of_scope', 'risk_accepted', 'is_mitigated', 'under_review',
+    'ai_cached',
+]
+
+# 保存时只更新了其他字段（如 ai_analyzing、source_context）不需要重算
+ROLLUP_FIELDS = set(GROUP_FIELDS) | {'project', 'ai_analysis', 'translated_message'}
+
+# 每次重算的项目数
+PROJECTS_PER_BATCH = 100
+
+
+def as_date(value):
+    """Finding.date 默认值为 timezone.now，保存前内存里可能是 datetime"""
+    return value.date() if isinstance(value, datetime) else value
+
+
+class FindingRollupService:
+    """漏洞每日汇总维护 - 按 (项目, 发现日期) 分区重算汇总表
+
+    漏洞入库、状态变更、删除后，只重算受影响的分区：删除分区的汇总行，再从漏洞表分组统计
+    写回。重算是幂等的，漏掉或重复触发都不会累积误差；rebuild 用于全量恢复。
+
+    单个漏洞的 save() 由信号触发，在事务提交后重算；批量操作（bulk_create、
+    queryset.update()）不发信号，调用方用 partitions / refresh 显式重算；
+    batch() 中触发的分区在退出时统一重算。重算后在后台合并重建涉及项目的目录热点，
+    rebuild 同步重建。
+
+    删除不连接信号：Finding 有删除信号时，删除扫描任务、项目级联删除漏洞要把每个漏洞整行加载
+    到内存并逐行发信号。删除漏洞和扫描任务时用 delete 或 partitions / refresh 显式重算；
+    删除项目时汇总行随项目级联删除，不需要重算。
+    """
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def _pending(self):
+        if not hasattr(self.local, 'pending'):
+            self.local.pending = set()
+            self.local.batch_depth = 0
+        return self.local.pending
+
+    def touch(self, project_id, day):
+        """标记分区需要重算"""
+        self._pending().add((project_id, as_date(day)))
+        if not self.local.batch_depth:
+            # 事务提交后重算（不在事务中时立即执行）；同一事务中多次触发只有第一次回调会重算
+            transaction.on_commit(self.flush)
+
+    def flush(self):
+        """重算已标记的分区"""
+        partitions, self.local.pending = self._pending(), set()
+        if not partitions:
+            return
+        try:
+            self.refresh(partitions)
+        except Exception as e:
+            # 漏洞的修改已经提交，汇总可以用 rebuild_rollups 恢复
+            logger.error(f"重算漏洞汇总失败（{len(partitions)} 个分区）: {e}")
+
+    @contextmanager
+    def batch(self):
+        """批量修改漏洞时使用：期间触发的分区在退出时统一重算"""
+        self._pending()
+        self.local.batch_depth += 1
+        try:
+            yield
+        finally:
+            self.local.batch_depth -= 1
+            if not self.local.batch_depth:
+                transaction.on_commit(self.flush)
+
+    def refresh(self, partitions):
+        """重算 (项目ID, 发现日期) 分区，返回写入的汇总行数"""
+        by_project = defaultdict(set)
+        for project_id, day in partitions:
+            by_project[project_id].add(as_date(day))
+
+        project_ids = list(by_project)
+        written = 0
+        for start in range(0, len(project_ids), PROJECTS_PER_BATCH):
+            conditions = [
+                self._partition(project_id, by_project[project_id])
+                for project_id in project_ids[start:start + PROJECTS_PER_BATCH]
+            ]
+            written += self._replace(reduce(operator.or_, conditions), project_ids[start:start + PROJECTS_PER_BATCH])
+        hotspot_service.schedule(project_ids)
+        statistics_cache.invalidate_projects(project_ids)
+        return written
+
+    @staticmethod
+    def partitions(queryset):
+        """查询集涉及的分区（在 queryset.update() 之前取，更新后查询集可能不再包含这些漏洞）"""
+        return list(queryset.order_by().values_list('project_id', 'date').distinct())
+
+    def delete(self, queryset):
+        """删除查询集中的漏洞并重算涉及的分区，返回 queryset.delete() 的结果"""
+        partitions = self.partitions(queryset)
+        result = queryset.delete()
+        self.refresh(partitions)
+        return result
+
+    def rebuild(self, project_ids=None):
+        """全量重建汇总表（或指定项目），返回写入的汇总行数"""
+        if project_ids is None:
+            project_ids = list(Project.objects.order_by('pk').values_list('pk', flat=True)) + [None]
+
+        written = 0
+        for start in range(0, len(project_ids), PROJECTS_PER_BATCH):
+            chunk = project_ids[start:start + PROJECTS_PER_BATCH]
+            conditions = [
+                Q(project_id=project_id) if project_id is not None else Q(project_id__isnull=True)
+                for project_id in chunk
+            ]
+            written += self._replace(reduce(operator.or_, conditions), chunk)
+        hotspot_service.rebuild(project_ids)
+        statistics_cache.invalidate_projects(project_ids)
+        return written
+
+    @staticmethod
+    def _partition(project_id, days) -> Q:
+        project_q = Q(project_id=project_id) if project_id is not None else Q(project_id__isnull=True)
+        return project_q & Q(date__in=sorted(days))
+
+    @staticmethod
+    def group(findings):
+        """按汇总表的维度分组统计漏洞，返回未保存的汇总行"""
+        rows = findings.order_by().annotate(
+            ai_analyzed=Case(When(~Q(ai_analysis={}), then=Value(True)), default=Value(False), output_field=BooleanField()),
+            translated=Case(When(translated_message__gt='', then=Value(True)), default=Value(False), output_field=BooleanField()),
+        ).values(*GROUP_FIELDS, 'ai_analyzed', 'translated').annotate(count=Count('id'))
+
+        return [
+            FindingDailyRollup(
+                numerical_severity=SeverityManager.get_numerical_severity(row['severity']),
+                **row
+            )
+            for row in rows
+        ]
+
+    def _replace(self, condition: Q, project_ids) -> int:
+        """替换满足条件的汇总行"""
+        with transaction.atomic():
+            # 锁住项目行，同一项目的重算串行执行，避免并发重算写入重复的汇总行
+            list(Project.objects.select_for_update().filter(
+                pk__in=[pk for pk in project_ids if pk is not None]
+            ).values_list('pk', flat=True))
+            FindingDailyRollup.objects.filter(condition).delete()
+            rows = self.group(Finding.objects.filter(condition))
+            FindingDailyRollup.objects.bulk_create(rows, batch_size=1000)
+        return len(rows)
+
+
+def finding_loaded(sender, instance, **kwargs):
+    """记录读取时的分区：保存时改了项目或发现日期，原分区也要重算（延迟加载的字段不记录）
+
+    每个 Finding 实例化时都会调用，只读 __dict__ 和赋值一个属性，不查询数据库；
+    values()/values_list() 查询不创建实例，不受影响。
+    """
+    if 'project_id' in instance.__dict__ and 'date' in instance.__dict__:
+        instance._rollup_partition = (instance.project_id, as_date(instance.date))
+
+
+def finding_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not ROLLUP_FIELDS.intersection(update_fields):
+        return
+    partition = (instance.project_id, as_date(instance.date))
+    previous = getattr(instance, '_rollup_partition', None)
+    if previous and previous != partition:
+        rollup_service.touch(*previous)
+    rollup_service.touch(*partition)
+    instance._rollup_partition = partition
+
+
+# 全局汇总维护实例
+rollup_service = FindingRollupService()
@@ -1,10 +1,15 @@
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
-from django.db.models import Count, Q, Sum, Case, When, IntegerField, Value
+from django.db.models import Count, Q, Sum, Case, When, IntegerField, Value, Avg, Max, F, OuterRef, Subquery
 from django.utils import timezone
 
-from core.models import Finding, Project, ScanTask, SeverityManager
+from core.models import Finding, Project, ScanTask, ScanStageTiming, SeverityManager
+from .aggregates import PercentileCont
+from .engine import FindingStatisticsEngine, annotate_project_severity, project_severity_stats, statistics_engine
+from .trends import TrendEngine
+from .aging import AGING_GROUP_FIELDS, AgingEngine
+from .cache import GLOBAL_SCOPE, statistics_cache, department_scope, project_scope
 
 logger = logging.getLogger(__name__)
 
@@ -15,90 +20,40 @@ class SecurityStatisticsService:
     @staticmethod
     def get_severity_statistics(queryset) -> Dict:
         """获取严重程度统计 - 三级分级"""
-        stats = {
-            '高危': 0,
-            '中危': 0, 
-            '低危': 0,
-            'total': 0
-        }
-        
-        # 按严重程度分组统计
-        severity_counts = queryset.values('severity').annotate(
-            count=Count('id')
-        ).order_by('severity')
-        
-        for item in severity_counts:
-            severity = item['severity']
-            if severity in stats:
-                stats[severity] = item['count']
-                stats['total'] += item['count']
-        
-        return stats
+        return FindingStatisticsEngine(queryset).compute()['severity_stats']
     
     @staticmethod
     def get_status_statistics(queryset) -> Dict:
         """获取状态统计 - 借鉴DefectDojo的状态字段"""
-        return {
-            'active': queryset.filter(active=True).count(),
-            'verified': queryset.filter(verified=True).count(),
-            'false_positive': queryset.filter(false_p=True).count(),
-            'duplicate': queryset.filter(duplicate=True).count(),
-            'out_of_scope': queryset.filter(out_of_scope=True).count(),
-            'risk_accepted': queryset.filter(risk_accepted=True).count(),
-            'mitigated': queryset.filter(is_mitigated=True).count(),
-            'under_review': queryset.filter(under_review=True).count(),
-            'total': queryset.count()
-        }
+        return FindingStatisticsEngine(queryset).compute()['status_stats']
     
     @staticmethod
     def get_sla_statistics(queryset) -> Dict:
         """获取SLA统计"""
-        sla_stats = {
-            'overdue': 0,
-            'due_soon': 0,  # 7天内到期
-            'on_track': 0,
-            'total': 0
-        }
-        
-        active_findings = queryset.filter(active=True, is_mitigated=False)
-        
-        for finding in active_findings:
-            days_remaining = finding.get_sla_days_remaining()
-            sla_stats['total'] += 1
-            
-            if days_remaining <= 0:
-                sla_stats['overdue'] += 1
-            elif days_remaining <= 7:
-                sla_stats['due_soon'] += 1
-            else:
-                sla_stats['on_track'] += 1
-        
-        return sla_stats
+        return FindingStatisticsEngine(queryset).compute()['sla_stats']
+    
+    @staticmethod
+    def get_finding_statistics(queryset) -> Dict:
+        """获取严重程度、状态、SLA、AI分析和翻译统计（一次聚合查询）"""
+        return FindingStatisticsEngine(queryset).compute()
     
     @staticmethod
     def get_project_statistics(project: Project) -> Dict:
-        """获取项目统计信息"""
-        findings = Finding.objects.filter(project=project)
-        
-        return {
-            'severity_stats': SecurityStatisticsService.get_severity_statistics(findings),
-            'status_stats': SecurityStatisticsService.get_status_statistics(findings),
-            'sla_stats': SecurityStatisticsService.get_sla_statistics(findings),
-            'scan_stats': SecurityStatisticsService.get_scan_statistics(project),
+        """获取项目统计信息（扫描记录的变化不会使漏洞统计缓存失效，扫描统计每次实时查询）"""
+        stats = statistics_cache.get_or_compute('project_statistics', lambda: {
+            **statistics_engine(project=project).compute(),
             'trend_stats': SecurityStatisticsService.get_trend_data(project, days=30)
-        }
+        }, scopes=[project_scope(project.id)])
+        return {**stats, 'scan_stats': SecurityStatisticsService.get_scan_statistics(project)}
     
     @staticmethod
     def get_department_statistics(department_name: str) -> Dict:
-        """获取部门统计信息"""
-        findings = Finding.objects.filter(project__department__name=department_name)
-        
-        return {
-            'severity_stats': SecurityStatisticsService.get_severity_statistics(findings),
-            'status_stats': SecurityStatisticsService.get_status_statistics(findings),
-            'sla_stats': SecurityStatisticsService.get_sla_statistics(findings),
-            'project_breakdown': SecurityStatisticsService.get_project_breakdown(department_name)
-        }
+        """获取部门统计信息（项目的最后一次扫描每次实时查询）"""
+        stats = statistics_cache.get_or_compute('department_statistics', lambda: {
+            **statistics_engine(project__department__name=department_name).compute(),
+            'project_breakdown': SecurityStatisticsService._project_severity_breakdown(department_name)
+        }, scopes=[department_scope(department_name)])
+        return {**stats, 'project_breakdown': SecurityStatisticsService._with_last_scans(stats['project_breakdown'])}
     
     @staticmethod
     def get_scan_statistics(project: Project) -> Dict:
@@ -118,36 +73,58 @@ class SecurityStatisticsService:
     @staticmethod
     def get_project_breakdown(department_name: str) -> List[Dict]:
         """获取部门下项目的漏洞分布"""
-        projects = Project.objects.filter(department__name=department_name)
-        breakdown = []
-        
-        for project in projects:
-            findings = Finding.objects.filter(project=project)
-            severity_stats = SecurityStatisticsService.get_severity_statistics(findings)
-            
-            breakdown.append({
+        return SecurityStatisticsService._with_last_scans(
+            SecurityStatisticsService._project_severity_breakdown(department_name)
+        )
+    
+    @staticmethod
+    def _project_severity_breakdown(department_name: str) -> List[Dict]:
+        """部门下各项目的严重程度分布"""
+        return [
+            {
                 'project_id': project.id,
                 'project_name': project.name,
                 'code_owner': project.code_owner,
-                'severity_stats': severity_stats,
-                'last_scan': SecurityStatisticsService.get_last_scan_info(project)
-            })
+                'severity_stats': project_severity_stats(project)
+            }
+            for project in annotate_project_severity(Project.objects.filter(department__name=department_name))
+        ]
+    
+    @staticmethod
+    def _with_last_scans(breakdown: List[Dict]) -> List[Dict]:
+        """为项目分布加上各项目的最后一次扫描"""
+        last_scan_id = ScanTask.objects.filter(project=OuterRef('pk')).order_by('-created_at').values('id')[:1]
+        last_scan_ids = dict(
+            Project.objects.filter(pk__in=[item['project_id'] for item in breakdown])
+            .annotate(last_scan_id=Subquery(last_scan_id)).values_list('pk', 'last_scan_id')
+        )
+        last_scans = ScanTask.objects.in_bulk([pk for pk in last_scan_ids.values() if pk])
         
-        return breakdown
+        return [
+            {
+                **item,
+                'last_scan': SecurityStatisticsService._scan_info(last_scans.get(last_scan_ids.get(item['project_id'])))
+            }
+            for item in breakdown
+        ]
     
     @staticmethod
     def get_last_scan_info(project: Project) -> Optional[Dict]:
         """获取最后一次扫描信息"""
         last_scan = ScanTask.objects.filter(project=project).order_by('-created_at').first()
-        
-        if last_scan:
+        return SecurityStatisticsService._scan_info(last_scan)
+    
+    @staticmethod
+    def _scan_info(scan: Optional[ScanTask]) -> Optional[Dict]:
+        """扫描信息摘要"""
+        if scan:
             return {
-                'scan_id': last_scan.id,
-                'tool_name': last_scan.tool_name,
-                'status': last_scan.status,
-                'total_findings': last_scan.total_findings,
-                'created_at': last_scan.created_at,
-                'completed_at': last_scan.completed_at
+                'scan_id': scan.id,
+                'tool_name': scan.tool_name,
+                'status': scan.status,
+                'total_findings': scan.total_findings,
+                'created_at': scan.created_at,
+                'completed_at': scan.completed_at
             }
         
         return None
@@ -155,72 +132,36 @@ class SecurityStatisticsService:
     @staticmethod
     def get_trend_data(project: Project, days: int = 30) -> List[Dict]:
         """获取趋势数据"""
-        end_date = timezone.now().date()
-        start_date = end_date - timedelta(days=days)
-        
-        trend_data = []
-        current_date = start_date
-        
-        while current_date <= end_date:
-            # 统计当天新增的漏洞
-            daily_new = SecurityStatisticsService.get_severity_statistics(
-                Finding.objects.filter(
-                    project=project,
-                    date=current_date
-                )
-            )
-            
-            # 统计当天修复的漏洞
-            daily_fixed = Finding.objects.filter(
-                project=project,
-                mitigated__date=current_date
-            ).count()
-            
-            # 统计当天活跃的漏洞总数
-            daily_active = Finding.objects.filter(
-                project=project,
-                date__lte=current_date,
-                active=True
-            ).exclude(
-                mitigated__date__lt=current_date
-            ).count()
-            
-            trend_data.append({
-                'date': current_date.isoformat(),
-                'new_findings': daily_new,
-                'fixed_count': daily_fixed,
-                'active_count': daily_active
-            })
-            
-            current_date += timedelta(days=1)
-        
-        return trend_data
+        return TrendEngine(Finding.objects.filter(project=project)).series(days=days)
     
     @staticmethod
     def get_global_statistics() -> Dict:
-        """获取全局统计信息"""
-        all_findings = Finding.objects.all()
-        
-        return {
+        """获取全局统计信息（工具使用统计来自扫描记录，每次实时查询）"""
+        stats = statistics_cache.get_or_compute('global_statistics', lambda: {
             'total_projects': Project.objects.filter(is_active=True).count(),
             'total_departments': Project.objects.values('department').distinct().count(),
-            'severity_stats': SecurityStatisticsService.get_severity_statistics(all_findings),
-            'status_stats': SecurityStatisticsService.get_status_statistics(all_findings),
-            'sla_stats': SecurityStatisticsService.get_sla_statistics(all_findings),
-            'top_vulnerable_projects': SecurityStatisticsService.get_top_vulnerable_projects(),
-            'tool_usage_stats': SecurityStatisticsService.get_tool_usage_stats()
-        }
+            **statistics_engine().compute(),
+            'top_vulnerable_projects': SecurityStatisticsService.get_top_vulnerable_projects()
+        })
+        return {**stats, 'tool_usage_stats': SecurityStatisticsService.get_tool_usage_stats()}
     
     @staticmethod
     def get_top_vulnerable_projects(limit: int = 10) -> List[Dict]:
         """获取漏洞最多的项目"""
-        projects = Project.objects.annotate(
-            total_findings=Count('finding', filter=Q(finding__active=True)),
-            high_findings=Count('finding', filter=Q(finding__active=True, finding__severity='高危')),
-            medium_findings=Count('finding', filter=Q(finding__active=True, finding__severity='中危'))
+        return statistics_cache.get_or_compute(
+            'top_vulnerable_projects', lambda: SecurityStatisticsService._top_vulnerable_projects(limit), args=(limit,)
+        )
+    
+    @staticmethod
+    def _top_vulnerable_projects(limit: int) -> List[Dict]:
+        """计算漏洞最多的项目"""
+        high = f"severity_{SeverityManager.SEVERITIES.index('高危')}"
+        medium = f"severity_{SeverityManager.SEVERITIES.index('中危')}"
+        projects = annotate_project_severity(
+            Project.objects.select_related('department'), active_only=True
         ).filter(
-            total_findings__gt=0
-        ).order_by('-high_findings', '-medium_findings', '-total_findings')[:limit]
+            finding_count__gt=0
+        ).order_by(f'-{high}', f'-{medium}', '-finding_count')[:limit]
         
         result = []
         for project in projects:
@@ -229,9 +170,9 @@ class SecurityStatisticsService:
                 'project_name': project.name,
                 'department': project.department.name,
                 'code_owner': project.code_owner,
-                'total_findings': project.total_findings,
-                'high_findings': project.high_findings,
-                'medium_findings': project.medium_findings
+                'total_findings': project.finding_count,
+                'high_findings': getattr(project, high),
+                'medium_findings': getattr(project, medium)
             })
         
         return result
@@ -250,26 +191,83 @@ class SecurityStatisticsService:
             'most_used_tool': tool_stats.first()['tool_name'] if tool_stats else None
         }
     
+    @staticmethod
+    def get_scan_stage_statistics(group_by: str = 'engine', days: int = 30, project_id: Optional[int] = None) -> List[Dict]:
+        """获取扫描各阶段耗时分位数 - 按项目或扫描引擎分组"""
+        group_fields = {
+            'engine': 'engine',
+            'project': 'scan_task__project__name',
+        }
+        if group_by not in group_fields:
+            raise ValueError(f"不支持的分组方式: {group_by}")
+        
+        timings = ScanStageTiming.objects.filter(
+            started_at__gte=timezone.now() - timedelta(days=days)
+        )
+        if project_id:
+            timings = timings.filter(scan_task__project_id=project_id)
+        
+        rows = timings.annotate(
+            group=F(group_fields[group_by])
+        ).values('group', 'stage').annotate(
+            samples=Count('id'),
+            failures=Count('id', filter=Q(success=False)),
+            avg=Avg('duration'),
+            p50=PercentileCont('duration', 0.5),
+            p90=PercentileCont('duration', 0.9),
+            p95=PercentileCont('duration', 0.95),
+            max=Max('duration'),
+            peak_rss_kb=Max('peak_rss_kb')
+        ).order_by('group', 'stage')
+        
+        return [
+            {
+                group_by: row['group'],
+                'stage': row['stage'],
+                'samples': row['samples'],
+                'failures': row['failures'],
+                'avg': row['avg'],
+                'p50': row['p50'],
+                'p90': row['p90'],
+                'p95': row['p95'],
+                'max': row['max'],
+                'peak_rss_kb': row['peak_rss_kb']
+            }
+            for row in rows
+        ]
+    
+    @staticmethod
+    def get_aging_statistics(group_by: str = 'department', days: int = 90,
+                             department_name: Optional[str] = None, project_id: Optional[int] = None) -> Dict:
+        """获取修复时效统计 - MTTR、漏洞年龄分位数和年龄分布（按部门、项目、严重程度或CWE分组）"""
+        if group_by not in AGING_GROUP_FIELDS:
+            raise ValueError(f"不支持的分组方式: {group_by}")
+        findings = Finding.objects.all()
+        scopes = None
+        if department_name:
+            findings = findings.filter(project__department__name=department_name)
+            scopes = [department_scope(department_name)]
+        if project_id:
+            findings = findings.filter(project_id=project_id)
+            scopes = [project_scope(project_id)]
+        
+        engine = AgingEngine(findings)
+        return statistics_cache.get_or_compute('aging_statistics', lambda: {
+            'group_by': group_by,
+            'days': days,
+            'overall': engine.compute(days),
+            'groups': engine.compute_by(group_by, days),
+        }, scopes=scopes or [GLOBAL_SCOPE], args=(group_by, days, department_name, project_id))
+    
     @staticmethod
     def get_ai_analysis_stats() -> Dict:
         """获取AI分析统计"""
-        findings_with_ai = Finding.objects.exclude(ai_analysis={})
-        
-        return {
-            'total_analyzed': findings_with_ai.count(),
-            'cached_results': findings_with_ai.filter(ai_cached=True).count(),
-            'analysis_coverage': (findings_with_ai.count() / Finding.objects.count() * 100) if Finding.objects.count() > 0 else 0
-        }
+        return statistics_cache.get_or_compute('ai_analysis_stats', lambda: statistics_engine().compute()['ai_stats'])
     
     @staticmethod
     def get_translation_stats() -> Dict:
         """获取翻译统计"""
-        translated_findings = Finding.objects.exclude(translated_message='').exclude(translated_message=None)
-        
-        return {
-            'total_translated': translated_findings.count(),
-            'translation_coverage': (translated_findings.count() / Finding.objects.count() * 100) if Finding.objects.count() > 0 else 0
-        }
+        return statistics_cache.get_or_compute('translation_stats', lambda: statistics_engine().compute()['translation_stats'])
 
 
 class ReportGenerator:
@@ -305,6 +303,17 @@ class ReportGenerator:
             'summary': ReportGenerator._generate_summary(stats)
         }
     
+    @staticmethod
+    def generate_global_report() -> Dict:
+        """生成全局报告"""
+        stats = SecurityStatisticsService.get_global_statistics()
+        
+        return {
+            'statistics': stats,
+            'generated_at': timezone.now().isoformat(),
+            'summary': ReportGenerator._generate_summary(stats)
+        }
+    
     @staticmethod
     def _generate_summary(stats: Dict) -> Dict:
         """生成统计摘要"""
@@ -315,6 +324,8 @@ class ReportGenerator:
             'total_findings': severity_stats.get('total', 0),
             'high_risk_findings': severity_stats.get('高危', 0) + severity_stats.get('中危', 0),
             'overdue_findings': sla_stats.get('overdue', 0),
+            'ai_analysis_coverage': stats.get('ai_stats', {}).get('analysis_coverage', 0),
+            'translation_coverage': stats.get('translation_stats', {}).get('translation_coverage', 0),
             'risk_level': ReportGenerator._calculate_risk_level(severity_stats, sla_stats)
         }
     
@@ -0,0 +1,139 @@
+import hashlib
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List
+
+from core.models import Finding, SeverityManager
+from .models import ScanSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def target_code(finding) -> str:
+    """漏洞所在行的代码（空白归一化），没有源码上下文时为空"""
+    context = finding.source_context or {}
+    target = context.get('target_line') or finding.line_number
+    for line in context.get('lines', []):
+        if line.get('is_target') or line.get('number') == target:
+            return ' '.join((line.get('content') or '').split())
+    return ''
+
+
+def finding_fingerprint(finding, occurrence: int = 0) -> str:
+    """漏洞指纹 - 规则、文件路径和所在行代码的SHA1
+
+    用代码内容而不是行号标识漏洞，文件中插入、删除其他行后同一个漏洞的指纹不变；
+    没有源码上下文时退回行号。同一次扫描中指纹相同的漏洞用 occurrence 区分。
+    """
+    code = target_code(finding)
+    parts = [
+        finding.vuln_id_from_tool or finding.title,
+        (finding.file_path or '').lstrip('/'),
+        code if code else f'line:{finding.line_number}',
+    ]
+    if occurrence:
+        parts.append(f'#{occurrence}')
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def assign_fingerprints(findings: Iterable) -> List:
+    """给没有指纹的漏洞计算指纹（沿用基线的漏洞已有指纹），返回被赋值的漏洞"""
+    groups = defaultdict(list)
+    for finding in findings:
+        if not finding.fingerprint:
+            groups[finding_fingerprint(finding)].append(finding)
+
+    assigned = []
+    for fingerprint, group in groups.items():
+        # 同一位置的重复结果按行号排序后依次编号，重新扫描时编号稳定
+        group.sort(key=lambda finding: (finding.line_number or 0, finding.title))
+        for occurrence, finding in enumerate(group):
+            finding.fingerprint = finding_fingerprint(finding, occurrence) if occurrence else fingerprint
+            assigned.append(finding)
+    return assigned
+
+
+class ScanSnapshotService:
+    """扫描快照维护 - 扫描入库完成时记录漏洞指纹集合和相对上一次扫描的变化
+
+    上一次扫描为同项目、同扫描工具中扫描任务ID更小的最近一个快照（不同工具的结果集合不可比，
+    跨工具比较会把另一工具的全部漏洞算作新增/消失）。快照按任务ID顺序记录；补录较早的
+    扫描时，同工具中紧随其后的快照会以补录的快照为基准重新计算变化。
+    """
+
+    def fingerprint_scan(self, scan_task) -> int:
+        """给扫描任务中没有指纹的漏洞补充指纹（升级前入库的漏洞），返回更新的漏洞数"""
+        findings = list(Finding.objects.filter(scan_task=scan_task).only(
+            'id', 'title', 'vuln_id_from_tool', 'file_path', 'line_number', 'source_context', 'fingerprint'
+        ))
+        if not any(not finding.fingerprint for finding in findings):
+            return 0
+        assigned = assign_fingerprints(findings)
+        Finding.objects.bulk_update(assigned, ['fingerprint'], batch_size=1000)
+        return len(assigned)
+
+    def record(self, scan_task) -> ScanSnapshot:
+        """记录扫描任务的快照（重复记录时覆盖）"""
+        rows = Finding.objects.filter(scan_task=scan_task).order_by().values_list('fingerprint', 'severity', 'cwe')
+        fingerprints, severity_counts, cwe_counts = set(), Counter(), Counter()
+        total = 0
+        for fingerprint, severity, cwe in rows:
+            total += 1
+            if fingerprint:
+                fingerprints.add(fingerprint)
+            severity_counts[severity] += 1
+            if cwe is not None:
+                cwe_counts[str(cwe)] += 1
+
+        same_tool = ScanSnapshot.objects.filter(
+            project_id=scan_task.project_id, scan_task__tool_name=scan_task.tool_name
+        )
+        previous = same_tool.filter(scan_task_id__lt=scan_task.id).order_by('-scan_task_id').first()
+
+        snapshot, _ = ScanSnapshot.objects.update_or_create(
+            scan_task=scan_task,
+            defaults={
+                'project_id': scan_task.project_id,
+                'commit_sha': scan_task.commit_sha or '',
+                'fingerprints': sorted(fingerprints),
+                'total': total,
+                'severity_counts': {
+                    severity: severity_counts.get(severity, 0)
+                    for severity, _ in SeverityManager.SEVERITY_CHOICES
+                },
+                'cwe_counts': dict(cwe_counts.most_common()),
+                **self._delta(fingerprints, previous),
+            }
+        )
+
+        following = same_tool.filter(scan_task_id__gt=scan_task.id).order_by('scan_task_id').first()
+        if following and following.previous_id != snapshot.id:
+            for name, value in self._delta(set(following.fingerprints), snapshot).items():
+                setattr(following, name, value)
+            following.save(update_fields=['previous', 'added', 'removed', 'added_count', 'removed_count'])
+        return snapshot
+
+    def safe_record(self, scan_task):
+        """记录快照，失败只记日志（漏洞已经入库，快照可以用 build_scan_snapshots 补录）"""
+        try:
+            return self.record(scan_task)
+        except Exception as e:
+            logger.error(f"记录扫描任务 {scan_task.id} 的快照失败: {e}")
+            return None
+
+    @staticmethod
+    def _delta(fingerprints: set, previous) -> Dict:
+        """相对上一次扫描快照的变化；没有上一次扫描时所有指纹都是新增"""
+        before = set(previous.fingerprints) if previous else set()
+        added, removed = sorted(fingerprints - before), sorted(before - fingerprints)
+        return {
+            'previous': previous,
+            'added': added,
+            'removed': removed,
+            'added_count': len(added),
+            'removed_count': len(removed),
+        }
+
+
+# 全局扫描快照实例
+snapshot_service = ScanSnapshotService()
@@ -0,0 +1,129 @@
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+from django.db.models import Count, DateField, Q, Value
+from django.db.models.functions import Greatest, Trunc
+from django.utils import timezone
+
+from core.models import Finding, SeverityManager
+from .aggregates import RunningSum
+
+# 支持的时间粒度
+BUCKETS = ('day', 'week', 'month')
+
+
+def bucket_start(day: date, bucket: str) -> date:
+    """日期所在时间段的第一天（周从周一开始，与数据库的 date_trunc 一致）"""
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(day: date, bucket: str) -> date:
+    """下一个时间段的第一天"""
+    if bucket == 'week':
+        return day + timedelta(days=7)
+    if bucket == 'month':
+        return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return day + timedelta(days=1)
+
+
+class TrendEngine:
+    """趋势引擎 - 按日/周/月生成新增、修复、活跃漏洞序列
+
+    新增和修复分别按发现日期、缓解时间 GROUP BY 时间段，活跃数由累计窗口算出：
+    时间段的活跃数 = 截至该时间段的累计发现数 - 截至上一时间段的累计修复数
+    （与原来逐日统计的口径一致：当天修复的漏洞当天仍计为活跃）。
+    开始日期之前的记录归入第一个（修复为前一个）时间段参与累计，因此每个序列只有两条查询、
+    返回的行数等于时间段数。
+    """
+
+    def __init__(self, queryset=None):
+        self.queryset = Finding.objects.all() if queryset is None else queryset
+
+    def _bucket(self, field: str, start: date, bucket: str):
+        """时间段表达式，开始日期之前的记录归入第一个时间段"""
+        return Greatest(
+            Trunc(field, bucket, output_field=DateField()),
+            Value(start, output_field=DateField())
+        )
+
+    def _opened(self, start: date, end: date, bucket: str) -> Dict[date, Dict]:
+        """按发现日期分组: 新增数（按严重程度）和累计发现的活跃漏洞数"""
+        in_window = Q(date__gte=start)
+        exprs = {
+            f'new_{index}': Count('id', filter=in_window & Q(severity=severity))
+            for index, (severity, _) in enumerate(SeverityManager.SEVERITY_CHOICES)
+        }
+        rows = self.queryset.order_by().filter(date__lte=end).annotate(
+            bucket=self._bucket('date', start, bucket)
+        ).values('bucket').annotate(
+            new_total=Count('id', filter=in_window),
+            opened=RunningSum(Count('id', filter=Q(active=True)), 'bucket'),
+            **exprs
+        ).order_by('bucket')
+        return {self._as_date(row['bucket']): row for row in rows}
+
+    def _fixed(self, start: date, end: date, bucket: str) -> Dict[date, Dict]:
+        """按缓解时间分组: 修复数和累计修复的活跃漏洞数
+
+        开始日期之前的修复归入前一个时间段，作为第一个时间段的累计修复数。
+        """
+        rows = self.queryset.order_by().filter(
+            mitigated__isnull=False, mitigated__date__lte=end
+        ).annotate(
+            bucket=self._bucket('mitigated', bucket_start(start - timedelta(days=1), bucket), bucket)
+        ).values('bucket').annotate(
+            fixed=Count('id', filter=Q(mitigated__date__gte=start)),
+            closed=RunningSum(Count('id', filter=Q(active=True)), 'bucket')
+        ).order_by('bucket')
+        return {self._as_date(row['bucket']): row for row in rows}
+
+    @staticmethod
+    def _as_date(value) -> date:
+        if isinstance(value, str):
+            return date.fromisoformat(value[:10])
+        return value.date() if hasattr(value, 'date') and callable(value.date) else value
+
+    def series(self, start: Optional[date] = None, end: Optional[date] = None,
+               bucket: str = 'day', days: int = 30) -> List[Dict]:
+        """生成趋势序列，默认最近days天"""
+        if bucket not in BUCKETS:
+            raise ValueError(f"不支持的时间粒度: {bucket}")
+        end = end or timezone.now().date()
+        start = bucket_start(start or end - timedelta(days=days), bucket)
+
+        opened = self._opened(start, end, bucket)
+        fixed = self._fixed(start, end, bucket)
+        severities = [severity for severity, _ in SeverityManager.SEVERITY_CHOICES]
+
+        series = []
+        before = fixed.get(bucket_start(start - timedelta(days=1), bucket))
+        opened_total, closed_total = 0, int(before['closed'] or 0) if before else 0
+        current = start
+        while current <= end:
+            opened_row = opened.get(current)
+            fixed_row = fixed.get(current)
+            if opened_row:
+                opened_total = int(opened_row['opened'] or 0)
+
+            new_findings = {
+                severity: opened_row[f'new_{index}'] if opened_row else 0
+                for index, severity in enumerate(severities)
+            }
+            new_findings['total'] = opened_row['new_total'] if opened_row else 0
+
+            series.append({
+                'date': current.isoformat(),
+                'new_findings': new_findings,
+                'fixed_count': fixed_row['fixed'] if fixed_row else 0,
+                # 本时间段修复的漏洞仍计为活跃，减去的是截至上一时间段的累计修复数
+                'active_count': opened_total - closed_total
+            })
+
+            if fixed_row:
+                closed_total = int(fixed_row['closed'] or 0)
+            current = next_bucket(current, bucket)
+
+        return series